@@ -0,0 +1,140 @@
+"""
+Records per second of the JSON log formatter.
+
+Compares the current flowvcutilsJSONFormatter (with orjson when installed
+and with the json module) against the formatter as it was before the fast
+path, on plain records, records with extra fields and records with an
+exception.
+
+    python benchmarks/bench_json_formatter.py --records 50000
+"""
+
+import datetime as dt
+import json
+import logging
+import sys
+import time
+from unittest.mock import patch
+
+import click
+
+from flowvcutils import jsonlogger
+from flowvcutils.jsonlogger import LOG_RECORD_BUILTIN_ATTRS, flowvcutilsJSONFormatter
+
+FMT_KEYS = {
+    "level": "levelname",
+    "message": "message",
+    "timestamp": "timestamp",
+    "logger": "name",
+    "module": "module",
+    "function": "funcName",
+    "line": "lineno",
+    "thread_name": "threadName",
+}
+
+
+class previousJSONFormatter(logging.Formatter):
+    """The formatter before the fast path, kept as the baseline."""
+
+    def __init__(self, *, fmt_keys=None):
+        super().__init__()
+        self.fmt_keys = fmt_keys if fmt_keys is not None else {}
+
+    def format(self, record):
+        message = self._prepare_log_dict(record)
+        return json.dumps(message, default=str)
+
+    def _prepare_log_dict(self, record):
+        always_fields = {
+            "message": record.getMessage(),
+            "timestamp": dt.datetime.fromtimestamp(
+                record.created, tz=dt.timezone.utc
+            ).isoformat(),
+        }
+        if record.exc_info is not None:
+            always_fields["exc_info"] = self.formatException(record.exc_info)
+
+        if record.stack_info is not None:
+            always_fields["stack_info"] = self.formatStack(record.stack_info)
+
+        message = {
+            key: (
+                msg_val
+                if (msg_val := always_fields.pop(val, None)) is not None
+                else getattr(record, val)
+            )
+            for key, val in self.fmt_keys.items()
+        }
+        message.update(always_fields)
+
+        for key, val in record.__dict__.items():
+            if key not in LOG_RECORD_BUILTIN_ATTRS:
+                message[key] = val
+
+        return message
+
+
+def make_records(n_records, kind):
+    logger = logging.getLogger("flowvcutils.benchmark")
+    exc_info = None
+    if kind == "exception":
+        try:
+            raise ValueError("benchmark")
+        except ValueError:
+            exc_info = sys.exc_info()
+    records = []
+    for i in range(n_records):
+        record = logger.makeRecord(
+            logger.name,
+            logging.INFO,
+            __file__,
+            i,
+            "Writing .bin %d",
+            (i,),
+            exc_info,
+        )
+        if kind == "extra":
+            record.job = {"case": f"case_{i}", "exit_status": 0, "wall_time_s": 1.5}
+        records.append(record)
+    return records
+
+
+def records_per_second(formatter, records):
+    for record in records:
+        # the formatter caches the formatted exception on the record
+        record.exc_text = None
+    start = time.perf_counter()
+    for record in records:
+        formatter.format(record)
+    return len(records) / (time.perf_counter() - start)
+
+
+@click.command()
+@click.option("--records", "n_records", default=50000, help="Records per run.")
+@click.option("--repeat", default=3, help="Runs per formatter, the best is kept.")
+def main(n_records, repeat):
+    formatters = [
+        ("previous", previousJSONFormatter(fmt_keys=FMT_KEYS), False),
+        ("fast path, json", flowvcutilsJSONFormatter(fmt_keys=FMT_KEYS), True),
+    ]
+    if jsonlogger.orjson is not None:
+        formatters.append(
+            ("fast path, orjson", flowvcutilsJSONFormatter(fmt_keys=FMT_KEYS), False)
+        )
+
+    click.echo(f"{'records':<10}{'formatter':<20}{'records/s':>12}{'speedup':>9}")
+    for kind in ["plain", "extra", "exception"]:
+        records = make_records(n_records, kind)
+        baseline = None
+        for name, formatter, without_orjson in formatters:
+            orjson = None if without_orjson else jsonlogger.orjson
+            with patch.object(jsonlogger, "orjson", orjson):
+                rate = max(
+                    records_per_second(formatter, records) for _ in range(repeat)
+                )
+            baseline = baseline or rate
+            click.echo(f"{kind:<10}{name:<20}{rate:>12,.0f}{rate / baseline:>8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
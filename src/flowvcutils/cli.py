@@ -1,31 +1,223 @@
 import sys
 import logging
+import importlib
+import functools
 import click
 import os
+from click.core import ParameterSource
 from flowvcutils.jsonlogger import settup_logging
 from .jsonlogger import main as jsonlogger_main
-from .vtu_2_bin import process_folder, process_directory
-from .inigenerator import main as inigenerator_main
 from .simulationgenerator import main as simulationgenerator_main
-from .filerename import main as filerename_main
+from .simulationgenerator import MATERIALIZE_MODES
+from .filerename import main as filerename_main, DEFAULT_MAX_WORKERS
+from .jobrunner import main as jobrunner_main, DEFAULT_FLOWVC_EXE
+from .solverscheduler import main as solverscheduler_main, DEFAULT_SOLVER_COMMAND
+from .perf import start_trace, stop_trace
+from .perf import start_profile, stop_profile
+from .perf import start_memory_profile, stop_memory_profile
+from .metrics import start_metrics, stop_metrics
+from .metrics import DEFAULT_INTERVAL as DEFAULT_METRICS_INTERVAL
+from .logstats import main as logstats_main, GROUP_BY
+from .pipeline import main as pipeline_main, STAGES as PIPELINE_STAGES
+from .service import main as service_main, call as service_call
+from .service import DEFAULT_WORKERS as SERVICE_WORKERS
 
 logger = logging.getLogger(__name__)
 
 
-@click.group(context_settings=dict(help_option_names=["-h", "--help"]))
-def cli():
-    pass
+def _lazy(module_name, attribute):
+    """A function that imports module_name and calls its attribute when called.
+
+    Keeps vtk (imported by vtu_2_bin and inigenerator) out of the startup of
+    commands that do not use it.
+    """
+
+    def call(*args, **kwargs):
+        module = importlib.import_module(module_name, __package__)
+        return getattr(module, attribute)(*args, **kwargs)
+
+    call.__name__ = attribute
+    return call
+
+
+process_folder = _lazy(".vtu_2_bin", "process_folder")
+process_directory = _lazy(".vtu_2_bin", "process_directory")
+watch_folder = _lazy(".vtu_2_bin", "watch_folder")
+plan_folder = _lazy(".vtu_2_bin", "plan_folder")
+plan_directory = _lazy(".vtu_2_bin", "plan_directory")
+format_plan = _lazy(".vtu_2_bin", "format_plan")
+inigenerator_main = _lazy(".inigenerator", "main")
+inisweep_main = _lazy(".inisweep", "main")
+
+
+def _service_job(job, function, service):
+    """function, or with service a call of job on the warm worker service."""
+    if service:
+        return functools.partial(service_call, job)
+    return function
+
+
+def current_directory_name():
+    return os.path.basename(os.getcwd())
+
+
+class loggedCommand(click.Command):
+    """A command that sets up logging when it runs, not for its --help."""
+
+    def invoke(self, ctx):
+        settup_logging()
+        return super().invoke(ctx)
+
+
+class cliGroup(click.Group):
+    command_class = loggedCommand
+
+
+@click.group(cls=cliGroup, context_settings=dict(help_option_names=["-h", "--help"]))
+@click.option(
+    "--trace",
+    default=None,
+    type=click.Path(dir_okay=False),
+    help=(
+        "Record the stages, workers and jobs of the run to FILE in the Chrome "
+        "trace-event format (open in ui.perfetto.dev or chrome://tracing)."
+    ),
+)
+@click.option(
+    "--metrics",
+    "metrics_file",
+    default=None,
+    type=click.Path(dir_okay=False),
+    help=(
+        "Keep FILE (a .prom file in the node_exporter textfile collector "
+        "directory) updated with the progress of the command."
+    ),
+)
+@click.option(
+    "--metrics_interval",
+    default=DEFAULT_METRICS_INTERVAL,
+    type=float,
+    help="Seconds between updates of the --metrics file (default: 15).",
+)
+@click.option(
+    "--profile",
+    is_flag=True,
+    help=(
+        "Profile the command with cProfile, write the hot functions and a "
+        ".pstats file to the logs directory (main process only)."
+    ),
+)
+@click.option(
+    "--profile-memory",
+    is_flag=True,
+    help=(
+        "Trace allocations with tracemalloc, write the top allocating lines "
+        "to the logs directory (main process only)."
+    ),
+)
+@click.pass_context
+def cli(ctx, trace, metrics_file, metrics_interval, profile, profile_memory):
+    # logging is set up by the subcommand (see loggedCommand), so
+    # "<command> --help" does not start the listener or open the log files
+    if profile:
+        start_profile(ctx.invoked_subcommand)
+        ctx.call_on_close(stop_profile)
+    # closed first, so writing the cProfile report is not in the memory report
+    if profile_memory:
+        start_memory_profile(ctx.invoked_subcommand)
+        ctx.call_on_close(stop_memory_profile)
+    if trace is not None:
+        start_trace(trace)
+        ctx.call_on_close(stop_trace)
+    if metrics_file is not None:
+        start_metrics(metrics_file, metrics_interval)
+        ctx.call_on_close(stop_metrics)
 
 
 @cli.command()
 @click.argument("num_lines", default=10, type=int)
-def jsonlogger(num_lines):
+@click.option(
+    "--log_file",
+    default=None,
+    help="JSON log to read (default: the flowvcutils.log.jsonl of this install).",
+)
+@click.option("--level", default=None, help="Only logs at or above this level.")
+@click.option(
+    "--logger",
+    "logger_name",
+    default=None,
+    help="Only logs from this logger and its children, e.g. flowvcutils.jobrunner.",
+)
+@click.option("--since", default=None, help="Only logs at or after this ISO time.")
+@click.option("--until", default=None, help="Only logs at or before this ISO time.")
+@click.option(
+    "--extra",
+    "extras",
+    multiple=True,
+    help="Only logs with KEY=VALUE, e.g. job.exit_status=1 (repeatable).",
+)
+@click.option(
+    "-f",
+    "--follow",
+    is_flag=True,
+    default=False,
+    help="Keep printing new logs as they are written.",
+)
+def jsonlogger(num_lines, log_file, level, logger_name, since, until, extras, follow):
     """
     Print a specified number of log lines.
 
-    NUM_LINES: the number of logs to print (default 10).
+    NUM_LINES: the number of logs to print (default 10). The rotated
+    backups are read when the current log has fewer matching logs.
+    """
+    try:
+        jsonlogger_main(
+            num_lines,
+            log_path=log_file,
+            level=level,
+            logger_name=logger_name,
+            since=since,
+            until=until,
+            extras=list(extras),
+            follow=follow,
+        )
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+
+
+@cli.command()
+@click.option(
+    "--log_file",
+    default=None,
+    help="JSON log to read (default: the flowvcutils.log.jsonl of this install).",
+)
+@click.option(
+    "--by",
+    type=click.Choice(GROUP_BY),
+    default="stage",
+    help="Group by stage, case directory or run id (default: stage).",
+)
+@click.option("--stage", default=None, help="Only this stage, e.g. adjacency.")
+@click.option("--since", default=None, help="Only logs at or after this ISO time.")
+@click.option("--until", default=None, help="Only logs at or before this ISO time.")
+@click.option(
+    "--json", "as_json", is_flag=True, default=False, help="Print JSON, not a table."
+)
+def logstats(log_file, by, stage, since, until, as_json):
+    """
+    Summarize the stage timings in the log.
+
+    Reads the log and its rotated backups one line at a time and prints the
+    count, failures, duration percentiles and throughput of each group.
     """
-    jsonlogger_main(num_lines)
+    logstats_main(
+        log_path=log_file,
+        by=by,
+        stage=stage,
+        since=since,
+        until=until,
+        as_json=as_json,
+    )
 
 
 @cli.command()
@@ -33,7 +225,7 @@ def jsonlogger(num_lines):
 @click.argument("stop", type=int)
 @click.option(
     "--root",
-    default=os.getcwd(),
+    default=os.getcwd,
     help=(
         "Directory with the VTU files (default: current directory)."
         "In batch mode ensure vtu files are in root/subdir/input_vtu/"
@@ -41,7 +233,7 @@ def jsonlogger(num_lines):
 )
 @click.option(
     "--output",
-    default=os.getcwd(),
+    default=os.getcwd,
     help=(
         "Output directory target to store bin files (default: current directory)."
         "In batch mode this will be root/subdir/input_bin/"
@@ -49,7 +241,7 @@ def jsonlogger(num_lines):
 )
 @click.option(
     "--file_name",
-    default=os.path.basename(os.getcwd()),
+    default=current_directory_name,
     help=(
         "Base file name (e.g., steady_ for steady_00000.vtu) "
         "(default: current directory name)."
@@ -88,7 +280,85 @@ def jsonlogger(num_lines):
     default="velocity",
     help="Field name for velocity data within the .vtu files (default: 'velocity').",
 )
+@click.option(
+    "--input_pattern",
+    default=None,
+    help=(
+        "Read the inputs where they are by name pattern instead of "
+        "{file_name}NNNNN{extension}: a template such as "
+        "all_results_{index:05d}.vtu or a regex with the index as its first "
+        "group. Nothing is renamed."
+    ),
+)
+@click.option(
+    "--current_start",
+    default=None,
+    type=int,
+    help=(
+        "With --input_pattern, the file index of time step START, e.g. 0 for "
+        "case.0.vtk, case.1.vtk ... (default: the index is the time step)."
+    ),
+)
+@click.option(
+    "--current_increment",
+    default=1,
+    type=int,
+    help="With --current_start, the file index increment (default: 1).",
+)
+@click.option(
+    "--watch",
+    is_flag=True,
+    default=False,
+    help=(
+        "Convert each frame as soon as it appears in root (e.g. while the "
+        "solver and svpost are running) until START-STOP are all converted."
+    ),
+)
+@click.option(
+    "--current_name",
+    default="all_results_",
+    help="In watch mode, also convert frames named {current_name}N (svpost output).",
+)
+@click.option(
+    "--poll_interval",
+    default=5.0,
+    type=float,
+    help="In watch mode, seconds between checks for new frames (default: 5).",
+)
+@click.option(
+    "--idle_timeout",
+    default=None,
+    type=float,
+    help="In watch mode, stop after this many seconds without new frames.",
+)
+@click.option(
+    "--max_workers",
+    default=1,
+    type=click.IntRange(min=1),
+    help="Processes converting frames in parallel (default: 1).",
+)
+@click.option(
+    "--service",
+    is_flag=True,
+    default=False,
+    help=(
+        "Run on the warm workers of the flowvcutils service if it is running "
+        "(see the service command), otherwise in this process."
+    ),
+)
+@click.option(
+    "--plan",
+    is_flag=True,
+    default=False,
+    help=(
+        "Write nothing, print the output size, the free disk space and an "
+        "estimate of the run time from converting the first frame in memory. "
+        "Exits with 1 if the output does not fit."
+    ),
+)
+@click.pass_context
 def vtu2bin(
+    ctx,
     start,
     stop,
     batch,
@@ -99,6 +369,16 @@ def vtu2bin(
     increment,
     num_digits,
     field_name,
+    input_pattern,
+    current_start,
+    current_increment,
+    watch,
+    current_name,
+    poll_interval,
+    idle_timeout,
+    max_workers,
+    service,
+    plan,
 ):
     """
     Convert .vtu files into .bin format for FlowVC.
@@ -110,8 +390,69 @@ def vtu2bin(
     if not file_name:
         file_name = os.path.basename(os.path.normpath(root))
 
-    if batch:
-        process_directory(
+    if plan:
+        if watch:
+            raise click.UsageError("--plan plans a conversion, not --watch")
+        plan_kwargs = dict(
+            extension=extension,
+            start=start,
+            stop=stop,
+            increment=increment,
+            num_digits=num_digits,
+            field_name=field_name,
+            input_pattern=input_pattern,
+            current_start=current_start,
+            current_increment=current_increment,
+            max_workers=max_workers,
+        )
+        if batch:
+            plans = plan_directory(root=root, **plan_kwargs)
+        else:
+            plans = [
+                plan_folder(
+                    root=root, output=output, file_name=file_name, **plan_kwargs
+                )
+            ]
+        for folder_plan in plans:
+            click.echo(format_plan(folder_plan))
+        if not all(folder_plan["fits"] for folder_plan in plans):
+            ctx.exit(1)
+        return
+
+    if watch:
+        if batch:
+            raise click.UsageError("--watch watches a single folder, not --batch")
+        if service:
+            raise click.UsageError("--watch runs in this process, not --service")
+        # watch_folder matches frame numbers of any width and does not rename
+        ignored = [
+            f"--{name}"
+            for name in [
+                "input_pattern",
+                "num_digits",
+                "current_start",
+                "current_increment",
+                "max_workers",
+            ]
+            if ctx.get_parameter_source(name) is ParameterSource.COMMANDLINE
+        ]
+        if ignored:
+            raise click.UsageError(f"--watch does not use {', '.join(ignored)}")
+        watch_folder(
+            root=root,
+            output=output,
+            file_name=file_name,
+            extension=extension,
+            field_name=field_name,
+            start=start,
+            stop=stop,
+            increment=increment,
+            current_name=current_name,
+            poll_interval=poll_interval,
+            idle_timeout=idle_timeout,
+        )
+    elif batch:
+        _service_job("process_directory", process_directory, service)(
             root=root,
             extension=extension,
             start=start,
@@ -119,10 +460,14 @@ def vtu2bin(
             increment=increment,
             num_digits=num_digits,
             field_name=field_name,
+            input_pattern=input_pattern,
+            current_start=current_start,
+            current_increment=current_increment,
+            max_workers=max_workers,
         )
 
     else:
-        process_folder(
+        _service_job("process_folder", process_folder, service)(
             root=root,
             output=output,
             file_name=file_name,
@@ -132,6 +477,10 @@ def vtu2bin(
             increment=increment,
             num_digits=num_digits,
             field_name=field_name,
+            input_pattern=input_pattern,
+            current_start=current_start,
+            current_increment=current_increment,
+            max_workers=max_workers,
         )
 
 
@@ -139,7 +488,7 @@ def vtu2bin(
 @click.option(
     "-d",
     "--directory",
-    default=os.getcwd(),
+    default=os.getcwd,
     help="Directory to run program (default: current dir)",
 )
 @click.option(
@@ -167,9 +516,111 @@ def vtu2bin(
     default=None,
     help="Manually specify [min_x min_y min_z max_x max_y max_z].",
 )
-def inigenerator(directory, auto_range, cell_size, direction, batch, manual_bounds):
+@click.option(
+    "--vtu_dir",
+    default="input_vtu",
+    help=(
+        "Directory with the .vtu files, relative to the case directory or "
+        "absolute (default: input_vtu)."
+    ),
+)
+@click.option(
+    "--input_pattern",
+    default=None,
+    help=(
+        "Name pattern of the .vtu frames, e.g. all_results_{index:05d}.vtu, "
+        "the lowest index is read (default: any .vtu file)."
+    ),
+)
+@click.option(
+    "--memory_budget",
+    type=float,
+    default=None,
+    help="Memory available to flowVC in GB, warns if the estimate exceeds it.",
+)
+@click.option(
+    "--time_budget",
+    type=float,
+    default=None,
+    help="Allowed flowVC runtime in hours, warns if the estimate exceeds it.",
+)
+@click.option(
+    "--fit_cell_size",
+    is_flag=True,
+    default=False,
+    help=(
+        "Use the finest cell size (no smaller than --cell_size) that fits "
+        "--memory_budget and --time_budget."
+    ),
+)
+@click.option(
+    "--tracer_seeds",
+    type=click.Choice(["plane", "sphere", "volume"], case_sensitive=False),
+    default=None,
+    help=(
+        "Compute tracers instead of FTLE, seeded on a plane (disc), in a "
+        "sphere or throughout the mesh volume. Seeds outside the mesh are "
+        "dropped and written to input_bin/{name}_seeds.bin (format 4)."
+    ),
+)
+@click.option(
+    "--tracer_spacing",
+    type=float,
+    default=0.001,
+    help="Distance between tracer seeds, default 0.001",
+)
+@click.option(
+    "--tracer_center",
+    nargs=3,
+    type=float,
+    default=None,
+    help="Center [x y z] of the plane or sphere seeds.",
+)
+@click.option(
+    "--tracer_normal",
+    nargs=3,
+    type=float,
+    default=(0.0, 0.0, 1.0),
+    help="Normal [x y z] of the plane seeds, default 0 0 1",
+)
+@click.option(
+    "--tracer_radius",
+    type=float,
+    default=None,
+    help="Radius of the plane or sphere seeds.",
+)
+@click.option(
+    "--service",
+    is_flag=True,
+    default=False,
+    help=(
+        "Run on the warm workers of the flowvcutils service if it is running "
+        "(see the service command), otherwise in this process."
+    ),
+)
+def inigenerator(
+    directory,
+    auto_range,
+    cell_size,
+    direction,
+    batch,
+    manual_bounds,
+    vtu_dir,
+    input_pattern,
+    memory_budget,
+    time_budget,
+    fit_cell_size,
+    tracer_seeds,
+    tracer_spacing,
+    tracer_center,
+    tracer_normal,
+    tracer_radius,
+    service,
+):
     """
     Generate a .ini file for the flow vc.
+
+    Logs an estimate of the FTLE grid size, output size, memory and runtime.
     """
     if manual_bounds:
         # parse 6 numbers into two (x,y,z) points
@@ -177,8 +628,111 @@ def inigenerator(directory, auto_range, cell_size, direction, batch, manual_boun
         manual_bounds_tuple = ((min_x, min_y, min_z), (max_x, max_y, max_z))
     else:
         manual_bounds_tuple = None
-    inigenerator_main(
-        directory, auto_range, cell_size, direction, batch, manual_bounds_tuple
+    if fit_cell_size and memory_budget is None and time_budget is None:
+        raise click.UsageError("--fit_cell_size needs --memory_budget or --time_budget")
+    tracer_seed_kwargs = None
+    if tracer_seeds:
+        if tracer_seeds != "volume" and (not tracer_center or tracer_radius is None):
+            raise click.UsageError(
+                f"--tracer_seeds {tracer_seeds} needs --tracer_center and "
+                "--tracer_radius"
+            )
+        tracer_seed_kwargs = dict(
+            shape=tracer_seeds,
+            spacing=tracer_spacing,
+            center=tracer_center,
+            normal=tracer_normal,
+            radius=tracer_radius,
+        )
+    try:
+        _service_job("inigenerator", inigenerator_main, service)(
+            directory,
+            auto_range,
+            cell_size,
+            direction,
+            batch,
+            manual_bounds_tuple,
+            memory_budget=None if memory_budget is None else memory_budget * 1e9,
+            time_budget=None if time_budget is None else time_budget * 3600,
+            fit_cell_size=fit_cell_size,
+            tracer_seeds=tracer_seed_kwargs,
+            vtu_dir=vtu_dir,
+            input_pattern=input_pattern,
+        )
+    except ValueError as e:
+        if not fit_cell_size:
+            raise
+        # The budgets cannot be met at any cell size.
+        raise click.UsageError(str(e))
+
+
+@cli.command()
+@click.option(
+    "-d",
+    "--directory",
+    default=os.getcwd,
+    help="Case directory to sweep (default: current dir)",
+)
+@click.option(
+    "-p",
+    "--param",
+    "parameters",
+    multiple=True,
+    help=(
+        "A .in key and the comma separated values to sweep, "
+        "e.g. -p Int_TimeStep=5e-6,1e-5 -p FTLE_IntTLength=0.5,1.0"
+    ),
+)
+@click.option(
+    "--direction",
+    "directions",
+    type=click.Choice(["forward", "backward"], case_sensitive=False),
+    multiple=True,
+    default=["backward"],
+    help="FTLE directions to sweep, repeat for both (default: backward)",
+)
+@click.option(
+    "-o",
+    "--output",
+    default=None,
+    help="Directory for the combination directories (default: directory/sweep)",
+)
+@click.option(
+    "--auto_range",
+    default=True,
+    help="Get data and FTLE range(min-max) using a .vtu file?",
+)
+@click.option(
+    "--cell_size", type=float, default=0.001, help="size of FTLE element, default 0.001"
+)
+@click.option(
+    "--manual_bounds",
+    nargs=6,
+    type=float,
+    default=None,
+    help="Manually specify [min_x min_y min_z max_x max_y max_z].",
+)
+def inisweep(
+    directory, parameters, directions, output, auto_range, cell_size, manual_bounds
+):
+    """
+    Generate a .in file for every combination of swept parameters.
+
+    Each combination is written to OUTPUT/{key}-{value}__.../ with its own
+    output_bin directory, ready for flowvcutils run --batch -d OUTPUT.
+    """
+    if manual_bounds:
+        manual_bounds = (tuple(manual_bounds[:3]), tuple(manual_bounds[3:]))
+    else:
+        manual_bounds = None
+    inisweep_main(
+        directory,
+        list(parameters),
+        list(directions),
+        output_directory=output,
+        auto_range=auto_range,
+        cell_size=cell_size,
+        manual_bounds=manual_bounds,
     )
 
 
@@ -186,7 +740,7 @@ def inigenerator(directory, auto_range, cell_size, direction, batch, manual_boun
 @click.option(
     "-d",
     "--directory",
-    default=os.getcwd(),
+    default=os.getcwd,
     help="Directory to run program (default: current dir)",
 )
 @click.option(
@@ -202,18 +756,43 @@ def inigenerator(directory, auto_range, cell_size, direction, batch, manual_boun
     default=[],
     help="Optional list of file names to exclude (space-separated).",
 )
-def simulationgenerator(directory, exclude, svpre_exe):
+@click.option(
+    "-j",
+    "--max_jobs",
+    type=click.IntRange(min=1),
+    default=1,
+    help="Number of cases to preprocess at once (default: 1)",
+)
+@click.option(
+    "--materialize",
+    type=click.Choice(MATERIALIZE_MODES),
+    default="copy",
+    help=(
+        "copy generic_file for each case, or link its read only mesh files "
+        "(reflink, hardlink or symlink) to save disk space"
+    ),
+)
+@click.pass_context
+def simulationgenerator(ctx, directory, exclude, svpre_exe, max_jobs, materialize):
     """
     Generate the simulation directorys.
     """
-    simulationgenerator_main(directory, list(exclude), svpre_exe)
+    records = simulationgenerator_main(
+        directory,
+        list(exclude),
+        svpre_exe,
+        max_jobs=max_jobs,
+        materialize=materialize,
+    )
+    if any(record["exit_status"] != 0 for record in records or []):
+        ctx.exit(1)
 
 
 @cli.command()
 @click.option(
     "-d",
     "--directory",
-    default=os.getcwd(),
+    default=os.getcwd,
     help="Directory to run program (default: current dir)",
 )
 @click.option(
@@ -226,7 +805,22 @@ def simulationgenerator(directory, exclude, svpre_exe):
     default="all_results_",
     help="Current file name (default:all_results).",
 )
-def filerename(directory, prefix, current_name):
+@click.option(
+    "--max_workers",
+    default=DEFAULT_MAX_WORKERS,
+    type=click.IntRange(min=1),
+    help=f"Renames to issue at once (default: {DEFAULT_MAX_WORKERS}).",
+)
+@click.option(
+    "--view",
+    default=None,
+    type=click.Path(file_okay=False),
+    help=(
+        "Create symlinks with the new names in this directory instead of "
+        "renaming, e.g. for vtu2bin --root. Rerun to update it."
+    ),
+)
+def filerename(directory, prefix, current_name, max_workers, view):
     """Rename the files in a directory
 
     Example\n
@@ -245,7 +839,12 @@ def filerename(directory, prefix, current_name):
     """
     route = "file_name"
     filerename_main(
-        route=route, directory=directory, prefix=prefix, current_name=current_name
+        route=route,
+        directory=directory,
+        prefix=prefix,
+        current_name=current_name,
+        max_workers=max_workers,
+        view=view,
     )
 
 
@@ -253,7 +852,7 @@ def filerename(directory, prefix, current_name):
 @click.option(
     "-d",
     "--directory",
-    default=os.getcwd(),
+    default=os.getcwd,
     help="Directory to run program (default: current dir)",
 )
 @click.option(
@@ -286,6 +885,21 @@ def filerename(directory, prefix, current_name):
     default=50,
     help="New file numbering increment.",
 )
+@click.option(
+    "--max_workers",
+    default=DEFAULT_MAX_WORKERS,
+    type=click.IntRange(min=1),
+    help=f"Renames to issue at once (default: {DEFAULT_MAX_WORKERS}).",
+)
+@click.option(
+    "--view",
+    default=None,
+    type=click.Path(file_okay=False),
+    help=(
+        "Create symlinks with the new names in this directory instead of "
+        "renaming, e.g. for vtu2bin --root. Rerun to update it."
+    ),
+)
 def filerenumber(
     directory,
     prefix,
@@ -294,6 +908,8 @@ def filerenumber(
     current_increment,
     new_start,
     increment,
+    max_workers,
+    view,
 ):
     """Renumber the files in a directory
 
@@ -321,11 +937,315 @@ def filerenumber(
         current_increment=current_increment,
         new_start=new_start,
         increment=increment,
+        max_workers=max_workers,
+        view=view,
+    )
+
+
+@cli.command()
+@click.argument("in_files", nargs=-1, type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    "-d",
+    "--directory",
+    default=os.getcwd,
+    help=(
+        "Directory to search for .in files when none are given "
+        "(default: current dir). Searches directory and directory/input_bin."
+    ),
+)
+@click.option(
+    "--batch",
+    is_flag=True,
+    default=False,
+    help="Search directory/subdir and directory/subdir/input_bin for .in files.",
+)
+@click.option(
+    "-j",
+    "--max_jobs",
+    type=click.IntRange(min=1),
+    default=1,
+    help="Maximum number of flowVC jobs to run at once (default: 1).",
+)
+@click.option(
+    "--cpus",
+    default=None,
+    help=(
+        "Optional cpu list to pin jobs to, e.g. 0-7 or 0,2,4,6. "
+        "The cpus are split evenly between the concurrent jobs."
+    ),
+)
+@click.option(
+    "--flowvc_exe",
+    default=DEFAULT_FLOWVC_EXE,
+    help="flowVC executable, the .in file is appended (default: flowVC).",
+)
+@click.option(
+    "--summary",
+    "summary_path",
+    default=None,
+    help="JSON summary file (default: directory/flowvc_run_summary.json).",
+)
+@click.option(
+    "--force",
+    is_flag=True,
+    default=False,
+    help="Run every job even if its outputs are up to date.",
+)
+@click.pass_context
+def run(
+    ctx, in_files, directory, batch, max_jobs, cpus, flowvc_exe, summary_path, force
+):
+    """
+    Run flowVC on a set of .in files.
+
+    IN_FILES: optional .in files to run (default: search --directory).
+    """
+    summary = jobrunner_main(
+        list(in_files),
+        directory,
+        batch=batch,
+        max_jobs=max_jobs,
+        cpus=cpus,
+        flowvc_exe=flowvc_exe,
+        summary_path=summary_path,
+        force=force,
+    )
+    if summary["n_failed"]:
+        ctx.exit(1)
+
+
+@cli.command()
+@click.option(
+    "-d",
+    "--directory",
+    default=os.getcwd,
+    help="simulationgenerator directory holding the cases (default: current dir)",
+)
+@click.option(
+    "--case",
+    "cases",
+    multiple=True,
+    help="Case to run, repeat for more (default: every case with a .sjb file)",
+)
+@click.option(
+    "-n",
+    "--ranks",
+    type=click.IntRange(min=1),
+    default=1,
+    help="MPI ranks for each case (default: 1)",
+)
+@click.option(
+    "-c",
+    "--core_budget",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Total cores the running cases may use (default: all cpus)",
+)
+@click.option(
+    "--solver_command",
+    default=DEFAULT_SOLVER_COMMAND,
+    help=(
+        "Solver command run in each case directory, {ranks}, {case} and "
+        "{case_dir} are filled in."
+    ),
+)
+@click.option(
+    "--retries",
+    type=click.IntRange(min=0),
+    default=1,
+    help="Restarts from numstart.dat after a failure (default: 1)",
+)
+@click.option(
+    "--summary",
+    "summary_path",
+    default=None,
+    help="JSON summary file (default: directory/solver_run_summary.json).",
+)
+@click.pass_context
+def solverscheduler(
+    ctx, directory, cases, ranks, core_budget, solver_command, retries, summary_path
+):
+    """
+    Run the solver for the simulationgenerator cases.
+    """
+    summary = solverscheduler_main(
+        directory,
+        cases=list(cases),
+        ranks=ranks,
+        core_budget=core_budget,
+        solver_command=solver_command,
+        retries=retries,
+        summary_path=summary_path,
+    )
+    if summary["n_failed"]:
+        ctx.exit(1)
+
+
+@cli.command()
+@click.argument("start", type=int)
+@click.argument("stop", type=int)
+@click.option(
+    "-d",
+    "--directory",
+    default=os.getcwd,
+    help=(
+        "A case directory (with input_vtu/) or a directory of them "
+        "(default: current dir)"
+    ),
+)
+@click.option(
+    "--case",
+    "cases",
+    multiple=True,
+    help="Case to run, repeat for more (default: every case in --directory)",
+)
+@click.option(
+    "--stage",
+    "stages",
+    multiple=True,
+    type=click.Choice(list(PIPELINE_STAGES)),
+    help="Stage to run, repeat for more (default: all of them)",
+)
+@click.option(
+    "--increment",
+    default=50,
+    type=int,
+    help="Increment between each vtu file (default: 50).",
+)
+@click.option(
+    "--num_digits",
+    default=5,
+    type=int,
+    help="Digits in the renamed file names (default: 5).",
+)
+@click.option(
+    "--field_name",
+    default="velocity",
+    help="Field name for velocity data within the .vtu files (default: 'velocity').",
+)
+@click.option(
+    "--current_name",
+    default="all_results_",
+    help="Name of the raw frames to rename (default: all_results_).",
+)
+@click.option(
+    "--cell_size", type=float, default=0.001, help="size of FTLE element, default 0.001"
+)
+@click.option(
+    "--direction",
+    type=click.Choice(["forward", "backward"], case_sensitive=False),
+    default="backward",
+    help="forward or backward ftle",
+)
+@click.option(
+    "--flowvc_exe",
+    default=DEFAULT_FLOWVC_EXE,
+    help="flowVC executable (default: flowVC on the PATH).",
+)
+@click.option(
+    "-j",
+    "--max_jobs",
+    type=click.IntRange(min=1),
+    default=1,
+    help="Stages (of any case) to run at once (default: 1).",
+)
+@click.option(
+    "--max_workers",
+    default=1,
+    type=click.IntRange(min=1),
+    help="Processes converting frames in each vtu2bin stage (default: 1).",
+)
+@click.option(
+    "--force",
+    is_flag=True,
+    default=False,
+    help="Run every stage even if it is up to date.",
+)
+@click.option(
+    "--summary",
+    "summary_path",
+    default=None,
+    help="JSON summary file (default: directory/pipeline_summary.json).",
+)
+@click.pass_context
+def pipeline(
+    ctx,
+    start,
+    stop,
+    directory,
+    cases,
+    stages,
+    increment,
+    num_digits,
+    field_name,
+    current_name,
+    cell_size,
+    direction,
+    flowvc_exe,
+    max_jobs,
+    max_workers,
+    force,
+    summary_path,
+):
+    """
+    Run rename, vtu2bin, inigenerator and flowVC for each case.
+
+    Stages whose inputs and outputs did not change since they last ran are
+    skipped. A failed stage stops the later stages of its case.
+
+    START: first time step to convert (positional argument).
+    STOP : last time step to convert (positional argument).
+    """
+    summary = pipeline_main(
+        directory,
+        start,
+        stop,
+        cases=list(cases),
+        stages=list(stages) or None,
+        max_jobs=max_jobs,
+        force=force,
+        summary_path=summary_path,
+        increment=increment,
+        num_digits=num_digits,
+        field_name=field_name,
+        current_name=current_name,
+        cell_size=cell_size,
+        direction=direction,
+        flowvc_exe=flowvc_exe,
+        max_workers=max_workers,
     )
+    if summary["n_failed"]:
+        ctx.exit(1)
+
+
+@cli.command()
+@click.option(
+    "--socket",
+    "socket_path",
+    default=None,
+    help=(
+        "Unix domain socket to listen on (default: $FLOWVCUTILS_SOCKET or "
+        "flowvcutils-USER.sock in the temp directory)."
+    ),
+)
+@click.option(
+    "-w",
+    "--workers",
+    type=click.IntRange(min=1),
+    default=SERVICE_WORKERS,
+    help="Warm worker processes, the jobs run at once (default: 4).",
+)
+def service(socket_path, workers):
+    """
+    Run vtu2bin and inigenerator jobs on warm workers until interrupted.
+
+    The workers import vtk once, vtu2bin --service and inigenerator
+    --service then run on them without the startup cost.
+    """
+    service_main(socket_path=socket_path, workers=workers)
 
 
 def main():
-    settup_logging()
     cli()
 
 
@@ -1,19 +1,56 @@
 import logging.config
 import logging.handlers
+import re
+import json
+import threading
+from typing import Dict, List, Optional, TextIO
+from concurrent.futures import ThreadPoolExecutor
 from flowvcutils.jsonlogger import settup_logging
-from shutil import move
 import os
 
 logger = logging.getLogger(__name__)
 
 
-def rename_files(directory, prefix=None, current_name="all_results_"):
+JOURNAL_NAME = ".filerename_journal.jsonl"
+DEFAULT_MAX_WORKERS = 8
+
+
+def scan_directory(directory):
+    """Return the names in directory from a single os.scandir."""
+    with os.scandir(directory) as entries:
+        return {entry.name for entry in entries}
+
+
+def name_mapping(names, prefix, current_name="all_results_"):
+    """Map {current_name}*_{identifier}.vtu names to {prefix}_{identifier}.vtu"""
+    mapping = {}
+    for filename in names:
+        if filename.startswith(current_name) and filename.endswith(".vtu"):
+            # Extract the unique identifier from the filename
+            identifier = filename.split("_")[-1].replace(".vtu", "")
+            mapping[filename] = f"{prefix}_{identifier}.vtu"
+    return mapping
+
+
+def rename_files(
+    directory,
+    prefix=None,
+    current_name="all_results_",
+    max_workers=DEFAULT_MAX_WORKERS,
+    view=None,
+):
     """
     Rename all .vtu files in the specified directory.
 
+    Existing files are not overwritten, a file whose new name is taken by a
+    file that is not renamed itself is left as it is (see plan_renames).
+
     Args:
         directory (str): Path to the directory containing .vtu files.
         prefix (str): Optional prefix for renaming. Defaults to directory name.
+        max_workers (int): Renames to issue at once.
+        view (str): Optional directory to create symlinks with the new names
+            in (see build_view) instead of renaming the files.
     """
     # Get the directory name for default prefix
     if prefix is None:
@@ -27,20 +64,15 @@ def rename_files(directory, prefix=None, current_name="all_results_"):
         logger.error(f"Error: Directory '{directory}' does not exist.")
         return
 
-    # Process each file
-    for filename in os.listdir(directory):
-        if filename.startswith(current_name) and filename.endswith(".vtu"):
-            # Extract the unique identifier from the filename
-            identifier = filename.split("_")[-1].replace(".vtu", "")
-
-            # Construct the new filename
-            new_name = f"{prefix}_{identifier}.vtu"
-
-            # Rename the file
-            old_path = os.path.join(directory, filename)
-            new_path = os.path.join(directory, new_name)
-            os.rename(old_path, new_path)
-            logger.info(f"Renamed: {filename} -> {new_name}")
+    if view is None:
+        resume_journal(directory, max_workers)
+    # scanned after the journal is replayed so the index is current
+    names = scan_directory(directory)
+    mapping = name_mapping(names, prefix, current_name)
+    if view is not None:
+        build_view(directory, mapping, view, max_workers)
+        return
+    apply_renames(directory, mapping, names, max_workers)
 
 
 def create_rename_map(
@@ -57,6 +89,67 @@ def create_rename_map(
     return mapping
 
 
+def input_matcher(pattern):
+    """
+    Return a function giving the index in a file name, or None if it does not match.
+
+    pattern is either a template with an {index} field, e.g.
+    all_results_{index:05d}.vtu or case.{index}.vtk, or a regular expression
+    whose first group is the index, e.g. all_results_(\\d+)\\.vtu
+    """
+    if "{index" in pattern:
+        prefix, rest = pattern.split("{index", 1)
+        suffix = rest[rest.index("}") + 1 :]
+        pattern = re.escape(prefix) + r"(\d+)" + re.escape(suffix)
+    compiled = re.compile(pattern)
+
+    def _match(name):
+        match = compiled.fullmatch(name)
+        return int(match.group(1)) if match else None
+
+    return _match
+
+
+def resolve_inputs(directory, pattern, index_map=None):
+    """
+    Find the input files matching pattern with a single directory scan.
+
+    Files are used where they are, nothing is renamed.
+
+    Args:
+        directory (str): Directory with the input files.
+        pattern (str): See input_matcher.
+        index_map (dict): Optional {file index: number} (see
+            create_rename_map), files whose index is not in it are ignored.
+            Without it the file index is the number.
+
+    Returns:
+        dict: {number: file path}
+    """
+    match = input_matcher(pattern)
+    inputs = {}
+    for name in scan_directory(directory):
+        index = match(name)
+        if index is None:
+            continue
+        if index_map is not None:
+            if index not in index_map:
+                continue
+            index = index_map[index]
+        inputs[index] = os.path.join(directory, name)
+    return inputs
+
+
+def number_mapping(names, prefix, mapping):
+    """Map {prefix}.{old}.vtk to {prefix}.{new}.vtk for the names that exist."""
+    renames = {}
+    for old, new in mapping.items():
+        old_name = f"{prefix}.{old}.vtk"
+        if old_name in names:
+            renames[old_name] = f"{prefix}.{new}.vtk"
+    return renames
+
+
 def renumber_files(
     directory,
     prefix=None,
@@ -65,9 +158,14 @@ def renumber_files(
     current_increment=1,
     new_start=3000,
     increment=50,
+    max_workers=DEFAULT_MAX_WORKERS,
+    view=None,
 ):
+    if view is None:
+        resume_journal(directory, max_workers)
+    names = scan_directory(directory)
     if prefix is None:
-        for filename in os.listdir(directory):
+        for filename in sorted(names):
             if filename.endswith(".vtk"):
                 prefix = filename.rsplit(".", 2)[0]  # remove last 2 dots
                 break  # Exit after finding the first .vtk file
@@ -79,21 +177,232 @@ def renumber_files(
         new_start=new_start,
         increment=increment,
     )
-    temp_suffix = ".tmp"
-    for old in mapping:
-        old_file = os.path.join(directory, f"{prefix}.{old}.vtk")
-        temp_file = os.path.join(directory, f"{prefix}.{old}{temp_suffix}.vtk")
-        if os.path.exists(old_file):
-            logger.debug(f"Temporaraly renaming: {old_file} -> {temp_file}")
-            move(str(old_file), str(temp_file))
+    renames = number_mapping(names, prefix, mapping)
+    if view is not None:
+        build_view(directory, renames, view, max_workers)
+        return
+    apply_renames(directory, renames, names, max_workers)
 
-    for old, new in mapping.items():
-        temp_file = os.path.join(directory, f"{prefix}.{old}{temp_suffix}.vtk")
-        new_file = os.path.join(directory, f"{prefix}.{new}.vtk")
-        if os.path.exists(temp_file):
-            logger.debug(f"Renaming: {temp_file} -> {new_file}")
-            logger.info(f"Renaming: {old} -> {new}")
-            move(str(temp_file), str(new_file))
+
+def build_view(directory, mapping, view_dir, max_workers=DEFAULT_MAX_WORKERS):
+    """
+    Create a directory of symlinks with the new names of mapping.
+
+    view_dir/{new} links to directory/{old}, the source files are not
+    touched. Rebuilding a view keeps links that are already correct and
+    removes stale links into directory (other files and links in view_dir
+    are left alone). The links are created concurrently.
+    """
+    os.makedirs(view_dir, exist_ok=True)
+    source_dir = os.path.abspath(directory)
+    targets = {new: os.path.join(source_dir, old) for old, new in mapping.items()}
+    stale = []
+    with os.scandir(view_dir) as entries:
+        for entry in entries:
+            if not entry.is_symlink():
+                if entry.name in targets:
+                    logger.error(f"Not linking {entry.path}, a file is in the way")
+                    del targets[entry.name]
+                continue
+            link_target = os.readlink(entry.path)
+            resolved = os.path.abspath(os.path.join(view_dir, link_target))
+            if targets.get(entry.name) == link_target:
+                del targets[entry.name]
+            elif resolved.startswith(source_dir + os.sep):
+                stale.append(entry.path)
+            elif entry.name in targets:
+                logger.error(f"Not linking {entry.path}, another link is in the way")
+                del targets[entry.name]
+
+    def _link(item):
+        name, target = item
+        os.symlink(target, os.path.join(view_dir, name))
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        list(executor.map(os.remove, stale))
+        list(executor.map(_link, targets.items()))
+    logger.info(
+        f"View {view_dir}: {len(targets)} links created, {len(stale)} removed, "
+        f"{len(mapping) - len(targets)} unchanged"
+    )
+
+
+def _temp_name(name, taken):
+    """A name for name to wait under while a rename cycle is resolved."""
+    temp_name = f"{name}.tmp"
+    count = 0
+    while temp_name in taken:
+        count += 1
+        temp_name = f"{name}.tmp{count}"
+    taken.add(temp_name)
+    return temp_name
+
+
+def plan_renames(mapping, names):
+    """
+    Order the renames in mapping so no file is overwritten.
+
+    Renames whose targets are also being renamed are grouped into chains.
+    A chain a -> b -> c is run as b -> c then a -> b. A cycle a -> b -> a
+    is the only case that needs a temporary name (a -> tmp, b -> a,
+    tmp -> b). Chains are independent of each other and can run at once.
+    Renames onto an existing file that is not itself renamed, or onto the
+    same target as another rename, are skipped with an error.
+
+    Args:
+        mapping (dict): {old name: new name}
+        names (set): Every name in the directory.
+
+    Returns:
+        list: Chains, each a list of (source, destination) in run order.
+    """
+    moves = {src: dst for src, dst in mapping.items() if src != dst}
+    targets: Dict[str, List[str]] = {}
+    for src, dst in moves.items():
+        targets.setdefault(dst, []).append(src)
+    for dst, srcs in targets.items():
+        if len(srcs) > 1:
+            logger.error(f"Not renaming {sorted(srcs)}, they would all be {dst}")
+            for src in srcs:
+                del moves[src]
+
+    # a blocked rename leaves its source in place, which can block another
+    while True:
+        blocked = [
+            src for src, dst in moves.items() if dst in names and dst not in moves
+        ]
+        if not blocked:
+            break
+        for src in blocked:
+            logger.error(f"Not renaming {src}, {moves[src]} already exists")
+            del moves[src]
+
+    sources = {dst: src for src, dst in moves.items()}
+    taken = set(names) | set(moves.values())
+    chains = []
+    visited = set()
+    # paths start at a source that is not another rename's target
+    for head in sorted(src for src in moves if src not in sources):
+        path = []
+        src = head
+        while src in moves:
+            path.append((src, moves[src]))
+            visited.add(src)
+            src = moves[src]
+        chains.append(path[::-1])
+    # what remains are cycles
+    for head in sorted(moves):
+        if head in visited:
+            continue
+        path = []
+        src = head
+        while src not in visited:
+            visited.add(src)
+            path.append((src, moves[src]))
+            src = moves[src]
+        temp_name = _temp_name(head, taken)
+        first_target = path[0][1]
+        chains.append([(head, temp_name)] + path[:0:-1] + [(temp_name, first_target)])
+    return chains
+
+
+class renameJournal:
+    """
+    Append only record of a rename plan and the steps completed.
+
+    The first line is the plan, each following line is a completed
+    [chain, step]. If the process is killed the plan is resumed from the
+    first step not recorded.
+    """
+
+    def __init__(self, directory):
+        self.path = os.path.join(directory, JOURNAL_NAME)
+        self.lock = threading.Lock()
+        self.file: Optional[TextIO] = None
+
+    def _open_file(self):
+        if self.file is None:
+            raise RuntimeError(f"The journal {self.path} is not open")
+        return self.file
+
+    def start(self, chains):
+        self.file = open(self.path, "w")
+        self.file.write(json.dumps({"chains": chains}) + "\n")
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def resume(self):
+        """Open an existing journal, return (chains, completed steps)."""
+        with open(self.path) as f:
+            lines = f.read().splitlines()
+        chains = json.loads(lines[0])["chains"]
+        done = set()
+        for line in lines[1:]:
+            try:
+                done.add(tuple(json.loads(line)))
+            except ValueError:
+                break  # a partly written last line
+        self.file = open(self.path, "a")
+        return chains, done
+
+    def record(self, chain, step):
+        with self.lock:
+            journal_file = self._open_file()
+            journal_file.write(json.dumps([chain, step]) + "\n")
+            journal_file.flush()
+
+    def finish(self):
+        self._open_file().close()
+        self.file = None
+        os.remove(self.path)
+
+
+def execute_plan(directory, chains, journal, done=(), max_workers=DEFAULT_MAX_WORKERS):
+    """Run the chains of a rename plan concurrently, each chain in order."""
+
+    def _run_chain(chain_index):
+        for step, (src, dst) in enumerate(chains[chain_index]):
+            if (chain_index, step) in done:
+                continue
+            src_path = os.path.join(directory, src)
+            dst_path = os.path.join(directory, dst)
+            try:
+                os.rename(src_path, dst_path)
+            except FileNotFoundError:
+                if not os.path.exists(dst_path):
+                    raise
+                # renamed before an interruption but not recorded
+            logger.debug(f"Renamed: {src} -> {dst}")
+            journal.record(chain_index, step)
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        list(executor.map(_run_chain, range(len(chains))))
+
+
+def apply_renames(directory, mapping, names, max_workers=DEFAULT_MAX_WORKERS):
+    """Plan and run the renames in mapping, names is the directory index."""
+    chains = plan_renames(mapping, names)
+    if not chains:
+        logger.info("Nothing to rename")
+        return
+    journal = renameJournal(directory)
+    journal.start(chains)
+    execute_plan(directory, chains, journal, max_workers=max_workers)
+    journal.finish()
+    n_renames = sum(len(chain) for chain in chains)
+    logger.info(f"{n_renames} renames done in {len(chains)} independent chains")
+
+
+def resume_journal(directory, max_workers=DEFAULT_MAX_WORKERS):
+    """Finish a rename plan that was interrupted, if there is one."""
+    journal = renameJournal(directory)
+    if not os.path.isfile(journal.path):
+        return
+    chains, done = journal.resume()
+    logger.warning(f"Resuming interrupted renames from {journal.path}")
+    done = {(chain, step) for chain, step in done}
+    execute_plan(directory, chains, journal, done=done, max_workers=max_workers)
+    journal.finish()
 
 
 def main(route, **kwags):
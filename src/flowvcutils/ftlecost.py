@@ -0,0 +1,163 @@
+import os
+import math
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Rough per item costs of a flowVC FTLE run on an unstructured mesh.
+# FTLE_MeshPt holds the seed, advected position, FTLE values and
+# element/left-domain bookkeeping for every grid point.
+FTLE_POINT_BYTES = 96
+# Coordinates (3 doubles) plus two velocity frames (2 x 3 doubles) per node.
+NODE_BYTES = 72
+# Connectivity and adjacency (4 ints each) per element.
+ELEMENT_BYTES = 32
+# FTLE with and without the 1/T scaling, one double per point each.
+OUTPUT_BYTES_PER_POINT = 16
+# Velocity interpolations per integration step for each Int_Type.
+EVALUATIONS_PER_STEP = {0: 1, 1: 4, 2: 6}
+# Seconds per velocity interpolation (point location + interpolation).
+SECONDS_PER_EVALUATION = 2e-7
+
+
+def grid_points(bounds, cell_size):
+    """
+    Number of FTLE grid points for bounds once stretched to fit cell_size.
+
+    Args:
+        bounds (tuple): ((min_x, min_y, min_z), (max_x, max_y, max_z))
+        cell_size (float): FTLE element size.
+    """
+    n_points = 1
+    for pt_min, pt_max in zip(bounds[0], bounds[1]):
+        n_points *= max(1, math.ceil((pt_max - pt_min) / cell_size))
+    return n_points
+
+
+def read_bin_count(file_path):
+    """Read the leading int (node or element count) of a flowVC .bin file."""
+    return int(np.fromfile(file_path, dtype=np.int32, count=1)[0])
+
+
+def estimate_cost(
+    n_points,
+    n_nodes,
+    n_elements,
+    settings,
+    seconds_per_evaluation=SECONDS_PER_EVALUATION,
+):
+    """
+    Estimate the size and runtime of a flowVC FTLE run.
+
+    Args:
+        n_points (int): FTLE grid points (XRes * YRes * ZRes).
+        n_nodes (int): Velocity mesh nodes.
+        n_elements (int): Velocity mesh elements.
+        settings (dict): .in settings with lower case keys (int_type,
+            int_timestep, int_maxtimestep, ftle_inttlength, output_tres).
+        seconds_per_evaluation (float): Cost of one velocity interpolation.
+
+    Returns:
+        dict: grid_points, output_bytes_per_frame, output_bytes_total,
+        memory_bytes, evaluations and runtime_s.
+    """
+    int_type = int(settings.get("int_type", 1))
+    if int_type == 2:
+        time_step = float(settings["int_maxtimestep"])
+    else:
+        time_step = float(settings["int_timestep"])
+    n_steps = math.ceil(abs(float(settings["ftle_inttlength"])) / time_step)
+    n_frames = int(settings.get("output_tres", 1))
+    evaluations = n_points * n_steps * EVALUATIONS_PER_STEP.get(int_type, 4) * n_frames
+    output_bytes_per_frame = n_points * OUTPUT_BYTES_PER_POINT
+    return {
+        "grid_points": n_points,
+        "output_bytes_per_frame": output_bytes_per_frame,
+        "output_bytes_total": output_bytes_per_frame * n_frames,
+        "memory_bytes": (
+            n_points * FTLE_POINT_BYTES
+            + n_nodes * NODE_BYTES
+            + n_elements * ELEMENT_BYTES
+        ),
+        "evaluations": evaluations,
+        "runtime_s": evaluations * seconds_per_evaluation,
+    }
+
+
+def fits_budget(estimate, memory_budget=None, time_budget=None):
+    """True if estimate is within memory_budget (bytes) and time_budget (s)."""
+    if memory_budget is not None and estimate["memory_bytes"] > memory_budget:
+        return False
+    if time_budget is not None and estimate["runtime_s"] > time_budget:
+        return False
+    return True
+
+
+def _round_up(value, significant_figures=3):
+    """Round value up to a number of significant figures."""
+    scale = 10 ** (math.floor(math.log10(value)) - significant_figures + 1)
+    return round(math.ceil(value / scale - 1e-9) * scale, 12)
+
+
+def finest_cell_size(
+    bounds,
+    n_nodes,
+    n_elements,
+    settings,
+    memory_budget=None,
+    time_budget=None,
+    min_cell_size=1e-6,
+):
+    """
+    Find the smallest cell_size (>= min_cell_size) whose run fits the budgets.
+
+    The cost only grows as cells get smaller so the cell size is bisected in
+    log space and the result rounded up to 3 significant figures.
+    """
+
+    def _fits(cell_size):
+        estimate = estimate_cost(
+            grid_points(bounds, cell_size), n_nodes, n_elements, settings
+        )
+        return fits_budget(estimate, memory_budget, time_budget)
+
+    if _fits(min_cell_size):
+        return min_cell_size
+
+    largest = max(pt_max - pt_min for pt_min, pt_max in zip(bounds[0], bounds[1]))
+    if not _fits(largest):
+        raise ValueError(
+            "The mesh alone does not fit in the budget, even a single FTLE cell."
+        )
+
+    low, high = math.log(min_cell_size), math.log(largest)
+    for _ in range(60):
+        mid = (low + high) / 2
+        if _fits(math.exp(mid)):
+            high = mid
+        else:
+            low = mid
+    cell_size = _round_up(math.exp(high))
+    logger.info(f"Finest cell size within budget: {cell_size}")
+    return cell_size
+
+
+def format_estimate(estimate):
+    """A one line human readable summary of an estimate."""
+    return (
+        f"{estimate['grid_points']} FTLE points, "
+        f"{estimate['output_bytes_per_frame'] / 1e6:.1f} MB per output frame "
+        f"({estimate['output_bytes_total'] / 1e9:.2f} GB total), "
+        f"{estimate['memory_bytes'] / 1e9:.2f} GB memory, "
+        f"~{estimate['runtime_s'] / 3600:.1f} h runtime"
+    )
+
+
+def mesh_size_from_bin(data_path, file_name):
+    """Read (n_nodes, n_elements) from the coordinates/connectivity headers."""
+    counts = []
+    for file_type in ["coordinates", "connectivity"]:
+        file_path = os.path.join(data_path, f"{file_name}_{file_type}.bin")
+        counts.append(read_bin_count(file_path) if os.path.isfile(file_path) else 0)
+    return tuple(counts)
@@ -4,15 +4,45 @@ import logging.handlers
 from flowvcutils.jsonlogger import settup_logging
 import configparser
 from .utils import get_project_root
+from . import ftlecost
+from . import tracerseeds
+from .filerename import resolve_inputs
+from .perf import stage_span
 import os
 import math
 
 logger = logging.getLogger(__name__)
 
+CONFIG_FILE_NAME = "config.inigenerator.cfg"
+
+
+def get_config_path(file_name=CONFIG_FILE_NAME):
+    """Path of the .in template in the config directory."""
+    return os.path.join(get_project_root(), "config", file_name)
+
+
+def direction_settings(direction, directory_name):
+    """Settings that change with the FTLE direction (forward keeps the template)."""
+    if direction == "backward":
+        return {
+            "FTLE_OutFilePrefix": f"{directory_name}_backward",
+            "Int_TimeDirection": "-1",
+            "Output_TDelta": "0.05",
+            "Output_TStart": "5.0",
+        }
+    return {}
+
 
 class directoryHandler:
-    def __init__(self, directory):
+    def __init__(self, directory, vtu_dir="input_vtu", input_pattern=None):
+        """
+        vtu_dir is the .vtu directory (relative to directory or absolute).
+        input_pattern (see filerename.input_matcher) selects which files in
+        it are frames, so raw solver output can be used without renaming.
+        """
         self.directory = directory
+        self.vtu_dir = vtu_dir
+        self.input_pattern = input_pattern
         self.__validate_directory(directory)
         self.__set_directory_name()
 
@@ -58,14 +88,25 @@ class directoryHandler:
         self.__validate_directory(sub_directory, create_if_missing)
         return os.path.join(self.directory, sub_dir_name)
 
-    def find_vtu(self, dir_name="input_vtu", create_if_missing=False):
+    def find_vtu(self, dir_name=None, create_if_missing=False):
         """
         Search the current directory and return the first file with a ".vtu" extension.
 
+        With an input_pattern the matching file with the lowest index is used.
+
         Returns:
             str: The filepath of the first .vtu file found.
         """
+        if dir_name is None:
+            dir_name = self.vtu_dir
         subdir = self.get_sub_directory_path(dir_name, create_if_missing)
+        if self.input_pattern is not None:
+            inputs = resolve_inputs(subdir, self.input_pattern)
+            if inputs:
+                return inputs[min(inputs)]
+            raise FileNotFoundError(
+                f"No file matching {self.input_pattern} found in: {subdir}"
+            )
         for file in os.listdir(subdir):
             logger.info(f"Searching {subdir} for a vtu file")
             file_path = os.path.join(subdir, file)
@@ -83,6 +124,9 @@ class resultsProcessor:
         self.min_x, self.max_x = float("inf"), float("-inf")
         self.min_y, self.max_y = float("inf"), float("-inf")
         self.min_z, self.max_z = float("inf"), float("-inf")
+        self.n_nodes = None
+        self.n_elements = None
+        self.data_bounds = None
 
     def streach_bounds(self, pt_min, pt_max, cell_size):
         """Extend data bounds to be evenly divisible.
@@ -148,40 +192,59 @@ class resultsProcessor:
             (self.min_z, self.max_z),
         )
 
-    def find_data_range(self, file_path=None, streach=False, cell_size=0):
-        """
-        Find the min and max x, y, and z coordinates in a .vtu file.
-
-        Args:
-            file_path (str): Path to the .vtu file.
-            streach (bool): extend data to evenly divide by cell size?
-            cell_size (float): Size of cell to ensure evenly divides the data range
-        Returns:
-            tuple: Min and max ranges for x, y, and z coordinates.
-        """
+    def read_data_range(self, file_path=None):
+        """Read the min and max x, y and z coordinates of a .vtu file."""
         if file_path is None:
             file_path = self.directory_handler.find_vtu()
         # Read the .vtu file
         reader = vtk.vtkXMLUnstructuredGridReader()
         reader.SetFileName(file_path)
-        reader.Update()
+        with stage_span("read", logger, path=file_path) as span:
+            reader.Update()
+            span["bytes"] = os.path.getsize(file_path)
+            span["nodes"] = reader.GetOutput().GetNumberOfPoints()
 
         # Get points from the unstructured grid
         data = reader.GetOutput()
         logger.debug(f"Data {data}")
         points = data.GetPoints()
+        self.n_nodes = data.GetNumberOfPoints()
+        self.n_elements = data.GetNumberOfCells()
 
         # Initialize min and max values
 
         # Iterate over all points
-        for i in range(points.GetNumberOfPoints()):
-            x, y, z = points.GetPoint(i)
-            self.min_x = min(self.min_x, x)
-            self.max_x = max(self.max_x, x)
-            self.min_y = min(self.min_y, y)
-            self.max_y = max(self.max_y, y)
-            self.min_z = min(self.min_z, z)
-            self.max_z = max(self.max_z, z)
+        with stage_span("bounds", logger, path=file_path, nodes=self.n_nodes):
+            for i in range(points.GetNumberOfPoints()):
+                x, y, z = points.GetPoint(i)
+                self.min_x = min(self.min_x, x)
+                self.max_x = max(self.max_x, x)
+                self.min_y = min(self.min_y, y)
+                self.max_y = max(self.max_y, y)
+                self.min_z = min(self.min_z, z)
+                self.max_z = max(self.max_z, z)
+        self.data_bounds = (
+            (self.min_x, self.min_y, self.min_z),
+            (self.max_x, self.max_y, self.max_z),
+        )
+
+    def find_data_range(self, file_path=None, streach=False, cell_size=0):
+        """
+        Find the min and max x, y, and z coordinates in a .vtu file.
+
+        Args:
+            file_path (str): Path to the .vtu file.
+            streach (bool): extend data to evenly divide by cell size?
+            cell_size (float): Size of cell to ensure evenly divides the data range
+        Returns:
+            tuple: Min and max ranges for x, y, and z coordinates.
+        """
+        if file_path is None and self.data_bounds is not None:
+            # Reuse the bounds of the .vtu file that was already read
+            self.min_x, self.min_y, self.min_z = self.data_bounds[0]
+            self.max_x, self.max_y, self.max_z = self.data_bounds[1]
+        else:
+            self.read_data_range(file_path)
 
         if streach:
             self.max_x, self.x_points = self.streach_bounds(
@@ -281,17 +344,137 @@ class Config:
         pass
 
     def set_backwards_defaults(self):
+        self.__update_dict.update(direction_settings("backward", self.directory_name))
+
+    def set_tracer_defaults(self, seed_file_name):
+        """Switch from FTLE to tracers read from a format 4 Trace_InFile."""
         self.__update_dict.update(
             {
-                "FTLE_OutFilePrefix": f"{self.directory_name}_backward",
-                "Int_TimeDirection": "-1",
-                "Output_TDelta": "0.05",
-                "Output_TStart": "5.0",
+                "FTLE_Compute": "0",
+                "Trace_Compute": "1",
+                "Trace_GenerateMesh": "0",
+                "Trace_InFile": seed_file_name,
+                "Trace_InFileFormat": "4",
+                "Trace_OutFilePrefix": f"{self.directory_name}_tracer",
             }
         )
 
-    def load_config(self, file_name="config.inigenerator.cfg"):
-        config_path = os.path.join(get_project_root(), "config", file_name)
+    def create_tracer_seeds(
+        self,
+        shape,
+        spacing,
+        center=None,
+        normal=(0, 0, 1),
+        radius=None,
+        file_name=None,
+    ):
+        """
+        Write a Trace_InFile with seeds inside the fluid domain.
+
+        Seeds are generated for the shape (plane, sphere or the mesh bounding
+        volume), points outside the .vtu mesh are dropped and the remainder
+        written to data_path/{directory_name}_seeds.bin in format 4.
+
+        Returns:
+            int: the number of seeds written.
+        """
+        if file_name is None:
+            file_name = f"{self.directory_name}_seeds.bin"
+        mesh = tracerseeds.read_mesh(
+            self.results_processor.directory_handler.find_vtu()
+        )
+        x_min, x_max, y_min, y_max, z_min, z_max = mesh.GetBounds()
+        points = tracerseeds.generate_seeds(
+            shape,
+            spacing,
+            center=center,
+            normal=normal,
+            radius=radius,
+            bounds=((x_min, y_min, z_min), (x_max, y_max, z_max)),
+        )
+        seeds = tracerseeds.filter_to_domain(points, mesh)
+        logger.info(f"{len(seeds)} of {len(points)} {shape} seeds are in the domain")
+        if len(seeds) == 0:
+            logger.warning("No tracer seeds fall inside the fluid domain")
+
+        tracerseeds.write_seed_file(os.path.join(self.data_path, file_name), seeds)
+        self.set_tracer_defaults(file_name)
+        return len(seeds)
+
+    def get_mesh_size(self):
+        """
+        Return (n_nodes, n_elements) of the velocity mesh.
+
+        Uses the .vtu read for the data range when there was one, otherwise
+        the headers of the _coordinates.bin and _connectivity.bin files.
+        """
+        if self.results_processor.n_nodes is not None:
+            return (self.results_processor.n_nodes, self.results_processor.n_elements)
+        return ftlecost.mesh_size_from_bin(self.data_path, self.directory_name)
+
+    def get_ftle_bounds(self, auto_range, manual_bounds=None):
+        """Return the unstretched FTLE bounds ((min xyz), (max xyz))."""
+        if manual_bounds:
+            return manual_bounds
+        if auto_range:
+            x_range, y_range, z_range = self.results_processor.find_data_range()
+            return tuple(zip(x_range, y_range, z_range))
+        outputs = self.config["Outputs"]
+        return tuple(
+            tuple(float(outputs[f"FTLE_MeshBounds.{axis}{end}"]) for axis in "XYZ")
+            for end in ["Min", "Max"]
+        )
+
+    def estimate_cost(self):
+        """Estimate the flowVC cost of the current FTLE settings."""
+        outputs = self.config["Outputs"]
+        n_points = 1
+        for axis in "XYZ":
+            n_points *= int(outputs[f"FTLE_MeshBounds.{axis}Res"])
+        n_nodes, n_elements = self.get_mesh_size()
+        return ftlecost.estimate_cost(n_points, n_nodes, n_elements, dict(outputs))
+
+    def fit_cell_size(
+        self,
+        auto_range,
+        cell_size,
+        manual_bounds=None,
+        memory_budget=None,
+        time_budget=None,
+    ):
+        """Return the finest cell_size (>= cell_size) that fits the budgets."""
+        bounds = self.get_ftle_bounds(auto_range, manual_bounds)
+        n_nodes, n_elements = self.get_mesh_size()
+        return ftlecost.finest_cell_size(
+            bounds,
+            n_nodes,
+            n_elements,
+            dict(self.config["Outputs"]),
+            memory_budget=memory_budget,
+            time_budget=time_budget,
+            min_cell_size=cell_size,
+        )
+
+    def check_budget(self, estimate, memory_budget=None, time_budget=None):
+        """Log the estimate and warn if it does not fit the budgets."""
+        logger.info(
+            f"Estimated flowVC cost: {ftlecost.format_estimate(estimate)}",
+            extra={"cost_estimate": estimate},
+        )
+        if memory_budget is not None and estimate["memory_bytes"] > memory_budget:
+            logger.warning(
+                f"Estimated memory {estimate['memory_bytes'] / 1e9:.2f} GB exceeds "
+                f"the {memory_budget / 1e9:.2f} GB budget, increase --cell_size"
+            )
+        if time_budget is not None and estimate["runtime_s"] > time_budget:
+            logger.warning(
+                f"Estimated runtime {estimate['runtime_s'] / 3600:.1f} h exceeds "
+                f"the {time_budget / 3600:.1f} h budget, increase --cell_size"
+            )
+        return ftlecost.fits_budget(estimate, memory_budget, time_budget)
+
+    def load_config(self, file_name=CONFIG_FILE_NAME):
+        config_path = get_config_path(file_name)
         self.config = configparser.ConfigParser()
         self.config.read_file(open(config_path))
 
@@ -340,8 +523,31 @@ class Config:
             for key, value in self.config.items("Outputs"):
                 configfile.write(f"{key} = {value} \n")
 
-    def process_directory(self, auto_range, cell_size, direction, manual_bounds=None):
+    def process_directory(
+        self,
+        auto_range,
+        cell_size,
+        direction,
+        manual_bounds=None,
+        memory_budget=None,
+        time_budget=None,
+        fit_cell_size=False,
+        tracer_seeds=None,
+    ):
+        """
+        Write the .in file for the directory.
+
+        memory_budget (bytes) and time_budget (seconds) are checked against the
+        cost estimate before writing. With fit_cell_size the finest cell size
+        (no smaller than cell_size) that fits the budgets is used.
+        tracer_seeds (dict) are create_tracer_seeds arguments, when given the
+        .in file computes tracer trajectories instead of FTLE.
+        """
         self.set_path_defaults()
+        if fit_cell_size:
+            cell_size = self.fit_cell_size(
+                auto_range, cell_size, manual_bounds, memory_budget, time_budget
+            )
         # if auto_range:
         self.set_data_range_defaults(
             auto_range=auto_range,
@@ -353,7 +559,11 @@ class Config:
             self.set_backwards_defaults()
         elif direction == "forward":
             self.set_forward_defaults()
+        if tracer_seeds:
+            self.create_tracer_seeds(**tracer_seeds)
         self.update_settings()
+        if not tracer_seeds:
+            self.check_budget(self.estimate_cost(), memory_budget, time_budget)
         self.write_config_file()
 
 
@@ -362,8 +572,9 @@ class ConfigBatch:
     create a config object for each subdirectory in the parent directory
     """
 
-    def __init__(self, parent_directory):
+    def __init__(self, parent_directory, **handler_kwargs):
         self.parent_directory = parent_directory
+        self.handler_kwargs = handler_kwargs
         self.configs = []
 
     def discover_subdirectories(self):
@@ -379,20 +590,44 @@ class ConfigBatch:
         subdirs = self.discover_subdirectories()
         for subdir in subdirs:
             logger.info(f"Processing  {subdir}")
-            directory_handler = directoryHandler(subdir)
+            directory_handler = directoryHandler(subdir, **self.handler_kwargs)
             processor = resultsProcessor(directory_handler)
             config = Config(processor)
             config.process_directory(*args, **kwargs)
 
 
-def main(directory, auto_range, cell_size, direction, batch=False, manual_bounds=None):
+def main(
+    directory,
+    auto_range,
+    cell_size,
+    direction,
+    batch=False,
+    manual_bounds=None,
+    memory_budget=None,
+    time_budget=None,
+    fit_cell_size=False,
+    tracer_seeds=None,
+    vtu_dir="input_vtu",
+    input_pattern=None,
+):
     settup_logging()
     logger.info("Starting inigenerator")
+    handler_kwargs = dict(vtu_dir=vtu_dir, input_pattern=input_pattern)
+    process_kwargs = dict(
+        memory_budget=memory_budget,
+        time_budget=time_budget,
+        fit_cell_size=fit_cell_size,
+        tracer_seeds=tracer_seeds,
+    )
     if batch:
-        batch_config = ConfigBatch(parent_directory=directory)
-        batch_config.process_directory(auto_range, cell_size, direction, manual_bounds)
+        batch_config = ConfigBatch(parent_directory=directory, **handler_kwargs)
+        batch_config.process_directory(
+            auto_range, cell_size, direction, manual_bounds, **process_kwargs
+        )
     else:
-        directory_handler = directoryHandler(directory)
+        directory_handler = directoryHandler(directory, **handler_kwargs)
         processor = resultsProcessor(directory_handler)
         config = Config(processor)
-        config.process_directory(auto_range, cell_size, direction, manual_bounds)
+        config.process_directory(
+            auto_range, cell_size, direction, manual_bounds, **process_kwargs
+        )
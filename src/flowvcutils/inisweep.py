@@ -0,0 +1,203 @@
+import os
+import re
+import json
+import time
+import logging
+import itertools
+from flowvcutils.jsonlogger import settup_logging
+from .inigenerator import (
+    directoryHandler,
+    resultsProcessor,
+    Config,
+    get_config_path,
+    direction_settings,
+)
+
+logger = logging.getLogger(__name__)
+
+KEY_LINE = re.compile(r"^\s*([^#\s=][^=]*?)\s*=")
+SWEEP_MANIFEST = "sweep_manifest.json"
+
+
+class compiledTemplate:
+    """A .in template parsed once and rendered many times.
+
+    The template is split into the literal text between variable lines and
+    one slot per variable, so comments, blank lines, key spelling and key
+    order are written exactly as they appear in the template.
+    """
+
+    def __init__(self, text):
+        self.parts = []
+        self.prefixes = {}
+        self.slots = {}
+        self.defaults = {}
+        for line in text.splitlines(keepends=True):
+            if line.lstrip().startswith("["):
+                # the section header is only there for configparser
+                continue
+            match = KEY_LINE.match(line)
+            if match is None:
+                self.parts.append(line)
+                continue
+            key = match.group(1).lower()
+            self.slots[key] = len(self.parts)
+            self.prefixes[key] = line[: match.end()]
+            self.defaults[key] = line[match.end() :].strip()
+            self.parts.append(None)
+
+    @classmethod
+    def from_file(cls, file_path=None):
+        if file_path is None:
+            file_path = get_config_path()
+        with open(file_path) as f:
+            return cls(f.read())
+
+    def validate(self, keys):
+        """Raise ValueError for any key not in the template (case insensitive)."""
+        for key in keys:
+            if key.lower() not in self.slots:
+                raise ValueError(
+                    f"The key '{key}' does not exist in the default. Check the spelling"
+                )
+
+    def render(self, values):
+        """
+        Render the template with values (keys must be lower case).
+
+        Keys missing from values keep the template default.
+        """
+        parts = list(self.parts)
+        for key, slot in self.slots.items():
+            value = values.get(key, self.defaults[key])
+            parts[slot] = f"{self.prefixes[key]} {value}\n"
+        return "".join(parts)
+
+
+def parse_parameters(parameters):
+    """
+    Parse ["Int_TimeStep=5e-6,1e-5", ...] into {"Int_TimeStep": ["5e-6", "1e-5"]}.
+    """
+    parsed = {}
+    for parameter in parameters:
+        if "=" not in parameter:
+            raise ValueError(f"Sweep parameter '{parameter}' must be KEY=V1,V2,...")
+        key, values = parameter.split("=", 1)
+        parsed[key.strip()] = [value.strip() for value in values.split(",")]
+    return parsed
+
+
+def combination_name(combination):
+    """Directory name for a combination, e.g. Int_TimeStep-5e-6__direction-forward"""
+    name = "__".join(f"{key}-{value}" for key, value in combination)
+    return re.sub(r"[^\w.+-]", "_", name)
+
+
+def base_settings(directory, auto_range, cell_size, manual_bounds=None):
+    """Settings (lower case keys) shared by every combination of a case directory."""
+    directory_handler = directoryHandler(directory)
+    config = Config(resultsProcessor(directory_handler))
+    config.set_path_defaults()
+    config.set_data_range_defaults(
+        auto_range=auto_range,
+        cell_size=cell_size,
+        streach=True,
+        manual_bounds=manual_bounds,
+    )
+    config.update_settings()
+    return dict(config.config["Outputs"]), directory_handler.get_directory_name()
+
+
+def sweep(
+    directory,
+    parameters,
+    directions=("backward",),
+    output_directory=None,
+    auto_range=True,
+    cell_size=0.001,
+    manual_bounds=None,
+    template=None,
+):
+    """
+    Write one .in file per combination of parameter values and directions.
+
+    Each combination gets output_directory/{combination}/ holding
+    {combination}.in and an output_bin directory for its results. The data
+    range and paths are computed once for the case directory and the
+    template is parsed once for the whole sweep.
+
+    Args:
+        directory (str): Case directory (with input_bin and input_vtu).
+        parameters (dict): {key: [values]} to sweep.
+        directions (list): FTLE directions to sweep.
+        output_directory (str): Where to create the combination directories
+            (default directory/sweep).
+
+    Returns:
+        list: The combinations written as dicts of {key: value}.
+    """
+    if template is None:
+        template = compiledTemplate.from_file()
+    template.validate(parameters.keys())
+    if output_directory is None:
+        output_directory = os.path.join(directory, "sweep")
+    base, directory_name = base_settings(
+        directory, auto_range, cell_size, manual_bounds
+    )
+
+    axes = [[(key, value) for value in values] for key, values in parameters.items()]
+    axes.append([("direction", direction) for direction in directions])
+    direction_values = {
+        direction: {
+            key.lower(): value
+            for key, value in direction_settings(direction, directory_name).items()
+        }
+        for direction in directions
+    }
+
+    start = time.perf_counter()
+    combinations = []
+    for combination in itertools.product(*axes):
+        name = combination_name(combination)
+        case_directory = os.path.join(output_directory, name)
+        output_bin = os.path.join(case_directory, "output_bin")
+        os.makedirs(output_bin, exist_ok=True)
+
+        values = dict(base)
+        values.update(direction_values[combination[-1][1]])
+        values.update((key.lower(), value) for key, value in combination[:-1])
+        values["path_output"] = output_bin
+        with open(os.path.join(case_directory, f"{name}.in"), "w") as f:
+            f.write(template.render(values))
+        combinations.append(dict(combination, name=name))
+
+    elapsed = time.perf_counter() - start
+    with open(os.path.join(output_directory, SWEEP_MANIFEST), "w") as f:
+        json.dump(combinations, f, indent=4)
+    logger.info(
+        f"Wrote {len(combinations)} .in files to {output_directory} "
+        f"in {elapsed:.2f}s"
+    )
+    return combinations
+
+
+def main(
+    directory,
+    parameters,
+    directions,
+    output_directory=None,
+    auto_range=True,
+    cell_size=0.001,
+    manual_bounds=None,
+):
+    settup_logging()
+    logger.info("Starting inisweep")
+    return sweep(
+        directory,
+        parse_parameters(parameters),
+        directions=directions,
+        output_directory=output_directory,
+        auto_range=auto_range,
+        cell_size=cell_size,
+        manual_bounds=manual_bounds,
+    )
@@ -0,0 +1,436 @@
+import os
+import re
+import json
+import time
+import hashlib
+import queue
+import shlex
+import logging
+import datetime as dt
+import subprocess
+from typing import List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from flowvcutils.jsonlogger import settup_logging
+from flowvcutils.perf import trace_span
+from flowvcutils import metrics
+from flowvcutils.utils import maxrss_to_bytes, file_stats, update_hash
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FLOWVC_EXE = "flowVC"
+SUMMARY_FILE_NAME = "flowvc_run_summary.json"
+RUN_CACHE_SUFFIX = ".runcache.json"
+TOPOLOGY_FILE_TYPES = ["coordinates", "connectivity", "adjacency", "Cartesian"]
+# (compute flag, output prefix) pairs that name the files a run writes
+OUTPUT_PREFIX_KEYS = [
+    ("ftle_compute", "ftle_outfileprefix"),
+    ("trace_compute", "trace_outfileprefix"),
+    ("velout_compute", "velout_fileprefix"),
+]
+
+
+def parse_cpu_list(cpus):
+    """Parse a cpu list string such as "0-3,8,10" into a list of ints."""
+    if cpus is None or cpus == "":
+        return None
+    cpu_list: List[int] = []
+    for part in cpus.split(","):
+        part = part.strip()
+        if "-" in part:
+            first, last = part.split("-", 1)
+            cpu_list.extend(range(int(first), int(last) + 1))
+        elif part:
+            cpu_list.append(int(part))
+    return cpu_list
+
+
+def cpu_slots(cpus, max_jobs):
+    """Split the cpus into one affinity set per concurrent job.
+
+    Returns a list of max_jobs cpu lists (or None when no affinity is requested).
+    When there are fewer cpus than jobs the cpus are shared round robin.
+    """
+    if not cpus:
+        return [None] * max_jobs
+    if len(cpus) < max_jobs:
+        return [[cpus[i % len(cpus)]] for i in range(max_jobs)]
+    return [cpus[i::max_jobs] for i in range(max_jobs)]
+
+
+def discover_in_files(directory, batch=False):
+    """
+    Find the .in files written by inigenerator.
+
+    Single mode looks in directory and directory/input_bin.
+    Batch mode looks in directory/subdir and directory/subdir/input_bin for
+    each subdirectory (inisweep writes its .in files to directory/subdir).
+    """
+    if batch:
+        search_dirs = [
+            search_dir
+            for d in sorted(os.listdir(directory))
+            if os.path.isdir(os.path.join(directory, d))
+            for search_dir in [
+                os.path.join(directory, d),
+                os.path.join(directory, d, "input_bin"),
+            ]
+        ]
+    else:
+        search_dirs = [directory, os.path.join(directory, "input_bin")]
+
+    in_files = []
+    for search_dir in search_dirs:
+        if not os.path.isdir(search_dir):
+            continue
+        for file in sorted(os.listdir(search_dir)):
+            file_path = os.path.join(search_dir, file)
+            if file.endswith(".in") and os.path.isfile(file_path):
+                in_files.append(file_path)
+    return in_files
+
+
+def _exit_code(wait_status):
+    """Convert an os.wait status into a Popen style return code."""
+    if os.WIFSIGNALED(wait_status):
+        return -os.WTERMSIG(wait_status)
+    return os.WEXITSTATUS(wait_status)
+
+
+def _wait(proc):
+    """Wait for proc, returning (exit_status, peak_rss_bytes).
+
+    os.wait4 reports the resource usage of this child only. Where it is not
+    available (Windows) the peak rss is not recorded.
+    """
+    if hasattr(os, "wait4"):
+        _, wait_status, usage = os.wait4(proc.pid, 0)
+        proc.returncode = _exit_code(wait_status)
+        return proc.returncode, maxrss_to_bytes(usage.ru_maxrss)
+    return proc.wait(), None
+
+
+def run_process(command, cwd, stdout_path, stderr_path, cpus=None):
+    """
+    Run a command capturing its stdout and stderr to files.
+
+    Args:
+        command (list): Command and arguments.
+        cwd (str): Working directory for the command.
+        stdout_path (str): File to capture stdout.
+        stderr_path (str): File to capture stderr.
+        cpus (list, optional): Cpus to pin the process to.
+
+    Returns:
+        dict: exit_status, wall_time_s and peak_rss_bytes of the process.
+    """
+    start = time.perf_counter()
+    with open(stdout_path, "wb") as stdout, open(stderr_path, "wb") as stderr:
+        proc = subprocess.Popen(command, cwd=cwd, stdout=stdout, stderr=stderr)
+        if cpus and hasattr(os, "sched_setaffinity"):
+            try:
+                os.sched_setaffinity(proc.pid, cpus)
+            except OSError:
+                logger.warning(f"Could not set cpu affinity {cpus}", exc_info=True)
+        with trace_span(os.path.basename(command[0]), "process", cwd=cwd, cpus=cpus):
+            exit_status, peak_rss = _wait(proc)
+    return {
+        "exit_status": exit_status,
+        "wall_time_s": time.perf_counter() - start,
+        "peak_rss_bytes": peak_rss,
+    }
+
+
+def parse_in_file(text):
+    """Parse the VARIABLE_NAME = VALUE lines of a .in file (keys lower cased)."""
+    params = {}
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith("#") or "=" not in line:
+            continue
+        key, value = line.split("=", 1)
+        params[key.strip().lower()] = value.strip()
+    return params
+
+
+def _resolve_path(path, in_dir):
+    """Resolve a Path_* value relative to the directory flowVC is run in."""
+    return os.path.normpath(os.path.join(in_dir, path))
+
+
+def find_input_files(in_file, params):
+    """
+    Return the binary inputs a .in file references.
+
+    {Data_InFilePrefix}_coordinates/_connectivity/_adjacency/_Cartesian.bin and
+    every {Data_InFilePrefix}_vel.N.bin in Path_Data.
+    """
+    data_path = _resolve_path(params.get("path_data", "."), os.path.dirname(in_file))
+    if not os.path.isdir(data_path):
+        return []
+    prefix = params.get("data_infileprefix", "")
+    topology = {f"{prefix}_{file_type}.bin" for file_type in TOPOLOGY_FILE_TYPES}
+    vel_pattern = re.compile(re.escape(prefix) + r"_vel\.-?\d+\.bin$")
+    input_files = [
+        entry.path
+        for entry in os.scandir(data_path)
+        if entry.name in topology or vel_pattern.match(entry.name)
+    ]
+    return sorted(input_files)
+
+
+def find_output_files(in_file, params, before=None):
+    """
+    Return the files in Path_Output written under an enabled output prefix.
+
+    With before, the file_stats of the outputs taken before a run, only the
+    files the run created or modified are returned, not those left behind
+    by earlier runs.
+    """
+    output_path = _resolve_path(
+        params.get("path_output", "."), os.path.dirname(in_file)
+    )
+    prefixes = tuple(
+        params[prefix_key]
+        for flag_key, prefix_key in OUTPUT_PREFIX_KEYS
+        if params.get(flag_key) == "1" and params.get(prefix_key)
+    )
+    if not prefixes or not os.path.isdir(output_path):
+        return []
+    outputs = sorted(
+        entry.path
+        for entry in os.scandir(output_path)
+        if entry.is_file() and entry.name.startswith(prefixes)
+    )
+    if before is None:
+        return outputs
+    return [
+        path for path, stat in file_stats(outputs).items() if before.get(path) != stat
+    ]
+
+
+def compute_run_key(in_content, input_files):
+    """Hash the .in file contents together with the name and data of each input."""
+    hasher = hashlib.sha256(in_content)
+    for path in input_files:
+        hasher.update(os.path.basename(path).encode() + b"\0")
+        update_hash(hasher, path)
+        hasher.update(b"\0")
+    return hasher.hexdigest()
+
+
+def run_cache_path(in_file):
+    return os.path.splitext(in_file)[0] + RUN_CACHE_SUFFIX
+
+
+def load_run_cache(in_file):
+    """Return the saved run cache for in_file, or None if there is no usable one."""
+    cache_path = run_cache_path(in_file)
+    if not os.path.isfile(cache_path):
+        return None
+    try:
+        with open(cache_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        logger.warning(f"Ignoring unreadable run cache {cache_path}")
+        return None
+
+
+def save_run_cache(in_file, cache):
+    with open(run_cache_path(in_file), "w") as f:
+        json.dump(cache, f, indent=4)
+
+
+def run_cache_key(in_content, input_files, cache=None):
+    """
+    Return (key, in_sha, input_stats) for a run.
+
+    The size and mtime of every input are compared with the cache first, the
+    inputs are only hashed in full when one of them (or the .in file) changed.
+    """
+    in_sha = hashlib.sha256(in_content).hexdigest()
+    stats = file_stats(input_files)
+    if cache and cache.get("in_sha") == in_sha and cache.get("inputs") == stats:
+        return cache["key"], in_sha, stats
+    return compute_run_key(in_content, input_files), in_sha, stats
+
+
+def is_up_to_date(cache, key):
+    """True if the cache records a successful run for key whose outputs exist.
+
+    A run that wrote no outputs is never up to date.
+    """
+    return (
+        cache is not None
+        and cache.get("key") == key
+        and cache.get("exit_status") == 0
+        and bool(cache.get("outputs"))
+        and all(os.path.exists(path) for path in cache["outputs"])
+    )
+
+
+def run_job(in_file, flowvc_exe=DEFAULT_FLOWVC_EXE, cpus=None, force=False):
+    """
+    Run flowVC on a single .in file.
+
+    flowVC is started in the directory of the .in file. stdout and stderr
+    are written next to it as {name}.stdout.log and {name}.stderr.log.
+    The job is skipped when {name}.runcache.json shows a successful run with
+    the same .in contents and inputs whose outputs still exist, unless force.
+    """
+    in_file = os.path.abspath(in_file)
+    cwd = os.path.dirname(in_file)
+    stem = os.path.splitext(os.path.basename(in_file))[0]
+    command = shlex.split(flowvc_exe) + [in_file]
+    record = {
+        "in_file": in_file,
+        "command": command,
+        "cpus": cpus,
+        "stdout": os.path.join(cwd, f"{stem}.stdout.log"),
+        "stderr": os.path.join(cwd, f"{stem}.stderr.log"),
+        "start_time": dt.datetime.now(tz=dt.timezone.utc).isoformat(),
+        "skipped": False,
+    }
+
+    with open(in_file, "rb") as f:
+        in_content = f.read()
+    params = parse_in_file(in_content.decode(errors="replace"))
+    input_files = find_input_files(in_file, params)
+    cache = load_run_cache(in_file)
+    key, in_sha, stats = run_cache_key(in_content, input_files, cache)
+    record["cache_key"] = key
+
+    if not force and is_up_to_date(cache, key):
+        logger.info(f"Skipping {in_file}, outputs are up to date")
+        if cache["inputs"] != stats:
+            # inputs were touched but not changed, refresh the cheap precheck
+            cache["inputs"] = stats
+            save_run_cache(in_file, cache)
+        record.update(
+            {
+                "skipped": True,
+                "exit_status": 0,
+                "wall_time_s": 0.0,
+                "peak_rss_bytes": None,
+            }
+        )
+        return record
+
+    logger.info(f"Starting flowVC job {in_file}")
+    outputs_before = file_stats(find_output_files(in_file, params))
+    try:
+        record.update(
+            run_process(command, cwd, record["stdout"], record["stderr"], cpus)
+        )
+    except OSError as e:
+        logger.error(f"Failed to start {command}: {e}")
+        record.update(
+            {
+                "exit_status": None,
+                "wall_time_s": 0.0,
+                "peak_rss_bytes": None,
+                "error": str(e),
+            }
+        )
+        return record
+
+    if record["exit_status"] == 0:
+        logger.info(
+            f"Finished {in_file} in {record['wall_time_s']:.2f}s",
+            extra={"job": record},
+        )
+        save_run_cache(
+            in_file,
+            {
+                "key": key,
+                "in_sha": in_sha,
+                "inputs": stats,
+                "outputs": find_output_files(in_file, params, outputs_before),
+                "exit_status": 0,
+            },
+        )
+    else:
+        logger.error(
+            f"{in_file} exited with status {record['exit_status']}",
+            extra={"job": record},
+        )
+        if cache is not None:
+            os.remove(run_cache_path(in_file))
+    return record
+
+
+def run_jobs(
+    in_files, flowvc_exe=DEFAULT_FLOWVC_EXE, max_jobs=1, cpus=None, force=False
+):
+    """
+    Run flowVC for each .in file with at most max_jobs running at once.
+
+    Each running job holds one cpu slot (see cpu_slots) for its lifetime.
+    """
+    max_jobs = max(1, max_jobs)
+    slots: queue.Queue[Optional[List[int]]] = queue.Queue()
+    for slot in cpu_slots(cpus, max_jobs):
+        slots.put(slot)
+
+    def _run(in_file):
+        with trace_span("wait for cpu slot", "wait"):
+            slot = slots.get()
+        try:
+            with metrics.track_item() as item:
+                record = run_job(in_file, flowvc_exe=flowvc_exe, cpus=slot, force=force)
+                item["failed"] = record["exit_status"] != 0
+            return record
+        finally:
+            slots.put(slot)
+
+    metrics.track("run", "job", len(in_files), max_jobs)
+
+    with ThreadPoolExecutor(max_workers=max_jobs) as executor:
+        return list(executor.map(_run, in_files))
+
+
+def write_summary(records, summary_path, **run_info):
+    """Write the job records and run information to a JSON summary file."""
+    summary = dict(run_info)
+    summary["n_jobs"] = len(records)
+    summary["n_failed"] = sum(1 for record in records if record["exit_status"] != 0)
+    summary["n_skipped"] = sum(1 for record in records if record["skipped"])
+    summary["jobs"] = records
+    with open(summary_path, "w") as f:
+        json.dump(summary, f, indent=4)
+    return summary
+
+
+def main(
+    in_files,
+    directory,
+    batch=False,
+    max_jobs=1,
+    cpus=None,
+    flowvc_exe=DEFAULT_FLOWVC_EXE,
+    summary_path=None,
+    force=False,
+):
+    settup_logging()
+    if not in_files:
+        in_files = discover_in_files(directory, batch)
+    if summary_path is None:
+        summary_path = os.path.join(directory, SUMMARY_FILE_NAME)
+    cpu_list = parse_cpu_list(cpus)
+
+    logger.info(f"Running {len(in_files)} flowVC jobs ({max_jobs} at a time)")
+    records = run_jobs(
+        in_files, flowvc_exe, max_jobs=max_jobs, cpus=cpu_list, force=force
+    )
+    summary = write_summary(
+        records,
+        summary_path,
+        flowvc_exe=flowvc_exe,
+        max_jobs=max_jobs,
+        cpus=cpu_list,
+    )
+    logger.info(
+        f"{summary['n_jobs']} jobs, {summary['n_skipped']} up to date, "
+        f"{summary['n_failed']} failed. "
+        f"Summary: {summary_path}"
+    )
+    return summary
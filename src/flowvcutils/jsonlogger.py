@@ -1,13 +1,26 @@
 import datetime as dt
+import copy
+import contextlib
 import json
+import queue
+import atexit
 import logging
 import logging.config
+import logging.handlers
+import math
+import multiprocessing
 import pathlib
 import sys
-from typing import Dict, Optional
+import time
+from typing import Any, Dict, List, Optional
 from flowvcutils.utils import get_project_root
 import os
 
+try:
+    import orjson
+except ImportError:  # optional, pip install flowvcutils[fast]
+    orjson = None  # type: ignore[assignment]
+
 logger = logging.getLogger(__name__)
 
 LOG_RECORD_BUILTIN_ATTRS = {
@@ -37,6 +50,21 @@ LOG_RECORD_BUILTIN_ATTRS = {
 }
 
 
+# fields computed by the formatter rather than read from the record
+COMPUTED_FIELDS = ("message", "timestamp", "exc_info", "stack_info")
+
+
+def dumps_json(message) -> str:
+    """json.dumps(message, default=str), with orjson when it is installed."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(message, default=str).decode()
+        except TypeError:
+            # e.g. non string keys in an extra dict, which json handles
+            pass
+    return json.dumps(message, default=str)
+
+
 class flowvcutilsJSONFormatter(logging.Formatter):
     def __init__(
         self,
@@ -45,47 +73,161 @@ class flowvcutilsJSONFormatter(logging.Formatter):
     ):
         super().__init__()
         self.fmt_keys = fmt_keys if fmt_keys is not None else {}
+        # decide once which keys are computed and which are record attributes
+        self._fmt_items = [
+            (key, val, val in COMPUTED_FIELDS) for key, val in self.fmt_keys.items()
+        ]
+        self._second: Optional[float] = None
+        self._second_prefix = ""
 
     def format(self, record: logging.LogRecord) -> str:
         message = self._prepare_log_dict(record)
-        return json.dumps(message, default=str)
+        return dumps_json(message)
+
+    def _timestamp(self, created):
+        """record.created as datetime.isoformat() in UTC.
+
+        The date and time up to the second is cached, so records logged in
+        the same second only format their microseconds.
+        """
+        frac, second = math.modf(created)
+        micro = round(frac * 1e6)
+        if micro >= 1000000:
+            second += 1
+            micro -= 1000000
+        if second != self._second:
+            self._second_prefix = dt.datetime.fromtimestamp(
+                second, tz=dt.timezone.utc
+            ).strftime("%Y-%m-%dT%H:%M:%S")
+            self._second = second
+        if micro:
+            return f"{self._second_prefix}.{micro:06d}+00:00"
+        return f"{self._second_prefix}+00:00"
 
     def _prepare_log_dict(self, record: logging.LogRecord):
         always_fields = {
             "message": record.getMessage(),
-            "timestamp": dt.datetime.fromtimestamp(
-                record.created, tz=dt.timezone.utc
-            ).isoformat(),
+            "timestamp": self._timestamp(record.created),
         }
-        if record.exc_info is not None:
-            always_fields["exc_info"] = self.formatException(record.exc_info)
+        if record.exc_info is not None and not record.exc_text:
+            # cached on the record like logging.Formatter does, the other
+            # file handler reuses it
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            always_fields["exc_info"] = record.exc_text
 
         if record.stack_info is not None:
             always_fields["stack_info"] = self.formatStack(record.stack_info)
 
-        message = {
-            key: (
-                msg_val
-                if (msg_val := always_fields.pop(val, None)) is not None
-                else getattr(record, val)
-            )
-            for key, val in self.fmt_keys.items()
-        }
+        message = {}
+        for key, val, computed in self._fmt_items:
+            if computed and val in always_fields:
+                message[key] = always_fields.pop(val)
+            else:
+                message[key] = getattr(record, val)
         message.update(always_fields)
 
-        for key, val in record.__dict__.items():
-            if key not in LOG_RECORD_BUILTIN_ATTRS:
-                message[key] = val
+        # most records have no extra fields, skip the walk for them
+        record_dict = record.__dict__
+        if record_dict.keys() - LOG_RECORD_BUILTIN_ATTRS:
+            for key, val in record_dict.items():
+                if key not in LOG_RECORD_BUILTIN_ATTRS:
+                    message[key] = val
 
         return message
 
 
+class stdoutHandler(logging.StreamHandler):  # type: ignore[type-arg]
+    """StreamHandler that writes to whatever sys.stdout is when it is used."""
+
+    @property
+    def stream(self):
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+
+class recordQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that keeps the record fields the JSON formatter uses.
+
+    The message is merged with its args and the exception is formatted into
+    exc_text, so the record can be pickled (from worker processes) and
+    still gets its exc_info, stack_info and extra keys in the .jsonl file.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class runIdFilter(logging.Filter):
+    """Tag records with the run id of the process writing the log files."""
+
+    def filter(self, record):
+        if not hasattr(record, "run_id"):
+            record.run_id = RUN_ID
+        return True
+
+
+class logListener(logging.handlers.QueueListener):
+    """Write queued records to the file handlers.
+
+    Records from worker processes are also written to the console handlers,
+    records from this process already went to them directly.
+    """
+
+    def __init__(self, log_queue, file_handlers, console_handlers):
+        super().__init__(log_queue, *file_handlers, respect_handler_level=True)
+        self.console_handlers = console_handlers
+        self.started = False
+
+    def start(self):
+        super().start()
+        self.started = True
+
+    def stop(self):
+        super().stop()
+        self.started = False
+
+    def handle(self, record):
+        super().handle(record)
+        if record.process != os.getpid():
+            for handler in self.console_handlers:
+                if record.levelno >= handler.level:
+                    handler.handle(record)
+
+
 project_root = get_project_root()
 log_file = os.path.join(project_root, "logs", "flowvcutils.log")
 json_file = os.path.join(project_root, "logs", "flowvcutils.log.jsonl")
 
+# one id per command, records of its worker processes get it as well
+RUN_ID = f"{dt.datetime.now():%Y%m%dT%H%M%S}-{os.getpid()}"
+
+_listener: Optional[logListener] = None
+_configured_path: Optional[pathlib.Path] = None
+_in_worker = False
+
 
 def settup_logging(config_file_path=None):
+    """
+    Configure logging, once per process and config file.
+
+    The file handlers run on a single QueueListener thread, logging calls
+    only put the record on a queue. Calling this again with the same
+    config does nothing, so it is cheap to call at the start of every
+    command. In worker processes (see init_worker_logging) it does nothing.
+    """
+    global _listener, _configured_path
     current_dir = pathlib.Path(__file__).parent
     project_root = current_dir.parent
     if config_file_path is None:
@@ -97,6 +239,10 @@ def settup_logging(config_file_path=None):
 
     if not config_file_path.exists():
         raise FileNotFoundError(f"logging configuration not found:{config_file_path}")
+    if _in_worker or (
+        _listener is not None and _configured_path == config_file_path.resolve()
+    ):
+        return
 
     with open(config_file_path) as f_in:
         config = json.load(f_in)
@@ -109,27 +255,314 @@ def settup_logging(config_file_path=None):
     # Manually ensure
     config["formatters"]["json"]["()"] = flowvcutilsJSONFormatter
 
+    stop_logging()
     logging.config.dictConfig(config)
 
+    root = logging.getLogger()
+    file_handlers = [h for h in root.handlers if isinstance(h, logging.FileHandler)]
+    console_handlers = [h for h in root.handlers if h not in file_handlers]
+    for handler in file_handlers:
+        root.removeHandler(handler)
+        handler.addFilter(runIdFilter())
+    log_queue: queue.Queue[logging.LogRecord] = queue.Queue(-1)
+    root.addHandler(recordQueueHandler(log_queue))
+    _listener = logListener(log_queue, file_handlers, console_handlers)
+    _listener.start()
+    _configured_path = config_file_path.resolve()
+
+
+def flush_logging():
+    """Wait until every queued record has been written to the log files."""
+    if _listener is not None and _listener.started:
+        _listener.stop()
+        _listener.start()
+
+
+def stop_logging():
+    """Write the queued records and stop the listener thread."""
+    global _listener, _configured_path
+    if _listener is not None:
+        if _listener.started:
+            _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+    _listener = None
+    _configured_path = None
+
+
+atexit.register(stop_logging)
+
 
-def print_last_logs(num_lines):
-    project_root = get_project_root()
-    json_file_name = "flowvcutils.log.jsonl"
-    json_log_file_path = os.path.join(project_root, "logs", json_file_name)
-    # log_file = pathlib.Path("logs/flowvcutils.log.jsonl")
-    with open(json_log_file_path, "r") as f:
-        lines = f.readlines()
-        last_n_lines = lines[-num_lines:]
-        for line in last_n_lines:
+def _move_listener(log_queue):
+    """Send new records to log_queue and have the listener read from it."""
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, recordQueueHandler):
+            handler.queue = log_queue
+    if _listener is None:
+        return
+    # stop writes every record already on the old queue
+    _listener.stop()
+    _listener.queue = log_queue
+    _listener.start()
+
+
+@contextlib.contextmanager
+def worker_logging():
+    """
+    Yield a queue process pool workers can send their records to.
+
+    While the context is open the listener reads from a multiprocessing
+    queue, so records from the workers and from this process are written by
+    the same thread and rotation never sees two writers. Pass the queue to
+    init_worker_logging as the initializer of the pool, and shut the pool
+    down before the context closes.
+    """
+    settup_logging()
+    log_queue: multiprocessing.Queue[logging.LogRecord] = multiprocessing.Queue(-1)
+    _move_listener(log_queue)
+    try:
+        yield log_queue
+    finally:
+        _move_listener(queue.Queue(-1))
+        log_queue.close()
+        log_queue.join_thread()
+
+
+def init_worker_logging(log_queue):
+    """Process pool initializer that sends every record to log_queue."""
+    global _listener, _configured_path, _in_worker
+    # a forked worker has a copy of the listener, it must not stop or flush it
+    _listener = None
+    _configured_path = None
+    _in_worker = True
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(recordQueueHandler(log_queue))
+    root.setLevel(logging.DEBUG)
+
+
+READ_BLOCK_SIZE = 64 * 1024
+
+
+def log_files(log_path=None):
+    """The json log and its rotated backups (.1, .2 ...), newest first."""
+    if log_path is None:
+        log_path = json_file
+    paths = [log_path]
+    backup = 1
+    while os.path.isfile(f"{log_path}.{backup}"):
+        paths.append(f"{log_path}.{backup}")
+        backup += 1
+    return paths
+
+
+def reverse_lines(path, block_size=READ_BLOCK_SIZE):
+    """Yield the non empty lines of a file from last to first.
+
+    The file is read backwards block_size bytes at a time, so only the
+    lines that are used are ever read.
+    """
+    with open(path, "rb") as f:
+        position = f.seek(0, os.SEEK_END)
+        remainder = b""
+        while position > 0:
+            read_size = min(block_size, position)
+            position -= read_size
+            f.seek(position)
+            lines = (f.read(read_size) + remainder).split(b"\n")
+            # the first piece may be the end of a line in the previous block
+            remainder = lines.pop(0)
+            for line in reversed(lines):
+                if line.strip():
+                    yield line.decode("utf-8", errors="replace")
+        if remainder.strip():
+            yield remainder.decode("utf-8", errors="replace")
+
+
+def parse_timestamp(value):
+    """Parse an ISO 8601 time, naive times are taken as UTC like the log."""
+    if value.endswith("Z"):
+        value = value[:-1] + "+00:00"
+    timestamp = dt.datetime.fromisoformat(value)
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=dt.timezone.utc)
+    return timestamp
+
+
+def parse_extras(extras):
+    """Parse ["job.case=case_a", ...] into {"job.case": "case_a"}."""
+    parsed = {}
+    for extra in extras or []:
+        if "=" not in extra:
+            raise ValueError(f"Log filter '{extra}' must be KEY=VALUE")
+        key, value = extra.split("=", 1)
+        parsed[key.strip()] = value.strip()
+    return parsed
+
+
+def _lookup(entry, key):
+    """entry[key], where a dotted key looks into nested extras (job.case)."""
+    for part in key.split("."):
+        if not isinstance(entry, dict) or part not in entry:
+            return None
+        entry = entry[part]
+    return entry
+
+
+def record_filter(level=None, logger_name=None, since=None, until=None, extras=None):
+    """
+    Return a function that checks a log entry against the filters.
+
+    Args:
+        level (str): Minimum level, e.g. WARNING.
+        logger_name (str): Logger name, its child loggers also match.
+        since, until (str): ISO 8601 times the entry must be between.
+        extras (dict): {key: value} the entry must have, compared as text.
+    """
+    min_level = logging.getLevelName(level.upper()) if level else None
+    if level and not isinstance(min_level, int):
+        raise ValueError(f"Unknown log level '{level}'")
+    since = parse_timestamp(since) if since else None
+    until = parse_timestamp(until) if until else None
+    extras = extras or {}
+
+    def match(entry):
+        if min_level is not None:
+            entry_level = logging.getLevelName(entry.get("level", ""))
+            if not isinstance(entry_level, int) or entry_level < min_level:
+                return False
+        if logger_name is not None:
+            name = entry.get("logger", "")
+            if name != logger_name and not name.startswith(logger_name + "."):
+                return False
+        if since is not None or until is not None:
+            try:
+                timestamp = parse_timestamp(entry["timestamp"])
+            except (KeyError, TypeError, ValueError):
+                return False
+            if since is not None and timestamp < since:
+                return False
+            if until is not None and timestamp > until:
+                return False
+        for key, value in extras.items():
+            actual = _lookup(entry, key)
+            if actual is None or str(actual) != value:
+                return False
+        return True
+
+    return match
+
+
+def last_logs(num_lines, log_path=None, match=None):
+    """
+    Return the last num_lines log entries (oldest first) that match.
+
+    The log is read backwards and continues into the rotated backups until
+    enough entries are found. Lines that are not valid json are returned as
+    the JSONDecodeError when there is no filter.
+    """
+    entries: List[Any] = []
+    if num_lines <= 0:
+        return entries
+    for path in log_files(log_path):
+        for line in reverse_lines(path):
             try:
-                log_entry = json.loads(line)
-                print(json.dumps(log_entry, indent=4))
+                entry = json.loads(line)
             except json.JSONDecodeError as e:
-                print(f"Error printing log {e}")
+                if match is not None:
+                    continue
+                entry = e
+            else:
+                if match is not None and not match(entry):
+                    continue
+            entries.append(entry)
+            if len(entries) == num_lines:
+                return entries[::-1]
+    return entries[::-1]
+
+
+def print_log(entry):
+    if isinstance(entry, json.JSONDecodeError):
+        print(f"Error printing log {entry}")
+    else:
+        print(json.dumps(entry, indent=4))
+
+
+def print_last_logs(num_lines, log_path=None, match=None):
+    for entry in last_logs(num_lines, log_path, match):
+        print_log(entry)
+
+
+def follow_logs(log_path=None, match=None, poll_interval=0.5, idle_timeout=None):
+    """
+    Print new log entries as they are written, like tail -f.
+
+    When the log is rotated the rest of the old file is read and then the
+    new file is followed from its start. Runs until interrupted, or until
+    idle_timeout seconds pass without a new line.
+    """
+    if log_path is None:
+        log_path = json_file
+    f = open(log_path, "rb")
+    f.seek(0, os.SEEK_END)
+    inode = os.fstat(f.fileno()).st_ino
+    partial = b""
+    last_line = time.monotonic()
+    try:
+        while True:
+            chunk = f.read()
+            if chunk:
+                # a line is only complete once its newline is written
+                *lines, partial = (partial + chunk).split(b"\n")
+                for line in lines:
+                    if not line.strip():
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError as e:
+                        entry = e
+                    if match is None or (isinstance(entry, dict) and match(entry)):
+                        print_log(entry)
+                sys.stdout.flush()
+                last_line = time.monotonic()
+                continue
+            try:
+                stat = os.stat(log_path)
+            except FileNotFoundError:
+                stat = None
+            if stat is not None and (stat.st_ino != inode or stat.st_size < f.tell()):
+                f.close()
+                f = open(log_path, "rb")
+                inode = os.fstat(f.fileno()).st_ino
+                partial = b""
+                continue
+            if idle_timeout is not None and time.monotonic() - last_line > idle_timeout:
+                return
+            time.sleep(poll_interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        f.close()
 
 
-def main(num_lines):
-    print_last_logs(num_lines)
+def main(
+    num_lines,
+    log_path=None,
+    level=None,
+    logger_name=None,
+    since=None,
+    until=None,
+    extras=None,
+    follow=False,
+):
+    flush_logging()
+    match = None
+    if level or logger_name or since or until or extras:
+        match = record_filter(level, logger_name, since, until, parse_extras(extras))
+    print_last_logs(num_lines, log_path, match)
+    if follow:
+        follow_logs(log_path, match)
 
 
 def init():
@@ -0,0 +1,178 @@
+import os
+import json
+import random
+import logging
+from typing import Dict
+from flowvcutils.jsonlogger import log_files, record_filter, flush_logging
+
+logger = logging.getLogger(__name__)
+
+GROUP_BY = ["stage", "case", "run"]
+# durations kept per group for the percentiles, beyond this they are sampled
+RESERVOIR_SIZE = 2048
+PERCENTILES = (50, 90, 99)
+# directories vtu2bin and inigenerator read from and write to inside a case
+CASE_SUB_DIRECTORIES = {"input_vtu", "input_bin", "output_bin"}
+
+
+def percentile(ordered, q):
+    """The q-th percentile (nearest rank) of sorted values."""
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+
+class stageStats:
+    """Running totals and a bounded sample of durations for one group."""
+
+    def __init__(self, seed=0):
+        self.count = 0
+        self.failed = 0
+        self.total_s = 0.0
+        self.max_s = 0.0
+        self.totals = {"bytes": 0, "nodes": 0, "elements": 0}
+        self.sample = []
+        self.random = random.Random(seed)
+
+    def add(self, span):
+        duration = float(span.get("duration_s", 0.0))
+        self.count += 1
+        self.failed += bool(span.get("failed"))
+        self.total_s += duration
+        self.max_s = max(self.max_s, duration)
+        for field in self.totals:
+            self.totals[field] += span.get(field) or 0
+        # reservoir sampling keeps an even sample of every duration seen
+        if len(self.sample) < RESERVOIR_SIZE:
+            self.sample.append(duration)
+        else:
+            slot = self.random.randrange(self.count)
+            if slot < RESERVOIR_SIZE:
+                self.sample[slot] = duration
+
+    def summary(self):
+        summary = {
+            "count": self.count,
+            "failed": self.failed,
+            "total_s": self.total_s,
+            "mean_s": self.total_s / self.count if self.count else 0.0,
+            "max_s": self.max_s,
+        }
+        ordered = sorted(self.sample)
+        for q in PERCENTILES:
+            summary[f"p{q}_s"] = percentile(ordered, q)
+        for field, total in self.totals.items():
+            if total:
+                summary[field] = total
+                summary[f"{field}_per_s"] = total / self.total_s if self.total_s else 0
+        return summary
+
+
+def case_directory(path):
+    """The case directory of a file a stage read or wrote."""
+    directory = os.path.dirname(path)
+    if os.path.basename(directory) in CASE_SUB_DIRECTORIES:
+        directory = os.path.dirname(directory)
+    return directory
+
+
+def group_key(entry, span, by):
+    if by == "stage":
+        return span.get("stage")
+    if by == "case":
+        path = span.get("path")
+        return case_directory(path) if path else None
+    return entry.get("run_id")
+
+
+def iter_entries(log_path=None):
+    """Every entry of the log and its backups, one line in memory at a time."""
+    for path in reversed(log_files(log_path)):
+        with open(path, "rb") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+
+
+def aggregate(entries, by="stage", stage=None, match=None):
+    """
+    Aggregate the stage records (see perf.stage_span) of entries.
+
+    Args:
+        entries: Log entries (dicts).
+        by (str): Group by stage, case (directory of the file a stage read or
+            wrote) or run (the run_id of the command).
+        stage (str): Only this stage.
+        match (callable): Only entries it returns True for.
+
+    Returns:
+        dict: {group: summary} sorted by group.
+    """
+    if by not in GROUP_BY:
+        raise ValueError(f"Cannot group by '{by}', choose one of {GROUP_BY}")
+    groups: Dict[str, stageStats] = {}
+    for entry in entries:
+        span = entry.get("stage")
+        if not isinstance(span, dict):
+            continue
+        if stage is not None and span.get("stage") != stage:
+            continue
+        if match is not None and not match(entry):
+            continue
+        key = group_key(entry, span, by)
+        if key is None:
+            continue
+        if key not in groups:
+            groups[key] = stageStats(seed=len(groups))
+        groups[key].add(span)
+    return {key: groups[key].summary() for key in sorted(groups)}
+
+
+def format_table(stats, by):
+    """Format the aggregate as a plain text table."""
+    columns = [
+        ("count", "count", "{:d}"),
+        ("failed", "failed", "{:d}"),
+        ("total_s", "total s", "{:.3f}"),
+        ("p50_s", "p50 s", "{:.4f}"),
+        ("p90_s", "p90 s", "{:.4f}"),
+        ("p99_s", "p99 s", "{:.4f}"),
+        ("max_s", "max s", "{:.4f}"),
+        ("bytes_per_s", "MB/s", "{:.1f}"),
+        ("nodes_per_s", "nodes/s", "{:.0f}"),
+        ("elements_per_s", "elements/s", "{:.0f}"),
+    ]
+    rows = [[by] + [title for _, title, _ in columns]]
+    for key, summary in stats.items():
+        row = [str(key)]
+        for field, _, fmt in columns:
+            value = summary.get(field)
+            if value is None:
+                row.append("-")
+            elif field == "bytes_per_s":
+                row.append(fmt.format(value / 1e6))
+            else:
+                row.append(fmt.format(value))
+        rows.append(row)
+    widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+    lines = []
+    for row in rows:
+        cells = [row[0].ljust(widths[0])]
+        cells += [cell.rjust(width) for cell, width in zip(row[1:], widths[1:])]
+        lines.append("  ".join(cells))
+    return "\n".join(lines)
+
+
+def main(log_path=None, by="stage", stage=None, since=None, until=None, as_json=False):
+    flush_logging()
+    match = record_filter(since=since, until=until) if since or until else None
+    stats = aggregate(iter_entries(log_path), by=by, stage=stage, match=match)
+    if as_json:
+        print(json.dumps(stats, indent=4))
+    elif stats:
+        print(format_table(stats, by))
+    else:
+        print("No stage records found")
+    return stats
@@ -0,0 +1,203 @@
+import os
+import time
+import logging
+import threading
+import contextlib
+from flowvcutils.utils import write_text_atomic
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INTERVAL = 15.0
+
+# the metrics of this process, None when no --metrics file was given
+_collector = None
+
+METRICS = [
+    ("items", "gauge", "Frames, jobs or cases the command has to process."),
+    ("items_done", "gauge", "Items finished, failed or not."),
+    ("items_remaining", "gauge", "Items not finished yet."),
+    ("items_failed_total", "counter", "Items that failed."),
+    ("bytes_written_total", "counter", "Bytes of output written."),
+    ("bytes_per_second", "gauge", "Bytes written per second since the last update."),
+    ("items_per_second", "gauge", "Items finished per second since the last update."),
+    ("workers", "gauge", "Workers (processes, threads or job slots) available."),
+    ("workers_busy", "gauge", "Workers processing an item."),
+    ("worker_utilization", "gauge", "Fraction of the workers that are busy."),
+    ("start_time_seconds", "gauge", "Unix time the command started."),
+    ("last_update_timestamp_seconds", "gauge", "Unix time of this update."),
+]
+
+
+class textfileMetrics:
+    """Progress of a command as a node_exporter textfile collector .prom file.
+
+    The file is rewritten atomically every interval seconds by a background
+    thread, and once more when the metrics are stopped.
+    """
+
+    def __init__(self, path, interval=DEFAULT_INTERVAL):
+        self.path = path
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.command = "flowvcutils"
+        self.item = "item"
+        self.total = 0
+        self.planned = 0
+        self.started = 0
+        self.done = 0
+        self.failed = 0
+        self.bytes_written = 0
+        self.workers = 1
+        self.start_time = time.time()
+        self.rates = (0.0, 0.0)
+        self._last = (time.monotonic(), 0, 0)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def track(self, command, item, total, workers=1):
+        with self.lock:
+            self.command = command
+            self.item = item
+            # items counted up front by plan are not added again
+            covered = min(total, self.planned)
+            self.planned -= covered
+            self.total += total - covered
+            self.workers = max(1, workers)
+
+    def plan(self, command, item, total, workers=1):
+        with self.lock:
+            self.command = command
+            self.item = item
+            self.total += total
+            self.planned += total
+            self.workers = max(1, workers)
+
+    def item_started(self):
+        with self.lock:
+            self.started += 1
+
+    def item_finished(self, bytes_written=0, failed=False):
+        with self.lock:
+            self.done += 1
+            self.failed += bool(failed)
+            self.bytes_written += bytes_written
+
+    def values(self):
+        """The current value of each metric in METRICS."""
+        with self.lock:
+            now = time.monotonic()
+            last_time, last_bytes, last_done = self._last
+            if now > last_time:
+                self.rates = (
+                    (self.bytes_written - last_bytes) / (now - last_time),
+                    (self.done - last_done) / (now - last_time),
+                )
+                self._last = (now, self.bytes_written, self.done)
+            busy = min(max(self.started - self.done, 0), self.workers)
+            return {
+                "items": self.total,
+                "items_done": self.done,
+                "items_remaining": max(self.total - self.done, 0),
+                "items_failed_total": self.failed,
+                "bytes_written_total": self.bytes_written,
+                "bytes_per_second": self.rates[0],
+                "items_per_second": self.rates[1],
+                "workers": self.workers,
+                "workers_busy": busy,
+                "worker_utilization": busy / self.workers,
+                "start_time_seconds": self.start_time,
+                "last_update_timestamp_seconds": time.time(),
+            }
+
+    def render(self):
+        """The metrics in the Prometheus text exposition format."""
+        values = self.values()
+        labels = f'command="{self.command}",item="{self.item}"'
+        lines = []
+        for name, metric_type, help_text in METRICS:
+            lines.append(f"# HELP flowvcutils_{name} {help_text}")
+            lines.append(f"# TYPE flowvcutils_{name} {metric_type}")
+            lines.append(f"flowvcutils_{name}{{{labels}}} {values[name]}")
+        return "\n".join(lines) + "\n"
+
+    def write(self):
+        try:
+            write_text_atomic(self.path, self.render())
+        except OSError:
+            logger.warning(f"Could not write metrics to {self.path}", exc_info=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.write()
+
+    def start(self):
+        self.write()
+        self._thread = threading.Thread(target=self._run, name="metrics", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.write()
+
+
+def start_metrics(path, interval=DEFAULT_INTERVAL):
+    """Write the progress of this command to the .prom file path."""
+    global _collector
+    _collector = textfileMetrics(os.path.abspath(path), interval)
+    _collector.start()
+    return _collector
+
+
+def stop_metrics():
+    """Write the final metrics and stop updating the file."""
+    global _collector
+    collector, _collector = _collector, None
+    if collector is not None:
+        collector.stop()
+
+
+def track(command, item, total, workers=1):
+    """Add total items of a command (e.g. vtu2bin frames) to the metrics."""
+    if _collector is not None:
+        _collector.track(command, item, total, workers)
+
+
+def plan(command, item, total, workers=1):
+    """
+    Count total items of a command up front, before the steps tracking them.
+
+    The next track calls, up to total items, are already counted and leave
+    the total as it is, so a batch does not seem done between its steps.
+    """
+    if _collector is not None:
+        _collector.plan(command, item, total, workers)
+
+
+def item_started():
+    if _collector is not None:
+        _collector.item_started()
+
+
+def item_finished(bytes_written=0, failed=False):
+    if _collector is not None:
+        _collector.item_finished(bytes_written, failed)
+
+
+@contextlib.contextmanager
+def track_item():
+    """
+    Count the block as one item, busy while it runs.
+
+    Yields a dict the block can set bytes_written and failed in, an
+    exception also counts the item as failed.
+    """
+    result = {"bytes_written": 0, "failed": False}
+    item_started()
+    try:
+        yield result
+    except BaseException:
+        item_finished(result["bytes_written"], failed=True)
+        raise
+    item_finished(result["bytes_written"], result["failed"])
@@ -0,0 +1,281 @@
+import os
+import glob
+import json
+import time
+import pstats
+import cProfile
+import logging
+import threading
+import contextlib
+import tracemalloc
+from types import ModuleType
+from typing import Optional
+from flowvcutils.utils import maxrss_to_bytes
+from flowvcutils.jsonlogger import json_file, RUN_ID
+
+resource: Optional[ModuleType]
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+# span fields that also get a {field}_per_s throughput
+RATE_FIELDS = ("bytes", "nodes", "elements")
+
+# lines in the --profile and --profile-memory reports
+PROFILE_TOP = 40
+
+# the trace being recorded by this process, None when tracing is off
+_tracer = None
+# (profiler, command) while --profile is on
+_profile = None
+# command while --profile-memory is on
+_memory_profile = None
+
+
+def peak_rss_bytes():
+    """Peak resident memory of this process in bytes (None on Windows)."""
+    if resource is None:
+        return None
+    return maxrss_to_bytes(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+
+
+@contextlib.contextmanager
+def stage_span(stage, log=logger, level=logging.DEBUG, **fields):
+    """
+    Time a stage of a pipeline and log its duration and throughput.
+
+    Yields a dict the stage fills in with what it processed (bytes, nodes,
+    elements or any other field). On exit one record is logged with the
+    dict as extra={"stage": span}, holding the stage name, duration_s,
+    {field}_per_s for bytes, nodes and elements and peak_rss_bytes.
+
+    Example:
+        with stage_span("read", logger, path=path) as span:
+            reader.Update()
+            span["nodes"] = reader.GetOutput().GetNumberOfPoints()
+    """
+    span = dict(fields, stage=stage)
+    tracer = _tracer
+    wall_start = time.time()
+    start = time.perf_counter()
+    try:
+        yield span
+    except BaseException:
+        span["failed"] = True
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        if tracer is not None:
+            tracer.add(stage, "stage", wall_start, duration, span)
+        if log.isEnabledFor(level):
+            span["duration_s"] = duration
+            for field in RATE_FIELDS:
+                if span.get(field) and duration > 0:
+                    span[f"{field}_per_s"] = span[field] / duration
+            span["peak_rss_bytes"] = peak_rss_bytes()
+            log.log(level, f"{stage} took {duration:.3f}s", extra={"stage": span})
+
+
+class chromeTrace:
+    """Complete ("X") events in the Chrome trace-event format.
+
+    The process that started the trace keeps its events in memory and
+    writes them to path on save. Worker processes append theirs to
+    {path}.{pid}.part as they happen, save merges those files in.
+    Open the file in https://ui.perfetto.dev or chrome://tracing.
+    """
+
+    def __init__(self, path, worker=False):
+        self.path = path
+        self.worker = worker
+        self.events = []
+        self.pid = os.getpid()
+        self.lock = threading.Lock()
+        self.threads_seen = set()
+        self.part = open(f"{path}.{self.pid}.part", "a") if worker else None
+        name = "flowvcutils worker" if worker else "flowvcutils"
+        self.add_metadata("process_name", self.pid, None, name)
+
+    def add_metadata(self, name, pid, tid, value):
+        event = {"name": name, "ph": "M", "pid": pid, "args": {"name": value}}
+        if tid is not None:
+            event["tid"] = tid
+        self._write(event)
+
+    def add(self, name, category, start, duration, args=None):
+        thread = threading.current_thread()
+        event = {
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": start * 1e6,
+            "dur": duration * 1e6,
+            "pid": self.pid,
+            "tid": thread.ident,
+        }
+        if args:
+            event["args"] = args
+        self._write(event, thread)
+
+    def _write(self, event, thread=None):
+        with self.lock:
+            if thread is not None and thread.ident not in self.threads_seen:
+                self.threads_seen.add(thread.ident)
+                self._write_unlocked(
+                    {
+                        "name": "thread_name",
+                        "ph": "M",
+                        "pid": self.pid,
+                        "tid": thread.ident,
+                        "args": {"name": thread.name},
+                    }
+                )
+            self._write_unlocked(event)
+
+    def _write_unlocked(self, event):
+        if self.part is None:
+            self.events.append(event)
+        else:
+            self.part.write(json.dumps(event, default=str) + "\n")
+            self.part.flush()
+
+    def save(self):
+        """Write the trace file, with the events of every worker process."""
+        events = list(self.events)
+        for part_path in sorted(glob.glob(f"{glob.escape(self.path)}.*.part")):
+            with open(part_path) as f:
+                events.extend(json.loads(line) for line in f if line.strip())
+            os.remove(part_path)
+        with open(self.path, "w") as f:
+            json.dump({"traceEvents": events}, f, default=str)
+        logger.info(f"Wrote {len(events)} trace events to {self.path}")
+
+
+def start_trace(path):
+    """Record stage and trace spans of this process (and its workers) to path."""
+    global _tracer
+    _tracer = chromeTrace(os.path.abspath(path))
+    return _tracer
+
+
+def stop_trace():
+    """Write the trace started by start_trace, if any."""
+    global _tracer
+    tracer, _tracer = _tracer, None
+    if tracer is not None:
+        tracer.save()
+
+
+def trace_path():
+    """Path of the trace being recorded, to pass to init_worker_trace."""
+    return None if _tracer is None else _tracer.path
+
+
+def init_worker_trace(path):
+    """Process pool initializer part: record this worker's spans into path."""
+    global _tracer
+    _tracer = None if path is None else chromeTrace(path, worker=True)
+
+
+@contextlib.contextmanager
+def trace_span(name, category="job", **args):
+    """Record a block as a trace event (nothing is logged), e.g. a job."""
+    tracer = _tracer
+    if tracer is None:
+        yield
+        return
+    wall_start = time.time()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        tracer.add(name, category, wall_start, time.perf_counter() - start, args)
+
+
+def profile_path(command, suffix, logs_dir=None):
+    """{logs_dir}/profile-{command}-{run id}{suffix}, logs_dir defaults to the logs."""
+    if logs_dir is None:
+        logs_dir = os.path.dirname(json_file)
+    os.makedirs(logs_dir, exist_ok=True)
+    return os.path.join(logs_dir, f"profile-{command}-{RUN_ID}{suffix}")
+
+
+def start_profile(command):
+    """Profile this process with cProfile until stop_profile."""
+    global _profile
+    profiler = cProfile.Profile()
+    _profile = (profiler, command)
+    profiler.enable()
+
+
+def stop_profile(logs_dir=None):
+    """
+    Stop the profile started by start_profile and write it to logs_dir.
+
+    Writes the raw profile to profile-{command}-{run id}.pstats (for
+    snakeviz, pstats or gprof2dot) and the top functions by cumulative and
+    by own time to a .txt next to it.
+
+    Returns:
+        tuple: (pstats path, report path), None if no profile was running.
+    """
+    global _profile
+    profile, _profile = _profile, None
+    if profile is None:
+        return None
+    profiler, command = profile
+    profiler.disable()
+    pstats_path = profile_path(command, ".pstats", logs_dir)
+    report_path = profile_path(command, ".txt", logs_dir)
+    profiler.dump_stats(pstats_path)
+    with open(report_path, "w") as f:
+        stats = pstats.Stats(profiler, stream=f)
+        for sort in ["cumulative", "tottime"]:
+            f.write(f"Top {PROFILE_TOP} functions by {sort}\n")
+            stats.sort_stats(sort).print_stats(PROFILE_TOP)
+    logger.info(f"Wrote the profile of {command} to {report_path} and {pstats_path}")
+    return pstats_path, report_path
+
+
+def start_memory_profile(command):
+    """Trace the allocations of this process with tracemalloc until stopped."""
+    global _memory_profile
+    _memory_profile = command
+    tracemalloc.start()
+
+
+def stop_memory_profile(logs_dir=None):
+    """
+    Stop tracemalloc and write the lines holding the most memory to logs_dir.
+
+    The report (profile-{command}-{run id}.memory.txt) has the current and
+    peak traced memory and the top allocating lines still alive at the end
+    of the command.
+
+    Returns:
+        str: The report path, None if no memory profile was running.
+    """
+    global _memory_profile
+    command, _memory_profile = _memory_profile, None
+    if command is None or not tracemalloc.is_tracing():
+        return None
+    snapshot = tracemalloc.take_snapshot()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    snapshot = snapshot.filter_traces(
+        [
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+        ]
+    )
+    report_path = profile_path(command, ".memory.txt", logs_dir)
+    with open(report_path, "w") as f:
+        f.write(f"Traced memory: {current} bytes current, {peak} bytes peak\n")
+        f.write(f"Top {PROFILE_TOP} lines by allocated size\n")
+        for stat in snapshot.statistics("lineno")[:PROFILE_TOP]:
+            f.write(f"{stat}\n")
+    logger.info(f"Wrote the memory profile of {command} to {report_path}")
+    return report_path
@@ -0,0 +1,415 @@
+import os
+import glob
+import json
+import time
+import hashlib
+import logging
+import threading
+import datetime as dt
+from typing import Any, Dict
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from flowvcutils.jsonlogger import settup_logging
+from flowvcutils.perf import trace_span
+from flowvcutils.utils import write_json_atomic
+from flowvcutils.jobrunner import (
+    DEFAULT_FLOWVC_EXE,
+    TOPOLOGY_FILE_TYPES,
+    parse_in_file,
+    find_input_files,
+    load_run_cache,
+    run_job,
+)
+
+logger = logging.getLogger(__name__)
+
+# stage: the stages it needs first, inigenerator only needs the renamed frames.
+# The stages import their modules when they run, so vtk is only imported when
+# a vtk stage is not up to date.
+STAGES = {
+    "rename": [],
+    "vtu2bin": ["rename"],
+    "inigenerator": ["rename"],
+    "flowvc": ["vtu2bin", "inigenerator"],
+}
+STATE_FILE_NAME = ".pipeline_state.json"
+SUMMARY_FILE_NAME = "pipeline_summary.json"
+# stage statuses that stop the stages after them
+FAILED_STATUSES = ("failed", "blocked")
+
+
+def fingerprint(paths, base_dir, params=None):
+    """
+    Hash the parameters and the name, size and mtime of each path.
+
+    Names are relative to base_dir, a missing path counts as a change.
+    """
+    hasher = hashlib.sha256(json.dumps(params, sort_keys=True).encode())
+    for path in sorted(paths):
+        try:
+            stat = os.stat(path)
+            signature = f"{stat.st_size}:{stat.st_mtime_ns}"
+        except FileNotFoundError:
+            signature = "missing"
+        hasher.update(f"{os.path.relpath(path, base_dir)}\0{signature}\n".encode())
+    return hasher.hexdigest()
+
+
+class pipelineCase:
+    """The stages of one case directory (input_vtu/ and input_bin/).
+
+    rename names the raw {current_name}N.vtu frames {case}_N.vtu, vtu2bin
+    converts them into input_bin, inigenerator writes input_bin/{case}.in
+    and flowvc runs it. Each stage has {stage}_inputs, {stage}_outputs,
+    {stage}_params and run_{stage} methods.
+    """
+
+    def __init__(
+        self,
+        directory,
+        start,
+        stop,
+        increment=50,
+        num_digits=5,
+        field_name="velocity",
+        current_name="all_results_",
+        cell_size=0.001,
+        direction="backward",
+        flowvc_exe=DEFAULT_FLOWVC_EXE,
+        max_workers=1,
+    ):
+        self.directory = os.path.abspath(directory)
+        self.name = os.path.basename(self.directory)
+        self.prefix = self.name[:-1] if self.name.endswith("_") else self.name
+        self.vtu_dir = os.path.join(self.directory, "input_vtu")
+        self.bin_dir = os.path.join(self.directory, "input_bin")
+        self.in_file = os.path.join(self.bin_dir, f"{self.prefix}.in")
+        self.numbers = range(start, stop + 1, increment)
+        self.start = start
+        self.stop = stop
+        self.increment = increment
+        self.num_digits = num_digits
+        self.field_name = field_name
+        self.current_name = current_name
+        self.cell_size = cell_size
+        self.direction = direction
+        self.flowvc_exe = flowvc_exe
+        self.max_workers = max_workers
+        self.state_path = os.path.join(self.directory, STATE_FILE_NAME)
+        self.lock = threading.Lock()
+
+    def frame_path(self, number):
+        return os.path.join(
+            self.vtu_dir, f"{self.prefix}_{number:0{self.num_digits}d}.vtu"
+        )
+
+    def rename_inputs(self):
+        return glob.glob(os.path.join(glob.escape(self.vtu_dir), "*.vtu"))
+
+    def rename_outputs(self):
+        pattern = os.path.join(glob.escape(self.vtu_dir), f"{self.prefix}_*.vtu")
+        return glob.glob(pattern)
+
+    def rename_params(self):
+        return {"current_name": self.current_name}
+
+    def run_rename(self):
+        from flowvcutils.filerename import rename_files
+
+        rename_files(self.vtu_dir, prefix=self.name, current_name=self.current_name)
+
+    def vtu2bin_inputs(self):
+        return [self.frame_path(number) for number in self.numbers]
+
+    def vtu2bin_outputs(self):
+        topology = [
+            os.path.join(self.bin_dir, f"{self.prefix}_{file_type}.bin")
+            for file_type in TOPOLOGY_FILE_TYPES[:3]
+        ]
+        return topology + [
+            os.path.join(self.bin_dir, f"{self.prefix}_vel.{number}.bin")
+            for number in self.numbers
+        ]
+
+    def vtu2bin_params(self):
+        return {
+            "start": self.start,
+            "stop": self.stop,
+            "increment": self.increment,
+            "field_name": self.field_name,
+        }
+
+    def run_vtu2bin(self):
+        from flowvcutils.vtu_2_bin import process_folder
+
+        os.makedirs(self.bin_dir, exist_ok=True)
+        process_folder(
+            root=self.vtu_dir,
+            output=self.bin_dir,
+            file_name=f"{self.prefix}_",
+            extension=".vtu",
+            start=self.start,
+            stop=self.stop,
+            increment=self.increment,
+            num_digits=self.num_digits,
+            field_name=self.field_name,
+            max_workers=self.max_workers,
+        )
+
+    def inigenerator_inputs(self):
+        from flowvcutils.inigenerator import get_config_path
+
+        return [self.frame_path(self.start), get_config_path()]
+
+    def inigenerator_outputs(self):
+        return [self.in_file]
+
+    def inigenerator_params(self):
+        return {"cell_size": self.cell_size, "direction": self.direction}
+
+    def run_inigenerator(self):
+        from flowvcutils.inigenerator import main as inigenerator_main
+
+        os.makedirs(self.bin_dir, exist_ok=True)
+        inigenerator_main(
+            self.directory,
+            auto_range=True,
+            cell_size=self.cell_size,
+            direction=self.direction,
+            input_pattern=f"{self.prefix}_{{index:0{self.num_digits}d}}.vtu",
+        )
+
+    def _in_params(self):
+        if not os.path.isfile(self.in_file):
+            return {}
+        with open(self.in_file) as f:
+            return parse_in_file(f.read())
+
+    def flowvc_inputs(self):
+        return [self.in_file] + find_input_files(self.in_file, self._in_params())
+
+    def flowvc_outputs(self):
+        # the files run_job saw the last successful run write, not every file
+        # in Path_Output with the prefix
+        cache = load_run_cache(self.in_file)
+        return cache.get("outputs", []) if cache else []
+
+    def flowvc_params(self):
+        return {"flowvc_exe": self.flowvc_exe}
+
+    def run_flowvc(self):
+        record = run_job(self.in_file, flowvc_exe=self.flowvc_exe)
+        if record["exit_status"] != 0:
+            raise RuntimeError(
+                f"flowVC exited with status {record['exit_status']}, "
+                f"see {record['stderr']}"
+            )
+
+    def load_state(self):
+        try:
+            with open(self.state_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save_stage_state(self, stage, fingerprints):
+        """Record (or with None forget) the fingerprints of a stage."""
+        with self.lock:
+            state = self.load_state()
+            if fingerprints is None:
+                state.pop(stage, None)
+            else:
+                state[stage] = fingerprints
+            write_json_atomic(self.state_path, state)
+
+    def fingerprints(self, stage):
+        """{"inputs": ..., "outputs": ...} fingerprints of stage as it is now."""
+        outputs = getattr(self, f"{stage}_outputs")()
+        return {
+            "inputs": fingerprint(
+                getattr(self, f"{stage}_inputs")(),
+                self.directory,
+                getattr(self, f"{stage}_params")(),
+            ),
+            "outputs": fingerprint(outputs, self.directory) if outputs else None,
+        }
+
+    def is_up_to_date(self, stage):
+        """True if stage last succeeded with the same inputs and its outputs since."""
+        recorded = self.load_state().get(stage)
+        return (
+            recorded is not None
+            and recorded.get("outputs") is not None
+            and recorded == self.fingerprints(stage)
+        )
+
+    def run_stage(self, stage, force=False):
+        """
+        Run stage unless it is up to date.
+
+        Returns:
+            dict: The case, stage, status (ran, up_to_date or failed) and
+                wall_time_s of the stage.
+        """
+        record = {"case": self.name, "stage": stage, "wall_time_s": 0.0}
+        if not force and self.is_up_to_date(stage):
+            logger.info(f"{self.name}: {stage} is up to date")
+            record["status"] = "up_to_date"
+            return record
+
+        logger.info(f"{self.name}: running {stage}")
+        record["start_time"] = dt.datetime.now(tz=dt.timezone.utc).isoformat()
+        start = time.perf_counter()
+        try:
+            with trace_span(f"{self.name} {stage}", "stage"):
+                getattr(self, f"run_{stage}")()
+        except Exception as e:
+            record["wall_time_s"] = time.perf_counter() - start
+            record["status"] = "failed"
+            record["error"] = str(e)
+            logger.error(f"{self.name}: {stage} failed: {e}", exc_info=True)
+            self.save_stage_state(stage, None)
+            return record
+        record["wall_time_s"] = time.perf_counter() - start
+        record["status"] = "ran"
+        # recorded after the run, rename changes the names of its own inputs
+        self.save_stage_state(stage, self.fingerprints(stage))
+        logger.info(
+            f"{self.name}: {stage} finished in {record['wall_time_s']:.2f}s",
+            extra={"job": record},
+        )
+        return record
+
+
+def run_graph(tasks, run, max_jobs=1):
+    """
+    Run a DAG of tasks, each as soon as the tasks it depends on succeeded.
+
+    Args:
+        tasks (dict): {key: [keys it depends on]}.
+        run (callable): run(key), called on a worker thread, returns a dict
+            with a status. A status in FAILED_STATUSES blocks the tasks
+            that depend on key, they get {"status": "blocked"}.
+        max_jobs (int): Tasks running at once.
+
+    Returns:
+        dict: {key: record} for every task.
+    """
+    for key, dependencies in tasks.items():
+        for dependency in dependencies:
+            if dependency not in tasks:
+                raise ValueError(f"{key} depends on the unknown task {dependency}")
+    results: Dict[Any, Dict[str, Any]] = {}
+    pending = dict(tasks)
+    running: Dict[Future[Dict[str, Any]], Any] = {}
+    with ThreadPoolExecutor(max_workers=max(1, max_jobs)) as pool:
+        while pending or running:
+            progressed = False
+            for key, dependencies in list(pending.items()):
+                statuses = [
+                    results[dep]["status"] for dep in dependencies if dep in results
+                ]
+                if any(status in FAILED_STATUSES for status in statuses):
+                    results[key] = {"status": "blocked"}
+                elif len(statuses) == len(dependencies):
+                    running[pool.submit(run, key)] = key
+                else:
+                    continue
+                del pending[key]
+                progressed = True
+            if not running:
+                if not progressed:
+                    raise ValueError(f"Dependency cycle between {sorted(pending)}")
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                results[running.pop(future)] = future.result()
+    return results
+
+
+def discover_cases(directory):
+    """directory itself if it has an input_vtu, otherwise its subdirectories that do."""
+    if os.path.isdir(os.path.join(directory, "input_vtu")):
+        return [directory]
+    return [
+        os.path.join(directory, name)
+        for name in sorted(os.listdir(directory))
+        if os.path.isdir(os.path.join(directory, name, "input_vtu"))
+    ]
+
+
+def run_pipeline(cases, stages=None, max_jobs=1, force=False):
+    """
+    Run the stages of each pipelineCase, cases and independent stages at once.
+
+    A failed stage blocks the later stages of its case only.
+
+    Returns:
+        list: The record of each stage of each case, in order.
+    """
+    stages = [stage for stage in STAGES if stages is None or stage in stages]
+    by_name = {case.name: case for case in cases}
+    tasks = {
+        (case.name, stage): [(case.name, dep) for dep in STAGES[stage] if dep in stages]
+        for case in cases
+        for stage in stages
+    }
+
+    def _run(key):
+        name, stage = key
+        return by_name[name].run_stage(stage, force=force)
+
+    results = run_graph(tasks, _run, max_jobs)
+    records = []
+    for name, stage in tasks:
+        record = dict(results[(name, stage)], case=name, stage=stage)
+        if record["status"] == "blocked":
+            logger.warning(f"{name}: {stage} not run, an earlier stage failed")
+        records.append(record)
+    return records
+
+
+def main(
+    directory,
+    start,
+    stop,
+    cases=None,
+    stages=None,
+    max_jobs=1,
+    force=False,
+    summary_path=None,
+    **case_kwargs,
+):
+    settup_logging()
+    if not cases:
+        cases = discover_cases(directory)
+    else:
+        cases = [os.path.join(directory, case) for case in cases]
+    if summary_path is None:
+        summary_path = os.path.join(directory, SUMMARY_FILE_NAME)
+    pipeline_cases = [pipelineCase(case, start, stop, **case_kwargs) for case in cases]
+
+    logger.info(
+        f"Running the pipeline for {len(pipeline_cases)} cases "
+        f"({max_jobs} stages at a time)"
+    )
+    records = run_pipeline(pipeline_cases, stages, max_jobs, force)
+    counts = {
+        status: sum(1 for record in records if record["status"] == status)
+        for status in ["ran", "up_to_date", "failed", "blocked"]
+    }
+    summary = {
+        "directory": directory,
+        "stages": stages or list(STAGES),
+        "n_stages": len(records),
+        "n_ran": counts["ran"],
+        "n_up_to_date": counts["up_to_date"],
+        "n_failed": counts["failed"] + counts["blocked"],
+        "jobs": records,
+    }
+    write_json_atomic(summary_path, summary)
+    logger.info(
+        f"{summary['n_stages']} stages, {summary['n_ran']} ran, "
+        f"{summary['n_up_to_date']} up to date, {counts['failed']} failed, "
+        f"{counts['blocked']} blocked. Summary: {summary_path}"
+    )
+    return summary
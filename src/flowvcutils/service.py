@@ -0,0 +1,224 @@
+import os
+import json
+import signal
+import socket
+import getpass
+import threading
+import logging
+import tempfile
+import importlib
+import socketserver
+from typing import cast
+from concurrent.futures import ProcessPoolExecutor
+from flowvcutils.jsonlogger import settup_logging, worker_logging, init_worker_logging
+
+logger = logging.getLogger(__name__)
+
+# job: (module, function) the service can run
+JOBS = {
+    "process_folder": ("flowvcutils.vtu_2_bin", "process_folder"),
+    "process_directory": ("flowvcutils.vtu_2_bin", "process_directory"),
+    "inigenerator": ("flowvcutils.inigenerator", "main"),
+}
+SOCKET_ENV_VAR = "FLOWVCUTILS_SOCKET"
+DEFAULT_WORKERS = 4
+
+
+def default_socket_path():
+    """
+    $FLOWVCUTILS_SOCKET, or flowvcutils.sock in $XDG_RUNTIME_DIR.
+
+    Without a runtime directory (only the user can write to it) the socket
+    is flowvcutils-{user}.sock in the temp directory.
+    """
+    if os.environ.get(SOCKET_ENV_VAR):
+        return os.environ[SOCKET_ENV_VAR]
+    if os.environ.get("XDG_RUNTIME_DIR"):
+        return os.path.join(os.environ["XDG_RUNTIME_DIR"], "flowvcutils.sock")
+    return os.path.join(tempfile.gettempdir(), f"flowvcutils-{getpass.getuser()}.sock")
+
+
+def owned_by_user(socket_path):
+    """True if the current user owns socket_path (always on Windows)."""
+    if not hasattr(os, "getuid"):
+        return True
+    return os.stat(socket_path).st_uid == os.getuid()
+
+
+def run_job(job, args=(), kwargs=None, cwd=None):
+    """Run a job of JOBS in this process (relative paths from cwd)."""
+    module_name, function_name = JOBS[job]
+    function = getattr(importlib.import_module(module_name), function_name)
+    if cwd is not None:
+        os.chdir(cwd)
+    return function(*args, **(kwargs or {}))
+
+
+def init_service_worker(log_queue):
+    """Process pool initializer, imports vtk once so every job starts warm."""
+    init_worker_logging(log_queue)
+    for module_name, _ in JOBS.values():
+        importlib.import_module(module_name)
+
+
+def _worker_pid():
+    return os.getpid()
+
+
+def _interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+
+class requestHandler(socketserver.StreamRequestHandler):
+    """One JSON request line in, one JSON response line out."""
+
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            # a connection check (see is_running)
+            return
+        try:
+            request = json.loads(line)
+            if request["job"] not in JOBS:
+                raise ValueError(f"Unknown job {request['job']}")
+            server = cast(workerService, self.server)
+            future = server.pool.submit(
+                run_job,
+                request["job"],
+                request.get("args", []),
+                request.get("kwargs", {}),
+                request.get("cwd"),
+            )
+            response = {"ok": True, "result": future.result()}
+        except Exception as e:
+            logger.error(f"Service job failed: {e}", exc_info=True)
+            response = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+        self.wfile.write(json.dumps(response, default=str).encode() + b"\n")
+
+
+class workerService(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """A Unix domain socket server running jobs on a pool of warm workers.
+
+    Each connection carries one job. The jobs run in worker processes that
+    imported vtk (and the vtu_2_bin and inigenerator modules) when they
+    started, and log through the listener of the service.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, socket_path, pool):
+        self.pool = pool
+        if os.path.exists(socket_path):
+            if is_running(socket_path):
+                raise RuntimeError(f"A service is already running on {socket_path}")
+            # left behind by a service that did not shut down
+            os.remove(socket_path)
+        super().__init__(socket_path, requestHandler)
+
+    def server_close(self):
+        super().server_close()
+        socket_path = str(self.server_address)
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+
+
+def connect(socket_path):
+    """A socket connected to the service on socket_path, None if none is running."""
+    if not hasattr(socket, "AF_UNIX"):  # Windows
+        return None
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(socket_path)
+    except OSError:
+        client.close()
+        return None
+    return client
+
+
+def is_running(socket_path=None):
+    """True if a service accepts connections on socket_path."""
+    client = connect(socket_path or default_socket_path())
+    if client is None:
+        return False
+    client.close()
+    return True
+
+
+def call(job, *args, socket_path=None, **kwargs):
+    """
+    Run job (see JOBS) on the service, or in this process if none is running.
+
+    Paths relative to the current directory work either way. Jobs sent to
+    the service run in a worker process, so any max_workers is reduced to
+    1, the service workers already run jobs side by side. A service on a
+    socket another user owns is not sent the job.
+
+    Raises:
+        RuntimeError: If the job failed in the service.
+    """
+    if socket_path is None:
+        socket_path = default_socket_path()
+    client = connect(socket_path)
+    if client is None:
+        logger.debug(f"No service on {socket_path}, running {job} in process")
+        return run_job(job, args, kwargs)
+    if not owned_by_user(socket_path):
+        client.close()
+        logger.warning(
+            f"{socket_path} belongs to another user, running {job} in process"
+        )
+        return run_job(job, args, kwargs)
+    if kwargs.get("max_workers", 1) > 1:
+        logger.warning(
+            f"max_workers={kwargs['max_workers']} is ignored, the service "
+            "converts the frames of a job one at a time"
+        )
+    if "max_workers" in kwargs:
+        kwargs["max_workers"] = 1
+    request = {"job": job, "args": args, "kwargs": kwargs, "cwd": os.getcwd()}
+    with client:
+        client.sendall(json.dumps(request).encode() + b"\n")
+        with client.makefile("rb") as response_file:
+            response = json.loads(response_file.readline())
+    if not response["ok"]:
+        raise RuntimeError(f"{job} failed in the service: {response['error']}")
+    return response["result"]
+
+
+def serve(socket_path=None, workers=DEFAULT_WORKERS, ready=None):
+    """
+    Run the service until it is interrupted.
+
+    Args:
+        socket_path (str): Unix domain socket to listen on (default:
+            default_socket_path()).
+        workers (int): Warm worker processes, the jobs run at once.
+        ready (callable): Optional ready(server) called once the workers
+            are warm and the socket is listening, e.g. to shut it down.
+    """
+    settup_logging()
+    if socket_path is None:
+        socket_path = default_socket_path()
+    if threading.current_thread() is threading.main_thread():
+        # kill and systemd stop the service as cleanly as ctrl-c
+        signal.signal(signal.SIGTERM, _interrupt)
+    with worker_logging() as log_queue, ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=init_service_worker,
+        initargs=(log_queue,),
+    ) as pool:
+        # start every worker now rather than on the first jobs
+        for future in [pool.submit(_worker_pid) for _ in range(workers)]:
+            future.result()
+        with workerService(socket_path, pool) as server:
+            logger.info(f"Service listening on {socket_path} with {workers} workers")
+            if ready is not None:
+                ready(server)
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                logger.info("Service stopped")
+
+
+def main(socket_path=None, workers=DEFAULT_WORKERS):
+    serve(socket_path, workers)
@@ -1,47 +1,334 @@
 import os
+import json
+import errno
+import hashlib
 import shutil
+import fnmatch
 import logging
 import subprocess
+import time
+from typing import Any, Dict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from flowvcutils.jsonlogger import settup_logging
+from flowvcutils.perf import trace_span
+from flowvcutils import metrics
+from flowvcutils.utils import (
+    file_stats,
+    file_sha256,
+    update_hash,
+    write_json_atomic,
+)
+
+try:
+    import fcntl
+except ImportError:  # windows
+    fcntl = None  # type: ignore[assignment]
 
 logger = logging.getLogger(__name__)
 
 
+SVPRE_LOG_NAME = "svpre.log"
+SUMMARY_FILE_NAME = "simulationgenerator_summary.txt"
+MANIFEST_FILE_NAME = "simulation_manifest.json"
+MATERIALIZE_MODES = ["copy", "link"]
+# Read only mesh inputs, the only files link mode shares with generic_file.
+# Everything else is a real per-case copy, svpre writes bct.dat, bct.vtp,
+# geombc and restart files and the solver writes numstart.dat and restarts.
+MESH_DIRECTORY = "mesh-complete"
+MESH_FILE_PATTERNS = ["*.vtu", "*.vtp"]
+# Files with a mesh extension a case writes to
+CASE_FILE_PATTERNS = ["bct.*"]
+# linux/fs.h FICLONE, clone src_fd into the file open on dst_fd
+FICLONE = 0x40049409
+
+
 def create_directories(
     base_dir,
     exclude_files=None,
     svpre_exe="/usr/local/sv/svsolver/2022-07-22/bin/svpre generic_file.svpre",
+    max_jobs=1,
+    materialize="copy",
 ):
+    """
+    Create a simulation directory for each inlet velocity file and run svpre.
+
+    Each case is materialized and preprocessed on a pool of up to max_jobs
+    workers. With materialize="link" the mesh files of generic_file are
+    linked (see link_file) rather than copied.
+
+    The inlet hash, generic_file fingerprint and svpre exit status of every
+    case are kept in MANIFEST_FILE_NAME. Cases whose inlet and generic_file
+    are unchanged and whose svpre succeeded are skipped on a rerun.
+
+    Returns:
+        list: One record per case with its exit_status, wall_time_s, log and
+        whether it was skipped.
+    """
     inlet_velocity_directory = os.path.join(base_dir, "inlet_velocity")
-    generic_dir = os.path.join(base_dir, "generic_file")
 
     # populate an exclude files list
     exclude_file_path = os.path.join(inlet_velocity_directory, "exclude.txt")
     exclude_files = get_exclude_files(exclude_file_path, exclude_files)
 
-    for txt_file in os.listdir(inlet_velocity_directory):
-        if txt_file.endswith(".txt") and txt_file not in exclude_files:
-            txt_file_path = os.path.join(inlet_velocity_directory, txt_file)
-            file_name_base = os.path.splitext(txt_file)[0]
+    txt_files = [
+        txt_file
+        for txt_file in sorted(os.listdir(inlet_velocity_directory))
+        if txt_file.endswith(".txt") and txt_file not in exclude_files
+    ]
+
+    manifest_path = os.path.join(base_dir, MANIFEST_FILE_NAME)
+    manifest = load_manifest(manifest_path)
+    generic_sha, generic_stats = generic_fingerprint(base_dir, manifest["generic"])
+    manifest["generic"] = {"sha256": generic_sha, "stats": generic_stats}
+
+    records = [None] * len(txt_files)
+    metrics.track("simulationgenerator", "case", len(txt_files), max_jobs)
+    with ThreadPoolExecutor(max_workers=max(1, max_jobs)) as executor:
+        futures = {
+            executor.submit(
+                create_case,
+                base_dir,
+                txt_file,
+                svpre_exe,
+                materialize,
+                generic_sha,
+                manifest["cases"].get(os.path.splitext(txt_file)[0]),
+            ): i
+            for i, txt_file in enumerate(txt_files)
+        }
+        # all cases are queued, the workers are busy until as many are left
+        for _ in futures:
+            metrics.item_started()
+        for future in as_completed(futures):
+            record = future.result()
+            metrics.item_finished(failed=record["exit_status"] != 0)
+            records[futures[future]] = record
+            manifest["cases"][record["case"]] = record.pop("state")
+            # saved after every case so an interrupted run keeps its progress
+            save_manifest(manifest_path, manifest)
+
+    write_summary(records, os.path.join(base_dir, SUMMARY_FILE_NAME))
+    return records
+
 
-            # Step 1: Copy generic_file and rename it
-            new_dir_path = os.path.join(base_dir, file_name_base)
-            shutil.copytree(generic_dir, new_dir_path)
+def create_case(
+    base_dir, txt_file, svpre_exe, materialize="copy", generic_sha=None, entry=None
+):
+    """
+    Create and preprocess the simulation directory for one inlet file.
+
+    entry is the manifest entry from a previous run, if the case is unchanged
+    and its svpre succeeded it is left untouched.
+    """
+    txt_file_path = os.path.join(base_dir, "inlet_velocity", txt_file)
+    file_name_base = os.path.splitext(txt_file)[0]
+    new_dir_path = os.path.join(base_dir, file_name_base)
+    log_file = os.path.join(new_dir_path, SVPRE_LOG_NAME)
+    state = {
+        "inlet_sha256": file_sha256(txt_file_path),
+        "generic_sha256": generic_sha,
+        "svpre_exe": svpre_exe,
+    }
+    record = {"case": file_name_base, "log": log_file, "skipped": False}
+    if entry is not None and os.path.isdir(new_dir_path):
+        unchanged = all(entry.get(key) == value for key, value in state.items())
+        if unchanged and entry.get("exit_status") == 0:
+            logger.info(f"Skipping {file_name_base}, it is up to date")
+            state["exit_status"] = 0
+            record.update(exit_status=0, wall_time_s=0.0, skipped=True, state=state)
+            return record
+        # a new inlet or mesh invalidates any solver restart files
+        reset_numstart = (
+            entry.get("inlet_sha256") != state["inlet_sha256"]
+            or entry.get("generic_sha256") != state["generic_sha256"]
+        )
+    else:
+        reset_numstart = False
+
+    # Step 1: Copy (or link) generic_file and rename it
+    with trace_span("materialize", case=file_name_base, mode=materialize):
+        materialize_tree(
+            os.path.join(base_dir, "generic_file"), new_dir_path, materialize
+        )
+
+    # Step 2: Replace catheter.flow with the contents of the txt file
+    catheter_flow_path = os.path.join(new_dir_path, "catheter.flow")
+    replace_file(source=txt_file_path, destination=catheter_flow_path)
+
+    # Step 3: Copy and rename generic_file.sjb
+    generic_file_sjb = os.path.join(base_dir, "generic_file.sjb")
+    new_sjb_file = os.path.join(base_dir, f"{file_name_base}.sjb")
+    shutil.copy2(generic_file_sjb, new_sjb_file)
 
-            # Step 2: Replace catheter.flow with the contents of the txt file
-            catheter_flow_path = os.path.join(new_dir_path, "catheter.flow")
-            replace_file(source=txt_file_path, destination=catheter_flow_path)
+    # Step 4: Create a numstart.dat with a 0 if it does not exist
+    create_numstart_file(new_dir_path, reset=reset_numstart)
+
+    # Step 5: Run the svpre command
+    start = time.perf_counter()
+    with trace_span("svpre", case=file_name_base):
+        exit_status = run_command(
+            command=svpre_exe, path=new_dir_path, log_file=log_file
+        )
+    state["exit_status"] = exit_status
+    record.update(
+        exit_status=exit_status,
+        wall_time_s=time.perf_counter() - start,
+        state=state,
+    )
+    if exit_status != 0:
+        logger.error(
+            f"svpre failed for {file_name_base} ({exit_status}), see {log_file}"
+        )
+    else:
+        logger.info(f"svpre finished for {file_name_base}")
+    return record
+
+
+def generic_fingerprint(base_dir, cached=None):
+    """
+    Return (sha256, stats) of the generic_file tree and generic_file.sjb.
+
+    The files are only hashed when the size or mtime of one of them differs
+    from the cached stats of the previous run.
+    """
+    generic_dir = os.path.join(base_dir, "generic_file")
+    paths = sorted(
+        os.path.join(root, file_name)
+        for root, _, file_names in os.walk(generic_dir)
+        for file_name in file_names
+    )
+    paths.append(os.path.join(base_dir, "generic_file.sjb"))
+    stats = {
+        os.path.relpath(path, base_dir).replace(os.sep, "/"): stat
+        for path, stat in file_stats(paths).items()
+    }
+    if cached and cached.get("stats") == stats:
+        return cached["sha256"], stats
 
-            # Step 3: Copy and rename generic_file.sjb
-            generic_file_sjb = os.path.join(base_dir, "generic_file.sjb")
-            new_sjb_file = os.path.join(base_dir, f"{file_name_base}.sjb")
-            shutil.copy2(generic_file_sjb, new_sjb_file)
+    hasher = hashlib.sha256()
+    for path, relative_path in zip(paths, stats):
+        hasher.update(relative_path.encode())
+        update_hash(hasher, path)
+    return hasher.hexdigest(), stats
 
-            # Step 4: Create a numstart.dat with a 0 if it does not exist
-            create_numstart_file(new_dir_path)
 
-            # Step 5: Run the svpre command
-            run_command(command=svpre_exe, path=new_dir_path)
+def load_manifest(manifest_path):
+    """Return the saved manifest, or an empty one if there is no usable one."""
+    empty: Dict[str, Any] = {"generic": None, "cases": {}}
+    if not os.path.isfile(manifest_path):
+        return empty
+    try:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        logger.warning(f"Ignoring unreadable manifest {manifest_path}")
+        return empty
+    return {**empty, **manifest}
+
+
+def save_manifest(manifest_path, manifest):
+    write_json_atomic(manifest_path, manifest)
+
+
+def materialize_tree(source, destination, materialize="copy"):
+    """
+    Create destination from the source tree with the given MATERIALIZE_MODES.
+
+    An existing destination is refreshed in place, files that are not in
+    the source (e.g. solver output) are left alone.
+    """
+    if materialize not in MATERIALIZE_MODES:
+        raise ValueError(f"Unknown materialize mode {materialize}")
+    copy_function = copy_file if materialize == "copy" else link_file
+    shutil.copytree(
+        source, destination, copy_function=copy_function, dirs_exist_ok=True
+    )
+
+
+def remove_existing(path):
+    """Remove a file (or link) so writing path can never write through a link."""
+    if os.path.lexists(path):
+        os.remove(path)
+
+
+def copy_file(source, destination):
+    remove_existing(destination)
+    return shutil.copy2(source, destination)
+
+
+def reflink(source, destination):
+    """Clone source to destination with copy on write (btrfs, xfs, ...)."""
+    if fcntl is None:
+        raise OSError(errno.EOPNOTSUPP, "reflink not supported")
+    with open(source, "rb") as src, open(destination, "wb") as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        except OSError:
+            dst.close()
+            os.remove(destination)
+            raise
+    shutil.copystat(source, destination)
+
+
+def is_mesh_input(path):
+    """True for a read only mesh input, see MESH_FILE_PATTERNS."""
+    name = os.path.basename(path)
+    if any(fnmatch.fnmatch(name, pattern) for pattern in CASE_FILE_PATTERNS):
+        return False
+    in_mesh_directory = MESH_DIRECTORY in os.path.normpath(path).split(os.sep)[:-1]
+    return in_mesh_directory or any(
+        fnmatch.fnmatch(name, pattern) for pattern in MESH_FILE_PATTERNS
+    )
+
+
+def link_file(source, destination):
+    """
+    Materialize source at destination without copying its data.
+
+    Only mesh inputs (see is_mesh_input) are linked, every other file is
+    copied so a case writing to it never changes generic_file. Mesh inputs
+    are reflinked if the filesystem supports it, otherwise hardlinked,
+    otherwise symlinked.
+
+    Returns:
+        str: The method used (copy, reflink, hardlink or symlink).
+    """
+    remove_existing(destination)
+    if not is_mesh_input(source):
+        shutil.copy2(source, destination)
+        return "copy"
+    try:
+        reflink(source, destination)
+        return "reflink"
+    except OSError:
+        pass
+    try:
+        os.link(source, destination)
+        return "hardlink"
+    except OSError:
+        pass
+    os.symlink(os.path.abspath(source), destination)
+    return "symlink"
+
+
+def write_summary(records, path):
+    """Write a plain text table of the svpre results for each case."""
+    width = max([len("case")] + [len(record["case"]) for record in records])
+    lines = [f"{'case':<{width}}  exit_status  skipped  wall_time_s  log"]
+    for record in records:
+        lines.append(
+            f"{record['case']:<{width}}  {record['exit_status']:>11}  "
+            f"{str(record['skipped']):>7}  "
+            f"{record['wall_time_s']:>11.2f}  {record['log']}"
+        )
+    with open(path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+    n_failed = sum(record["exit_status"] != 0 for record in records)
+    n_skipped = sum(record["skipped"] for record in records)
+    logger.info(
+        f"svpre ran for {len(records) - n_skipped} cases, {n_skipped} up to date, "
+        f"{n_failed} failed: {path}"
+    )
 
 
 def replace_file(source, destination):
@@ -73,28 +360,51 @@ def get_exclude_files(exclude_file_path, exclude_files=None):
     return exclude_files
 
 
-def create_numstart_file(new_dir_path):
+def create_numstart_file(new_dir_path, reset=False):
     """
     Creates numstart.dat in the specified directory if it doesn't exist.
     Writes a 0 to the file.
 
     Args:
         new_dir_path (str): The directory where the numstart.dat will be created.
+        reset (bool): Overwrite an existing numstart.dat with a 0.
     """
     numstart_file_path = os.path.join(new_dir_path, "numstart.dat")
 
     # Check if the file exists
-    if not os.path.isfile(numstart_file_path):
+    if reset or not os.path.isfile(numstart_file_path):
         with open(numstart_file_path, "w") as numstart_file:
             numstart_file.write("0")
 
 
-def run_command(command, path):
-    subprocess.run(command, shell=True, cwd=path, env=os.environ)
+def run_command(command, path, log_file=None):
+    """
+    Run a shell command in path and return its exit status.
+
+    If log_file is given stdout and stderr are written to it.
+    """
+    if log_file is None:
+        return subprocess.run(command, shell=True, cwd=path, env=os.environ).returncode
+    with open(log_file, "w") as log:
+        return subprocess.run(
+            command,
+            shell=True,
+            cwd=path,
+            env=os.environ,
+            stdout=log,
+            stderr=subprocess.STDOUT,
+        ).returncode
 
 
-def main(directory, exclude, svpre_exe):
+def main(directory, exclude, svpre_exe, max_jobs=1, materialize="copy"):
     settup_logging()
     logger.info("Creating Simulation Directories")
-    create_directories(base_dir=directory, exclude_files=exclude, svpre_exe=svpre_exe)
+    records = create_directories(
+        base_dir=directory,
+        exclude_files=exclude,
+        svpre_exe=svpre_exe,
+        max_jobs=max_jobs,
+        materialize=materialize,
+    )
     logger.info("Simulation Directories Created")
+    return records
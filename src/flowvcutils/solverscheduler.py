@@ -0,0 +1,209 @@
+import os
+import shlex
+import functools
+import logging
+import threading
+import datetime as dt
+from typing import Any, Dict
+from concurrent.futures import Future, ThreadPoolExecutor
+from flowvcutils.jsonlogger import settup_logging
+from flowvcutils.jobrunner import run_process, write_summary
+from flowvcutils import metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SOLVER_COMMAND = (
+    "mpiexec -np {ranks} /usr/local/sv/svsolver/2022-07-22/bin/svsolver"
+)
+SUMMARY_FILE_NAME = "solver_run_summary.json"
+
+
+def discover_cases(base_dir):
+    """Cases simulationgenerator created, a {case}.sjb next to a {case} directory."""
+    cases = []
+    for file_name in sorted(os.listdir(base_dir)):
+        case, extension = os.path.splitext(file_name)
+        if (
+            extension == ".sjb"
+            and case != "generic_file"
+            and os.path.isdir(os.path.join(base_dir, case))
+        ):
+            cases.append(case)
+    return cases
+
+
+def read_numstart(case_dir):
+    """Return the time step in numstart.dat the solver will restart from."""
+    try:
+        with open(os.path.join(case_dir, "numstart.dat")) as f:
+            return int(f.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def build_command(solver_command, ranks, case, case_dir):
+    """Fill in {ranks}, {case} and {case_dir} and split the solver command.
+
+    Any other braces, such as ${VAR} or an awk program, are left as they are.
+    """
+    command = (
+        solver_command.replace("{ranks}", str(ranks))
+        .replace("{case_dir}", case_dir)
+        .replace("{case}", case)
+    )
+    return shlex.split(command)
+
+
+def run_case(base_dir, case, ranks=1, solver_command=DEFAULT_SOLVER_COMMAND, retries=1):
+    """
+    Run the solver for one case, restarting it after a failure.
+
+    The solver is started in the case directory. After a non zero exit it is
+    started again (up to retries times) and continues from the time step in
+    numstart.dat. stdout and stderr of each attempt are written to
+    solver.{attempt}.stdout.log and solver.{attempt}.stderr.log.
+
+    Returns:
+        dict: The case, ranks, exit_status, total wall_time_s and attempts.
+    """
+    case_dir = os.path.join(base_dir, case)
+    command = build_command(solver_command, ranks, case, case_dir)
+    record = {
+        "case": case,
+        "ranks": ranks,
+        "command": command,
+        "start_time": dt.datetime.now(tz=dt.timezone.utc).isoformat(),
+        "skipped": False,
+        "attempts": [],
+    }
+    for attempt in range(retries + 1):
+        numstart = read_numstart(case_dir)
+        if attempt == 0:
+            logger.info(f"Starting solver for {case} on {ranks} ranks")
+        else:
+            logger.warning(
+                f"Restarting solver for {case} from numstart {numstart} "
+                f"(attempt {attempt + 1} of {retries + 1})"
+            )
+        result = {
+            "numstart": numstart,
+            "stdout": os.path.join(case_dir, f"solver.{attempt}.stdout.log"),
+            "stderr": os.path.join(case_dir, f"solver.{attempt}.stderr.log"),
+        }
+        try:
+            result.update(
+                run_process(command, case_dir, result["stdout"], result["stderr"])
+            )
+        except OSError as e:
+            logger.error(f"Failed to start {command}: {e}")
+            result.update({"exit_status": None, "wall_time_s": 0.0, "error": str(e)})
+            record["attempts"].append(result)
+            break
+        record["attempts"].append(result)
+        if result["exit_status"] == 0:
+            break
+        logger.error(
+            f"Solver for {case} exited with status {result['exit_status']}",
+            extra={"job": result},
+        )
+
+    record["exit_status"] = record["attempts"][-1]["exit_status"]
+    record["wall_time_s"] = sum(a["wall_time_s"] for a in record["attempts"])
+    record["numstart"] = read_numstart(case_dir)
+    if record["exit_status"] == 0:
+        logger.info(
+            f"Finished solver for {case} in {record['wall_time_s']:.2f}s",
+            extra={"job": record},
+        )
+    return record
+
+
+def schedule(jobs, core_budget, run):
+    """
+    Run jobs so the ranks of the running jobs never exceed core_budget.
+
+    Jobs are started in order whenever enough cores are free. If the next
+    job does not fit, a later (smaller) job that does is started instead.
+
+    Args:
+        jobs (list): (name, ranks) for each job.
+        core_budget (int): Total cores the running jobs may use.
+        run (callable): run(name, ranks), called on a worker thread.
+
+    Returns:
+        list: The result of run for each job, in the order of jobs.
+    """
+    for name, ranks in jobs:
+        if ranks > core_budget:
+            raise ValueError(
+                f"{name} needs {ranks} ranks, more than the core budget {core_budget}"
+            )
+    free = [core_budget]
+    cores_freed = threading.Condition()
+    pending = list(enumerate(jobs))
+    futures: Dict[int, Future[Any]] = {}
+
+    def _release(ranks, future):
+        with cores_freed:
+            free[0] += ranks
+            cores_freed.notify()
+
+    with ThreadPoolExecutor(max_workers=max(1, min(core_budget, len(jobs)))) as pool:
+        while pending:
+            with cores_freed:
+                fits = [job for job in pending if job[1][1] <= free[0]]
+                if not fits:
+                    cores_freed.wait()
+                    continue
+                index, (name, ranks) = fits[0]
+                pending.remove(fits[0])
+                free[0] -= ranks
+            future = pool.submit(run, name, ranks)
+            future.add_done_callback(functools.partial(_release, ranks))
+            futures[index] = future
+        return [futures[index].result() for index in range(len(jobs))]
+
+
+def main(
+    directory,
+    cases=None,
+    ranks=1,
+    core_budget=None,
+    solver_command=DEFAULT_SOLVER_COMMAND,
+    retries=1,
+    summary_path=None,
+):
+    settup_logging()
+    if not cases:
+        cases = discover_cases(directory)
+    if core_budget is None:
+        core_budget = os.cpu_count() or 1
+    if summary_path is None:
+        summary_path = os.path.join(directory, SUMMARY_FILE_NAME)
+
+    logger.info(
+        f"Running the solver for {len(cases)} cases, {ranks} ranks each "
+        f"within {core_budget} cores"
+    )
+
+    def _run(case, case_ranks):
+        with metrics.track_item() as item:
+            record = run_case(directory, case, case_ranks, solver_command, retries)
+            item["failed"] = record["exit_status"] != 0
+        return record
+
+    metrics.track("solverscheduler", "case", len(cases), core_budget // ranks)
+    records = schedule([(case, ranks) for case in cases], core_budget, _run)
+    summary = write_summary(
+        records,
+        summary_path,
+        solver_command=solver_command,
+        ranks=ranks,
+        core_budget=core_budget,
+        retries=retries,
+    )
+    logger.info(
+        f"{summary['n_jobs']} solver jobs, {summary['n_failed']} failed. "
+        f"Summary: {summary_path}"
+    )
+    return summary
@@ -0,0 +1,129 @@
+import vtk
+import logging
+import numpy as np
+from vtk.util import numpy_support
+
+logger = logging.getLogger(__name__)
+
+SEED_SHAPES = ["plane", "sphere", "volume"]
+
+
+def _lattice(lower, upper, spacing):
+    """Return an (n, 3) array of points on a regular lattice within the box."""
+    axes = [
+        np.arange(low, high + spacing * 0.5, spacing) for low, high in zip(lower, upper)
+    ]
+    grid = np.meshgrid(*axes, indexing="ij")
+    return np.stack([g.ravel() for g in grid], axis=1)
+
+
+def plane_seeds(center, normal, radius, spacing):
+    """
+    Seed a disc (e.g. an inlet plane) with a square grid of points.
+
+    Args:
+        center (tuple): Center of the disc.
+        normal (tuple): Normal of the plane.
+        radius (float): Radius of the disc.
+        spacing (float): Distance between neighbouring seeds.
+    """
+    center = np.asarray(center, dtype=np.float64)
+    normal = np.asarray(normal, dtype=np.float64)
+    normal = normal / np.linalg.norm(normal)
+    # any vector not parallel to the normal gives the in plane basis
+    helper = np.eye(3)[np.argmin(np.abs(normal))]
+    u = np.cross(normal, helper)
+    u /= np.linalg.norm(u)
+    v = np.cross(normal, u)
+
+    steps = np.arange(-radius, radius + spacing * 0.5, spacing)
+    grid_s, grid_t = np.meshgrid(steps, steps, indexing="ij")
+    s, t = grid_s.ravel(), grid_t.ravel()
+    inside = s**2 + t**2 <= radius**2
+    return center + np.outer(s[inside], u) + np.outer(t[inside], v)
+
+
+def sphere_seeds(center, radius, spacing):
+    """Seed a solid sphere with a cubic lattice of points."""
+    center = np.asarray(center, dtype=np.float64)
+    points = _lattice(center - radius, center + radius, spacing)
+    inside = np.sum((points - center) ** 2, axis=1) <= radius**2
+    return points[inside]
+
+
+def volume_seeds(bounds, spacing):
+    """
+    Seed a box with a cubic lattice of points.
+
+    Args:
+        bounds (tuple): ((min_x, min_y, min_z), (max_x, max_y, max_z))
+        spacing (float): Distance between neighbouring seeds.
+    """
+    return _lattice(bounds[0], bounds[1], spacing)
+
+
+def generate_seeds(
+    shape, spacing, center=None, normal=(0, 0, 1), radius=None, bounds=None
+):
+    """Generate seeds for one of SEED_SHAPES."""
+    if spacing is None or spacing <= 0:
+        raise ValueError("Tracer spacing must be >0")
+    if shape == "plane":
+        return plane_seeds(center, normal, radius, spacing)
+    if shape == "sphere":
+        return sphere_seeds(center, radius, spacing)
+    if shape == "volume":
+        return volume_seeds(bounds, spacing)
+    raise ValueError(f"Unknown tracer seed shape {shape}, use one of {SEED_SHAPES}")
+
+
+def read_mesh(file_path):
+    """Read the unstructured velocity mesh from a .vtu file."""
+    reader = vtk.vtkXMLUnstructuredGridReader()
+    reader.SetFileName(file_path)
+    reader.Update()
+    return reader.GetOutput()
+
+
+def filter_to_domain(points, mesh):
+    """
+    Return the points that fall inside a cell of mesh.
+
+    All points are located in one vtkProbeFilter pass (a single cell locator
+    over the mesh) rather than one FindCell call per point from python.
+    """
+    if len(points) == 0:
+        return points
+    vtk_points = vtk.vtkPoints()
+    vtk_points.SetData(
+        numpy_support.numpy_to_vtk(np.ascontiguousarray(points), deep=True)
+    )
+    probe_points = vtk.vtkPolyData()
+    probe_points.SetPoints(vtk_points)
+
+    probe = vtk.vtkProbeFilter()
+    probe.SetInputData(probe_points)
+    probe.SetSourceData(mesh)
+    if hasattr(probe, "SetCellLocator"):
+        probe.SetCellLocator(vtk.vtkStaticCellLocator())
+    elif hasattr(probe, "SetCellLocatorPrototype"):
+        probe.SetCellLocatorPrototype(vtk.vtkStaticCellLocator())
+    probe.Update()
+
+    mask = numpy_support.vtk_to_numpy(
+        probe.GetOutput().GetPointData().GetArray(probe.GetValidPointMaskArrayName())
+    )
+    return points[mask.astype(bool)]
+
+
+def write_seed_file(file_path, points):
+    """
+    Write a Trace_InFileFormat 4 file.
+
+    Format: [n (int), x_0 (double), y_0, z_0, x_1, y_1 ... z_n]
+    The header and coordinates are written with a single write call.
+    """
+    points = np.ascontiguousarray(points, dtype=np.float64)
+    header = np.array([len(points)], dtype=np.int32)
+    with open(file_path, "wb") as fout:
+        fout.write(header.tobytes() + points.tobytes())
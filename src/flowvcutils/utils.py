@@ -1,5 +1,56 @@
+import os
+import sys
+import json
+import hashlib
 from pathlib import Path
 
+HASH_CHUNK_SIZE = 1 << 20
+
 
 def get_project_root() -> Path:
     return Path(__file__).parent.parent
+
+
+def maxrss_to_bytes(maxrss: int) -> int:
+    """Convert a ru_maxrss value to bytes (kilobytes on Linux, bytes on macOS)."""
+    if sys.platform == "darwin":
+        return maxrss
+    return maxrss * 1024
+
+
+def file_stats(paths):
+    """Return {path: [size, mtime_ns]} for each path, a cheap change check."""
+    stats = {}
+    for path in paths:
+        stat = os.stat(path)
+        stats[path] = [stat.st_size, stat.st_mtime_ns]
+    return stats
+
+
+def update_hash(hasher, path):
+    """Feed the contents of path into hasher in fixed size chunks."""
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            hasher.update(chunk)
+    return hasher
+
+
+def file_sha256(path):
+    """Return the sha256 hex digest of a file."""
+    return update_hash(hashlib.sha256(), path).hexdigest()
+
+
+def write_json_atomic(path, data):
+    """Write data as JSON to a temporary file then move it into place."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=4)
+    os.replace(tmp_path, path)
+
+
+def write_text_atomic(path, text):
+    """Write text to a temporary file then move it into place."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
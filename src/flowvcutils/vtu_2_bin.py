@@ -1,13 +1,32 @@
 import vtk
 import numpy as np
+import re
 import sys
+import json
+import math
+import time
+import shutil
 import logging.config
 import logging.handlers
-from flowvcutils.jsonlogger import settup_logging
+from typing import Any, Dict, List
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from flowvcutils.jsonlogger import settup_logging, worker_logging, init_worker_logging
+from flowvcutils.utils import write_json_atomic
+from flowvcutils.perf import stage_span, trace_span, trace_path, init_worker_trace
+from flowvcutils import metrics
+from flowvcutils.filerename import create_rename_map, resolve_inputs
 import os
 
 logger = logging.getLogger(__name__)
 
+WATCH_MANIFEST_NAME = "vtu2bin_manifest.json"
+# the <Piece> tags of a .vtu header and their point and cell counts
+PIECE_TAG = re.compile(rb"<Piece\b[^>]*>")
+PIECE_COUNT = re.compile(rb'\bNumberOf(Points|Cells)="(\d+)"')
+HEADER_BLOCK_SIZE = 64 * 1024
+# elements whose adjacency is timed by --plan, the rest is extrapolated
+ADJACENCY_SAMPLE = 2000
+
 
 def reader_selection(extension):
     """Select the appropriate reader based on the file type."""
@@ -118,8 +137,8 @@ class adjacency_file:
         """Store data as an atribute of self."""
         self.data = data
 
-    def create_file(self):
-        """Create adjacency file."""
+    def create_file(self, limit=None):
+        """Create adjacency file (only the first limit rows if given)."""
         self.n_elements = self.data.GetNumberOfCells()
         self.adjacency = -1 * np.ones((self.n_elements, 4), dtype=np.int32)
         node_ids = vtk.vtkIdList()
@@ -127,7 +146,8 @@ class adjacency_file:
         face_ids = vtk.vtkIdList()
         face_ids.SetNumberOfIds = 3
         progress = 0
-        for i in range(self.n_elements):
+        n_rows = self.n_elements if limit is None else min(limit, self.n_elements)
+        for i in range(n_rows):
             if ((i * 100) / self.n_elements) > progress:
                 logger.info(f"progress {progress}")
                 sys.stdout.flush()
@@ -142,7 +162,8 @@ class adjacency_file:
                     self.adjacency[i, j] = -1
                 else:
                     self.adjacency[i, j] = shared_cells.GetId(0)
-        logger.info("progress 100")
+        if n_rows == self.n_elements:
+            logger.info("progress 100")
         # self.connectivity += offset
 
     def save_file(self, output_root, file_name, offset=0):
@@ -178,32 +199,152 @@ def vtk_to_connectivity_and_coordinates(
     extension: input file extension (default .vtu)
     """
     logger.debug("starting vtk_to_connectivity_and_cordinates")
-    reader = reader_selection(extension)
-    logger.debug("reader selected")
     # Select first .vtu file to create coordinates, adjacency, and connectivity files
     first_file_path = os.path.join(
         input_root, f"{file_name}{start:0{num_digits}d}{extension}"
     )
-    reader.SetFileName(first_file_path)
-    logger.debug("reader setfilename")
-    reader.Update()
-    data = reader.GetOutput()
+    data = read_data(first_file_path, extension)
     logger.debug("data selected")
-    coordinates = coordinates_file(data)
-    coordinates.create_file()
-    coordinates.save_file(output_root, file_name)
+    write_mesh_files(data, output_root, file_name, offset, input_path=first_file_path)
+
+
+def load_data(input_path, extension=".vtu"):
+    """Read a vtk file with the reader for its extension, without a read span."""
+    reader = reader_selection(extension)
+    reader.SetFileName(input_path)
+    reader.Update()
+    return reader.GetOutput()
+
+
+def read_data(input_path, extension=".vtu"):
+    """Read a vtk file with the reader for its extension."""
+    with stage_span("read", logger, path=input_path) as span:
+        data = load_data(input_path, extension)
+        span["bytes"] = os.path.getsize(input_path)
+        span["nodes"] = data.GetNumberOfPoints()
+        span["elements"] = data.GetNumberOfCells()
+    return data
+
+
+def write_mesh_files(data, output_root, file_name, offset=0, input_path=None):
+    """Write the coordinates, connectivity and adjacency files for a mesh.
+
+    input_path is the file the mesh was read from, it is logged with each stage.
+    """
+    with stage_span("coordinates", logger, path=input_path) as span:
+        coordinates = coordinates_file(data)
+        coordinates.create_file()
+        coordinates.save_file(output_root, file_name)
+        span["nodes"] = coordinates.n_nodes
+        span["bytes"] = coordinates.coordinates.nbytes + 4
     logger.info(f"{coordinates.n_nodes} nodes, coordinated file created")
 
-    connectivity = connectivity_file(data)
-    connectivity.create_file()
-    connectivity.save_file(output_root, file_name)
+    with stage_span("connectivity", logger, path=input_path) as span:
+        connectivity = connectivity_file(data)
+        connectivity.create_file()
+        connectivity.save_file(output_root, file_name)
+        span["elements"] = connectivity.n_elements
+        span["bytes"] = connectivity.connectivity.nbytes + 4
 
     logger.info(f"{connectivity.n_elements} elements, connectivity file saved")
 
     logger.info("Finding adjacency:")
-    adjacency = adjacency_file(data)
-    adjacency.create_file()
-    adjacency.save_file(output_root, file_name, offset)
+    with stage_span("adjacency", logger, path=input_path) as span:
+        adjacency = adjacency_file(data)
+        adjacency.create_file()
+        adjacency.save_file(output_root, file_name, offset)
+        span["elements"] = adjacency.n_elements
+        span["bytes"] = adjacency.adjacency.nbytes + 4
+
+
+def velocity_values(data, fieldname="Velocity", n_components=3, n_pad_values=1):
+    """The contents of a _vel.N.bin file, n_pad_values zeros then the field."""
+    n_nodes = data.GetNumberOfPoints()
+    # First n_pad_values in out_data set to zero
+    out_data = np.zeros(n_nodes * n_components + n_pad_values)
+
+    values = data.GetPointData().GetArray(fieldname)
+    if values is None:
+        raise ValueError(f"No point data field named {fieldname}")
+
+    for i in range(n_nodes):
+        values.GetTuple(
+            i,
+            out_data[
+                i * n_components + n_pad_values : (i + 1) * n_components + n_pad_values
+            ],
+        )
+    return out_data
+
+
+def convert_frame(
+    input_path,
+    out_file_path,
+    fieldname="Velocity",
+    n_components=3,
+    n_pad_values=1,
+    extension=".vtu",
+):
+    """Write the velocity of one vtk file to a _vel.N.bin file."""
+    logger.info(f"Reading..{input_path}")
+    data = read_data(input_path, extension)
+
+    n_nodes = data.GetNumberOfPoints()
+
+    with stage_span("convert", logger, path=input_path, nodes=n_nodes):
+        out_data = velocity_values(data, fieldname, n_components, n_pad_values)
+    with stage_span("write", logger, path=out_file_path, bytes=out_data.nbytes):
+        fout = open(out_file_path, "wb")
+        out_data.tofile(fout)
+        fout.close()
+    return data
+
+
+def write_velocity_frame(number, input_path, out_file_path, **kwargs):
+    """Write the _vel.N.bin file of time step number (see convert_frame)."""
+    logger.info(f"Writing .bin {number}")
+    kwargs.setdefault("extension", os.path.splitext(input_path)[1])
+    with trace_span(f"frame {number}", "frame", input_path=input_path):
+        convert_frame(input_path, out_file_path, **kwargs)
+    return number
+
+
+def init_worker(log_queue, trace_file=None):
+    """Process pool initializer, logging and tracing go to the main process."""
+    init_worker_logging(log_queue)
+    init_worker_trace(trace_file)
+
+
+def convert_frames(frames, max_workers=1, **kwargs):
+    """
+    Write the velocity file for each (number, input_path, out_file_path).
+
+    With max_workers > 1 the frames are converted in a process pool. The
+    workers send their log records to this process, which writes them.
+    """
+    metrics.track("vtu2bin", "frame", len(frames), max_workers)
+    if max_workers <= 1:
+        for frame in frames:
+            with metrics.track_item() as item:
+                write_velocity_frame(*frame, **kwargs)
+                item["bytes_written"] = os.path.getsize(frame[2])
+        return
+    with worker_logging() as log_queue, ProcessPoolExecutor(
+        max_workers=max_workers,
+        initializer=init_worker,
+        initargs=(log_queue, trace_path()),
+    ) as pool:
+        futures = {}
+        for frame in frames:
+            futures[pool.submit(write_velocity_frame, *frame, **kwargs)] = frame
+            metrics.item_started()
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception:
+                metrics.item_finished(failed=True)
+                raise
+            metrics.item_finished(os.path.getsize(futures[future][2]))
 
 
 def vtk_to_bin(
@@ -219,6 +360,7 @@ def vtk_to_bin(
     n_pad_values=1,
     flag_fenics_zeros=0,
     extension=".vtu",
+    max_workers=1,
 ):
     """Create a velocity binary file.
 
@@ -227,45 +369,35 @@ def vtk_to_bin(
         e.g. for "test.00100.vtk", file_num_digits=5
     n_pad_values: number of zeros at beginning of bin file
       (needed to match timestamp from Simvascular output
+    max_workers: number of processes converting frames
     """
     logger.info("starting vtk_to_bin")
     if not flag_fenics_zeros:
         file_num_format = "%0" + str(file_num_digits) + "d"
 
+    frames = []
     for file_num in range(start, stop + 1, increment):
-        logger.info(f"Writing .bin {file_num}")
         if flag_fenics_zeros:
             file_num_string = str(file_num) + "000000"
         else:
             file_num_string = file_num_format % file_num
 
-        reader = reader_selection(extension)
         input_path = os.path.join(input_root, file_name + file_num_string + extension)
-        logger.info(f"Reading..{input_path}")
-        reader.SetFileName(input_path)
-        reader.Update()
-        data = reader.GetOutput()
-
-        n_nodes = data.GetNumberOfPoints()
-
-        # First n_pad_values in out_data set to zero
-        out_data = np.zeros(n_nodes * n_components + n_pad_values)
-
-        values = data.GetPointData().GetArray(fieldname)
-
-        for i in range(n_nodes):
-            values.GetTuple(
-                i,
-                out_data[
-                    i * n_components
-                    + n_pad_values : (i + 1) * n_components
-                    + n_pad_values
-                ],
+        frames.append(
+            (
+                file_num,
+                input_path,
+                create_vel_file_path(output_root, file_name, file_num),
             )
-        out_file_path = create_vel_file_path(output_root, file_name, file_num)
-        fout = open(out_file_path, "wb")
-        out_data.tofile(fout)
-        fout.close()
+        )
+    convert_frames(
+        frames,
+        max_workers,
+        fieldname=fieldname,
+        n_components=n_components,
+        n_pad_values=n_pad_values,
+        extension=extension,
+    )
 
 
 def strip_trailing_underscore(file_name):
@@ -284,18 +416,180 @@ def create_file_path(root, file_name, file_type):
     return os.path.join(
         root, strip_trailing_underscore(file_name) + "_" + file_type + ".bin"
     )
-    pass
+
+
+def frame_pattern(prefixes, extension):
+    """Regex matching {prefix}{number}{extension} for any of prefixes."""
+    names = "|".join(re.escape(prefix) for prefix in prefixes)
+    return re.compile(rf"^(?:{names})(\d+){re.escape(extension)}$")
+
+
+def scan_frames(root, pattern):
+    """Return {frame number: (path, [size, mtime_ns])} of the frames in root."""
+    frames = {}
+    with os.scandir(root) as entries:
+        for entry in entries:
+            match = pattern.match(entry.name)
+            if match and entry.is_file():
+                stat = entry.stat()
+                frames[int(match.group(1))] = (
+                    entry.path,
+                    [stat.st_size, stat.st_mtime_ns],
+                )
+    return frames
+
+
+def load_watch_manifest(manifest_path):
+    """Return the saved watch manifest or an empty one."""
+    manifest: Dict[str, Any] = {"mesh": None, "frames": {}}
+    if os.path.isfile(manifest_path):
+        try:
+            with open(manifest_path) as f:
+                manifest.update(json.load(f))
+        except (OSError, ValueError):
+            logger.warning(f"Ignoring unreadable manifest {manifest_path}")
+    return manifest
+
+
+def watch_folder(
+    root,
+    output,
+    file_name,
+    extension=".vtu",
+    field_name="velocity",
+    start=0,
+    stop=None,
+    increment=1,
+    current_name="all_results_",
+    poll_interval=5.0,
+    idle_timeout=None,
+):
+    """
+    Convert frames to .bin files as they appear in root.
+
+    root is polled every poll_interval seconds for {current_name}N{extension}
+    (svpost output) or {file_name}N{extension} files. A frame is converted
+    to {file_name}_vel.N.bin once its size and mtime are unchanged between
+    two polls, so files still being written are not read. The mesh files
+    are written from the first frame converted. Sources are not renamed.
+
+    Converted frames are recorded in output/vtu2bin_manifest.json, a
+    restarted watch skips frames whose source has not changed.
+
+    Watching stops once every frame in range(start, stop + 1, increment) is
+    converted, or when nothing has changed in root for idle_timeout seconds.
+
+    Returns:
+        dict: The manifest.
+    """
+    settup_logging()
+    expected = None if stop is None else set(range(start, stop + 1, increment))
+    pattern = frame_pattern([current_name, file_name], extension)
+    manifest_path = os.path.join(output, WATCH_MANIFEST_NAME)
+    manifest = load_watch_manifest(manifest_path)
+    mesh_path = create_file_path(output, file_name, "coordinates")
+    previous: Dict[int, List[int]] = {}
+    last_change = time.monotonic()
+    logger.info(f"Watching {root} for {extension} frames")
+    metrics.track("vtu2bin", "frame", 0 if expected is None else len(expected))
+    if expected is not None:
+        for number in manifest["frames"]:
+            if int(number) in expected:
+                metrics.item_finished()
+
+    while True:
+        frames = scan_frames(root, pattern)
+        if any(previous.get(number) != stat for number, (_, stat) in frames.items()):
+            last_change = time.monotonic()
+        for number in sorted(frames):
+            path, stat = frames[number]
+            if expected is not None and number not in expected:
+                continue
+            done = manifest["frames"].get(str(number))
+            if done is not None and done["stat"] == stat:
+                # unchanged, including a frame renamed since it was converted
+                continue
+            if previous.get(number) != stat:
+                # new or still being written, check again on the next poll
+                continue
+
+            frame_start = time.perf_counter()
+            out_file_path = create_vel_file_path(output, file_name, number)
+            if str(number) in manifest["frames"]:
+                # converted before, the source has changed since
+                metrics.track("vtu2bin", "frame", 1)
+            with metrics.track_item() as item:
+                data = convert_frame(
+                    path, out_file_path, fieldname=field_name, extension=extension
+                )
+                item["bytes_written"] = os.path.getsize(out_file_path)
+            if manifest["mesh"] is None or not os.path.isfile(mesh_path):
+                write_mesh_files(data, output, file_name, input_path=path)
+                manifest["mesh"] = path
+            manifest["frames"][str(number)] = {
+                "source": path,
+                "stat": stat,
+                "output": out_file_path,
+                "convert_time_s": time.perf_counter() - frame_start,
+            }
+            write_json_atomic(manifest_path, manifest)
+            logger.info(f"Converted frame {number}: {out_file_path}")
+        previous = {number: stat for number, (_, stat) in frames.items()}
+
+        converted = {int(number) for number in manifest["frames"]}
+        if expected is not None and expected <= converted:
+            logger.info(f"All {len(expected)} frames converted")
+            return manifest
+        if idle_timeout is not None and time.monotonic() - last_change > idle_timeout:
+            logger.info(f"No new frames for {idle_timeout}s, stopping")
+            return manifest
+        time.sleep(poll_interval)
 
 
 # os.path.join(output, file_name),
 def process_folder(
-    root, output, file_name, extension, start, stop, increment, num_digits, field_name
+    root,
+    output,
+    file_name,
+    extension,
+    start,
+    stop,
+    increment,
+    num_digits,
+    field_name,
+    input_pattern=None,
+    current_start=None,
+    current_increment=1,
+    max_workers=1,
 ):
     """Create binary files from vtu files for FlowVC.
 
+    With input_pattern (see filerename.input_matcher) the inputs are found by
+    pattern and read where they are instead of as {file_name}{NNNNN}{extension}.
+    current_start and current_increment map the file index to the time step
+    numbers start, start + increment, ... (as filerenumber would) so
+    files need not be renamed or renumbered first. max_workers processes
+    convert the velocity files.
+
     Reference https://shaddenlab.berkeley.edu/uploads/releasenotes.pdf
     """
     settup_logging()
+    if input_pattern is not None:
+        process_pattern(
+            root,
+            output,
+            file_name,
+            input_pattern,
+            start,
+            stop,
+            increment,
+            field_name,
+            current_start,
+            current_increment,
+            max_workers,
+        )
+        return
+
     vtk_to_connectivity_and_coordinates(
         input_root=root,
         output_root=output,
@@ -319,10 +613,92 @@ def process_folder(
         n_pad_values=1,
         flag_fenics_zeros=0,  # if 1, then adds zeros similar to finix
         extension=extension,
+        max_workers=max_workers,
+    )
+
+
+def process_pattern(
+    root,
+    output,
+    file_name,
+    input_pattern,
+    start,
+    stop,
+    increment,
+    field_name,
+    current_start=None,
+    current_increment=1,
+    max_workers=1,
+):
+    """Convert the inputs matching input_pattern, see process_folder."""
+    frames = pattern_frames(
+        root,
+        output,
+        file_name,
+        input_pattern,
+        start,
+        stop,
+        increment,
+        current_start,
+        current_increment,
+    )
+    first_path = frames[0][1]
+    write_mesh_files(
+        read_data(first_path, os.path.splitext(first_path)[1]),
+        output,
+        file_name,
+        input_path=first_path,
     )
+    convert_frames(frames, max_workers, fieldname=field_name)
 
 
-def process_directory(root, extension, start, stop, increment, num_digits, field_name):
+def pattern_frames(
+    root,
+    output,
+    file_name,
+    input_pattern,
+    start,
+    stop,
+    increment,
+    current_start=None,
+    current_increment=1,
+):
+    """(number, input_path, out_file_path) of each input matching input_pattern."""
+    numbers = range(start, stop + 1, increment)
+    index_map = None
+    if current_start is not None:
+        index_map = create_rename_map(
+            current_start=current_start,
+            current_end=current_start + (len(numbers) - 1) * current_increment,
+            current_increment=current_increment,
+            new_start=start,
+            increment=increment,
+        )
+    inputs = resolve_inputs(root, input_pattern, index_map)
+    missing = [number for number in numbers if number not in inputs]
+    if missing:
+        raise FileNotFoundError(
+            f"No file in {root} matching {input_pattern} for time steps {missing}"
+        )
+    return [
+        (number, inputs[number], create_vel_file_path(output, file_name, number))
+        for number in numbers
+    ]
+
+
+def process_directory(
+    root,
+    extension,
+    start,
+    stop,
+    increment,
+    num_digits,
+    field_name,
+    input_pattern=None,
+    current_start=None,
+    current_increment=1,
+    max_workers=1,
+):
     """
     Process an entire directory vtu files to .bin file.
 
@@ -332,24 +708,285 @@ def process_directory(root, extension, start, stop, increment, num_digits, field
        output = subdir/bin
     """
     settup_logging()
-    for sub_directory in os.listdir(root):
+    sub_directories = [
+        name for name in os.listdir(root) if os.path.isdir(os.path.join(root, name))
+    ]
+    # every folder's frames, so the metrics do not run out between folders
+    n_frames = len(range(start, stop + 1, increment))
+    metrics.plan("vtu2bin", "frame", len(sub_directories) * n_frames, max_workers)
+    for sub_directory in sub_directories:
         sub_dir_path = os.path.join(root, sub_directory)
         vtu_path = os.path.join(sub_dir_path, "input_vtu")
         logger.debug(f"sub_directory:{sub_directory}")
-        if os.path.isdir(sub_dir_path):
-            logger.info(f"Processing Directory {sub_directory}")
-            bin_dir = os.path.join(sub_dir_path, "input_bin")
-
-            os.makedirs(bin_dir, exist_ok=True)
-
-            process_folder(
-                root=vtu_path,
-                output=bin_dir,
-                file_name=sub_directory,
-                extension=extension,
-                start=start,
-                stop=stop,
-                increment=increment,
-                num_digits=num_digits,
-                field_name=field_name,
+        logger.info(f"Processing Directory {sub_directory}")
+        bin_dir = os.path.join(sub_dir_path, "input_bin")
+
+        os.makedirs(bin_dir, exist_ok=True)
+
+        process_folder(
+            root=vtu_path,
+            output=bin_dir,
+            file_name=sub_directory,
+            extension=extension,
+            start=start,
+            stop=stop,
+            increment=increment,
+            num_digits=num_digits,
+            field_name=field_name,
+            input_pattern=input_pattern,
+            current_start=current_start,
+            current_increment=current_increment,
+            max_workers=max_workers,
+        )
+
+
+def read_header(input_path, block_size=HEADER_BLOCK_SIZE):
+    """
+    (n_nodes, n_elements) from the <Piece> tags of a .vtu file.
+
+    Only the XML header is read, the appended data is not. Returns None for
+    other formats or when there is no <Piece> tag.
+    """
+    if not input_path.endswith(".vtu"):
+        return None
+    n_nodes = n_elements = 0
+    found = False
+    tail = b""
+    with open(input_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            text = tail + block
+            end = text.find(b"<AppendedData")
+            if end != -1:
+                text = text[:end]
+            last = 0
+            for match in PIECE_TAG.finditer(text):
+                counts = dict(PIECE_COUNT.findall(match.group()))
+                n_nodes += int(counts.get(b"Points", 0))
+                n_elements += int(counts.get(b"Cells", 0))
+                found = True
+                last = match.end()
+            if end != -1:
+                break
+            # a tag cut by the end of the block is matched with the next one
+            tail = text[max(last, len(text) - 1024) :]
+    return (n_nodes, n_elements) if found else None
+
+
+def output_sizes(n_nodes, n_elements, n_components=3, n_pad_values=1):
+    """Bytes of each file vtu2bin writes, velocity is per frame."""
+    return {
+        "coordinates": 4 + 8 * 3 * n_nodes,
+        "connectivity": 4 + 4 * 4 * n_elements,
+        "adjacency": 4 + 4 * 4 * n_elements,
+        "velocity": 8 * (n_components * n_nodes + n_pad_values),
+    }
+
+
+def time_conversion(input_path, fieldname="Velocity", adjacency_sample=None):
+    """
+    Seconds to convert one frame and to create the mesh files, writing nothing.
+
+    The adjacency of only adjacency_sample elements (default
+    ADJACENCY_SAMPLE) is found, its time is scaled to every element.
+
+    Returns:
+        tuple: (frame_s, mesh_s, n_nodes, n_elements)
+    """
+    if adjacency_sample is None:
+        adjacency_sample = ADJACENCY_SAMPLE
+    start = time.perf_counter()
+    # not read_data, a dry run must not log read stages for logstats
+    data = load_data(input_path, os.path.splitext(input_path)[1])
+    velocity_values(data, fieldname)
+    frame_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    coordinates_file(data).create_file()
+    connectivity_file(data).create_file()
+    mesh_s = time.perf_counter() - start
+    n_elements = data.GetNumberOfCells()
+    sample = min(adjacency_sample, n_elements)
+    if sample:
+        start = time.perf_counter()
+        adjacency_file(data).create_file(limit=sample)
+        mesh_s += (time.perf_counter() - start) * n_elements / sample
+    return frame_s, mesh_s, data.GetNumberOfPoints(), n_elements
+
+
+def existing_parent(path):
+    """path, or its nearest parent directory that exists."""
+    path = os.path.abspath(path)
+    while not os.path.exists(path):
+        path = os.path.dirname(path)
+    return path
+
+
+def plan_conversion(frames, output, file_name, max_workers=1, fieldname="Velocity"):
+    """
+    Estimate the bytes, disk space and time converting frames would take.
+
+    The output sizes are exact, from the header of the first frame. The
+    first frame is also read and converted (in memory) to time it, the
+    total time assumes every frame takes as long. Nothing is written.
+
+    Args:
+        frames (list): (number, input_path, out_file_path) of each frame.
+
+    Returns:
+        dict: The plan, see format_plan.
+    """
+    first_path = frames[0][1]
+    if not os.path.isfile(first_path):
+        raise FileNotFoundError(f"The first frame {first_path} does not exist")
+    frame_s, mesh_s, n_nodes, n_elements = time_conversion(first_path, fieldname)
+    header = read_header(first_path)
+    if header is not None:
+        n_nodes, n_elements = header
+    sizes = output_sizes(n_nodes, n_elements)
+
+    outputs = {
+        create_file_path(output, file_name, file_type): sizes[file_type]
+        for file_type in ["coordinates", "connectivity", "adjacency"]
+    }
+    outputs.update((out_file_path, sizes["velocity"]) for _, _, out_file_path in frames)
+    total_bytes = sum(outputs.values())
+    replaced_bytes = sum(
+        os.path.getsize(path) for path in outputs if os.path.isfile(path)
+    )
+    output_parent = existing_parent(output)
+    free_bytes = shutil.disk_usage(output_parent).free
+    workers = max(1, max_workers)
+    plan = {
+        "input": first_path,
+        "output": output,
+        "frames": len(frames),
+        "missing": [number for number, path, _ in frames if not os.path.isfile(path)],
+        "nodes": n_nodes,
+        "elements": n_elements,
+        "bytes": dict(sizes, total=total_bytes),
+        "replaced_bytes": replaced_bytes,
+        "needed_bytes": total_bytes - replaced_bytes,
+        "free_bytes": free_bytes,
+        "device": os.stat(output_parent).st_dev,
+        "frame_s": frame_s,
+        "mesh_s": mesh_s,
+        "workers": workers,
+        "estimated_s": mesh_s + math.ceil(len(frames) / workers) * frame_s,
+    }
+    plan["fits"] = plan["needed_bytes"] <= free_bytes
+    return plan
+
+
+def format_plan(plan):
+    """A human readable summary of a plan (see plan_conversion)."""
+    sizes = plan["bytes"]
+    lines = [
+        f"{plan['frames']} frames from {plan['input']} "
+        f"({plan['nodes']} nodes, {plan['elements']} elements) to {plan['output']}",
+        f"  coordinates   {sizes['coordinates'] / 1e6:12.1f} MB",
+        f"  connectivity  {sizes['connectivity'] / 1e6:12.1f} MB",
+        f"  adjacency     {sizes['adjacency'] / 1e6:12.1f} MB",
+        f"  velocity      {sizes['velocity'] / 1e6:12.1f} MB per frame, "
+        f"{sizes['velocity'] * plan['frames'] / 1e9:.2f} GB",
+        f"  total         {sizes['total'] / 1e9:12.2f} GB, "
+        f"{plan['needed_bytes'] / 1e9:.2f} GB more than the files it replaces",
+        f"  free space    {plan['free_bytes'] / 1e9:12.2f} GB, "
+        + ("fits" if plan["fits"] else "DOES NOT FIT"),
+        f"  time          {plan['frame_s']:.2f}s per frame, "
+        f"{plan['mesh_s']:.2f}s for the mesh files, "
+        f"~{plan['estimated_s'] / 60:.1f} min with {plan['workers']} workers",
+    ]
+    if plan["missing"]:
+        lines.append(
+            f"  missing       {len(plan['missing'])} frames, "
+            f"e.g. time step {plan['missing'][0]}"
+        )
+    return "\n".join(lines)
+
+
+def plan_folder(
+    root,
+    output,
+    file_name,
+    extension,
+    start,
+    stop,
+    increment,
+    num_digits,
+    field_name,
+    input_pattern=None,
+    current_start=None,
+    current_increment=1,
+    max_workers=1,
+):
+    """Plan process_folder with the same arguments (see plan_conversion)."""
+    settup_logging()
+    if input_pattern is not None:
+        frames = pattern_frames(
+            root,
+            output,
+            file_name,
+            input_pattern,
+            start,
+            stop,
+            increment,
+            current_start,
+            current_increment,
+        )
+    else:
+        frames = [
+            (
+                number,
+                os.path.join(root, f"{file_name}{number:0{num_digits}d}{extension}"),
+                create_vel_file_path(output, file_name, number),
             )
+            for number in range(start, stop + 1, increment)
+        ]
+    return plan_conversion(frames, output, file_name, max_workers, field_name)
+
+
+def plan_directory(
+    root,
+    extension,
+    start,
+    stop,
+    increment,
+    num_digits,
+    field_name,
+    input_pattern=None,
+    current_start=None,
+    current_increment=1,
+    max_workers=1,
+):
+    """
+    Plan process_directory, one plan per sub directory.
+
+    The sub directories share the free space of their filesystem, a plan
+    only fits if it and the plans before it on the same filesystem do.
+    """
+    settup_logging()
+    plans = []
+    needed: Dict[int, int] = {}
+    for sub_directory in sorted(os.listdir(root)):
+        sub_dir_path = os.path.join(root, sub_directory)
+        if not os.path.isdir(sub_dir_path):
+            continue
+        plan = plan_folder(
+            root=os.path.join(sub_dir_path, "input_vtu"),
+            output=os.path.join(sub_dir_path, "input_bin"),
+            file_name=sub_directory,
+            extension=extension,
+            start=start,
+            stop=stop,
+            increment=increment,
+            num_digits=num_digits,
+            field_name=field_name,
+            input_pattern=input_pattern,
+            current_start=current_start,
+            current_increment=current_increment,
+            max_workers=max_workers,
+        )
+        needed[plan["device"]] = needed.get(plan["device"], 0) + plan["needed_bytes"]
+        plan["fits"] = needed[plan["device"]] <= plan["free_bytes"]
+        plans.append(plan)
+    return plans
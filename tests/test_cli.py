@@ -4,6 +4,7 @@ import pytest
 import json
 import sys
 import os
+import subprocess
 from tempfile import TemporaryDirectory
 from unittest import mock
 from click.testing import CliRunner
@@ -11,11 +12,18 @@ from unittest.mock import patch
 from flowvcutils.cli import jsonlogger
 from flowvcutils.cli import vtu2bin
 from flowvcutils.cli import inigenerator
+from flowvcutils.cli import inisweep
 from flowvcutils.cli import simulationgenerator
 from flowvcutils.cli import filerename
 from flowvcutils.cli import filerenumber
+from flowvcutils.cli import run
+from flowvcutils.cli import solverscheduler
+from flowvcutils.cli import pipeline
+from flowvcutils.cli import service
 
 from flowvcutils.cli import main as cli_main
+from flowvcutils.cli import cli
+from flowvcutils.cli import logstats
 from flowvcutils.jsonlogger import settup_logging
 
 
@@ -32,7 +40,16 @@ def test_default_num_lines(mock_jsonlogger_main, runner):
     """Test that the default value of num_lines is passed."""
     result = runner.invoke(jsonlogger, [])
     assert result.exit_code == 0
-    mock_jsonlogger_main.assert_called_once_with(10)
+    mock_jsonlogger_main.assert_called_once_with(
+        10,
+        log_path=None,
+        level=None,
+        logger_name=None,
+        since=None,
+        until=None,
+        extras=[],
+        follow=False,
+    )
 
 
 @patch("flowvcutils.cli.jsonlogger_main")
@@ -40,7 +57,36 @@ def test_custom_num_lines(mock_jsonlogger_main, runner):
     """Test that a custom value for num_lines is passed."""
     result = runner.invoke(jsonlogger, ["20"])
     assert result.exit_code == 0
-    mock_jsonlogger_main.assert_called_once_with(20)
+    mock_jsonlogger_main.assert_called_once_with(
+        20,
+        log_path=None,
+        level=None,
+        logger_name=None,
+        since=None,
+        until=None,
+        extras=[],
+        follow=False,
+    )
+
+
+@patch("flowvcutils.cli.jsonlogger_main")
+def test_jsonlogger_filters(mock_jsonlogger_main, runner):
+    result = runner.invoke(
+        jsonlogger,
+        ["5", "--level", "warning", "--extra", "job.case=a", "--extra", "x=1", "-f"],
+    )
+    assert result.exit_code == 0
+    _, call_kwargs = mock_jsonlogger_main.call_args
+    assert call_kwargs["level"] == "warning"
+    assert call_kwargs["extras"] == ["job.case=a", "x=1"]
+    assert call_kwargs["follow"] is True
+
+
+def test_jsonlogger_bad_filter(runner, tmp_path):
+    log_path = tmp_path / "log.jsonl"
+    log_path.write_text("")
+    result = runner.invoke(jsonlogger, ["--log_file", str(log_path), "--level", "x"])
+    assert result.exit_code == 2
 
 
 def test_integration_main_jsonlogger(monkeypatch, capsys):
@@ -64,6 +110,36 @@ def test_integration_main_jsonlogger(monkeypatch, capsys):
     assert test_message in log_entry.get("message", "")
 
 
+@patch("flowvcutils.cli.jsonlogger_main")
+def test_trace_option(mock_jsonlogger_main, runner, tmp_path):
+    """--trace writes a trace file when the command is done."""
+    trace_file = tmp_path / "trace.json"
+    result = runner.invoke(cli, ["--trace", str(trace_file), "jsonlogger"])
+    assert result.exit_code == 0
+    mock_jsonlogger_main.assert_called_once()
+    with open(trace_file) as f:
+        assert "traceEvents" in json.load(f)
+
+
+@patch("flowvcutils.cli.jsonlogger_main")
+def test_metrics_option(mock_jsonlogger_main, runner, tmp_path):
+    prom_file = tmp_path / "flowvcutils.prom"
+    result = runner.invoke(cli, ["--metrics", str(prom_file), "jsonlogger"])
+    assert result.exit_code == 0
+    assert "flowvcutils_items_done" in prom_file.read_text()
+
+
+@patch("flowvcutils.cli.logstats_main")
+def test_logstats(mock_logstats_main, runner):
+    result = runner.invoke(logstats, ["--by", "case", "--json"])
+    assert result.exit_code == 0
+    mock_logstats_main.assert_called_once_with(
+        log_path=None, by="case", stage=None, since=None, until=None, as_json=True
+    )
+    result = runner.invoke(logstats, ["--by", "frame"])
+    assert result.exit_code == 2
+
+
 @patch("flowvcutils.cli.process_folder")
 def test_vtu2bin_defaults(mock_process_folder, runner):
     """
@@ -86,6 +162,71 @@ def test_vtu2bin_defaults(mock_process_folder, runner):
     assert call_kwargs["field_name"] == "velocity"
 
 
+@patch("flowvcutils.cli.process_folder")
+def test_vtu2bin_input_pattern(mock_process_folder, runner):
+    """Test that the input pattern and index mapping are passed on."""
+    result = runner.invoke(
+        vtu2bin,
+        [
+            "3000",
+            "5000",
+            "--input_pattern",
+            "case.{index}.vtk",
+            "--current_start",
+            "0",
+        ],
+    )
+    assert result.exit_code == 0, result.output
+    _, call_kwargs = mock_process_folder.call_args
+    assert call_kwargs["input_pattern"] == "case.{index}.vtk"
+    assert call_kwargs["current_start"] == 0
+    assert call_kwargs["current_increment"] == 1
+
+
+@patch("flowvcutils.cli.watch_folder")
+def test_vtu2bin_watch(mock_watch_folder, runner):
+    """Test that --watch watches root for the START-STOP frames."""
+    result = runner.invoke(
+        vtu2bin, ["0", "100", "--watch", "--poll_interval", "1", "--file_name", "a"]
+    )
+    assert result.exit_code == 0, result.output
+    mock_watch_folder.assert_called_once_with(
+        root=os.getcwd(),
+        output=os.getcwd(),
+        file_name="a",
+        extension=".vtu",
+        field_name="velocity",
+        start=0,
+        stop=100,
+        increment=50,
+        current_name="all_results_",
+        poll_interval=1.0,
+        idle_timeout=None,
+    )
+
+
+def test_vtu2bin_watch_batch(runner):
+    result = runner.invoke(vtu2bin, ["0", "100", "--watch", "--batch"])
+    assert result.exit_code == 2
+
+
+@pytest.mark.parametrize(
+    "option",
+    [
+        ["--input_pattern", "case_{index:05d}.vtu"],
+        ["--num_digits", "4"],
+        ["--max_workers", "4"],
+    ],
+)
+@patch("flowvcutils.cli.watch_folder")
+def test_vtu2bin_watch_unused_options(mock_watch_folder, runner, option):
+    """Options watch_folder does not use are rejected, not ignored."""
+    result = runner.invoke(vtu2bin, ["0", "100", "--watch"] + option)
+    assert result.exit_code == 2
+    assert option[0] in result.output
+    mock_watch_folder.assert_not_called()
+
+
 @patch("flowvcutils.cli.process_directory")
 def test_vtu2bin_directory_mode(mock_process_directory, runner):
     """
@@ -114,7 +255,18 @@ def test_default_ini_generator(mock_ini_generator_main, runner):
         result = runner.invoke(inigenerator, [f"-d{tmp_dir}"])
         assert result.exit_code == 0
         mock_ini_generator_main.assert_called_once_with(
-            tmp_dir, True, 0.001, "backward", False, None
+            tmp_dir,
+            True,
+            0.001,
+            "backward",
+            False,
+            None,
+            memory_budget=None,
+            time_budget=None,
+            fit_cell_size=False,
+            tracer_seeds=None,
+            vtu_dir="input_vtu",
+            input_pattern=None,
         )
 
 
@@ -156,7 +308,77 @@ def test_inigenerator_cli_manual_bounds(mock_inigenerator_main, runner):
         "backward",  # direction
         True,  # batch
         ((0.0, 0.0, 0.0), (1.0, 1.0, 1.0)),  # manual_bounds
+        memory_budget=None,
+        time_budget=None,
+        fit_cell_size=False,
+        tracer_seeds=None,
+        vtu_dir="input_vtu",
+        input_pattern=None,
+    )
+
+
+@patch("flowvcutils.cli.inigenerator_main")
+def test_inigenerator_cli_budgets(mock_inigenerator_main, runner):
+    """Test that the budgets are converted to bytes and seconds."""
+    result = runner.invoke(
+        inigenerator,
+        ["--memory_budget", "8", "--time_budget", "2", "--fit_cell_size"],
     )
+    assert result.exit_code == 0, f"CLI exited with an error: {result.output}"
+    _, call_kwargs = mock_inigenerator_main.call_args
+    assert call_kwargs["memory_budget"] == 8e9
+    assert call_kwargs["time_budget"] == 7200
+    assert call_kwargs["fit_cell_size"]
+
+
+def test_inigenerator_cli_fit_without_budget(runner):
+    """Test that fitting the cell size requires a budget."""
+    result = runner.invoke(inigenerator, ["--fit_cell_size"])
+    assert result.exit_code != 0
+
+
+@patch("flowvcutils.cli.inigenerator_main")
+def test_inigenerator_cli_unmet_budget(mock_inigenerator_main, runner):
+    """Test that an unmet budget is reported as a usage error."""
+    mock_inigenerator_main.side_effect = ValueError("no cell size fits the budget")
+    result = runner.invoke(inigenerator, ["--memory_budget", "1", "--fit_cell_size"])
+    assert result.exit_code == 2
+    assert "no cell size fits the budget" in result.output
+
+
+@patch("flowvcutils.cli.inigenerator_main")
+def test_inigenerator_cli_tracer_seeds(mock_inigenerator_main, runner):
+    """Test that the tracer seed options are passed as one dict."""
+    result = runner.invoke(
+        inigenerator,
+        [
+            "--tracer_seeds",
+            "sphere",
+            "--tracer_center",
+            "1",
+            "2",
+            "3",
+            "--tracer_radius",
+            "0.5",
+            "--tracer_spacing",
+            "0.1",
+        ],
+    )
+    assert result.exit_code == 0, f"CLI exited with an error: {result.output}"
+    _, call_kwargs = mock_inigenerator_main.call_args
+    assert call_kwargs["tracer_seeds"] == dict(
+        shape="sphere",
+        spacing=0.1,
+        center=(1.0, 2.0, 3.0),
+        normal=(0.0, 0.0, 1.0),
+        radius=0.5,
+    )
+
+
+def test_inigenerator_cli_tracer_plane_needs_center(runner):
+    """Test that plane seeds require a center and radius."""
+    result = runner.invoke(inigenerator, ["--tracer_seeds", "plane"])
+    assert result.exit_code != 0
 
 
 @patch("flowvcutils.cli.simulationgenerator_main")
@@ -169,9 +391,29 @@ def test_default_simulationgenerator(mock_simulationgenerator_main, runner):
             tmp_dir,
             [],
             "/usr/local/sv/svsolver/2022-07-22/bin/svpre generic_file.svpre",
+            max_jobs=1,
+            materialize="copy",
         )
 
 
+@patch("flowvcutils.cli.simulationgenerator_main")
+def test_simulationgenerator_failed_exit_code(mock_simulationgenerator_main, runner):
+    """Test that simulationgenerator exits non zero when svpre fails for a case."""
+    mock_simulationgenerator_main.return_value = [
+        {"case": "a", "exit_status": 0},
+        {"case": "b", "exit_status": 1},
+    ]
+    result = runner.invoke(
+        simulationgenerator,
+        ["-j", "4", "--svpre_exe", "svpre", "--materialize", "link"],
+    )
+    assert result.exit_code == 1
+    assert mock_simulationgenerator_main.call_args.kwargs == {
+        "max_jobs": 4,
+        "materialize": "link",
+    }
+
+
 def test_file_rename(runner):
     """Integration Test that the file rename works."""
     with TemporaryDirectory() as tmp_dir:
@@ -244,3 +486,265 @@ def test_init():
             with mock.patch.object(cli.sys, "exit") as mock_exit:
                 cli.init()
                 assert mock_exit.call_args[0][0] == 42
+
+
+@patch("flowvcutils.cli.jobrunner_main")
+def test_run_defaults(mock_jobrunner_main, runner):
+    """Test that run passes its defaults and exits 0 when no jobs fail."""
+    mock_jobrunner_main.return_value = {"n_failed": 0}
+    with TemporaryDirectory() as tmp_dir:
+        result = runner.invoke(run, [f"-d{tmp_dir}"])
+        assert result.exit_code == 0
+        mock_jobrunner_main.assert_called_once_with(
+            [],
+            tmp_dir,
+            batch=False,
+            max_jobs=1,
+            cpus=None,
+            flowvc_exe="flowVC",
+            summary_path=None,
+            force=False,
+        )
+
+
+@patch("flowvcutils.cli.jobrunner_main")
+def test_run_failed_jobs_exit_code(mock_jobrunner_main, runner):
+    """Test that run exits with a non zero status when a job fails."""
+    mock_jobrunner_main.return_value = {"n_failed": 1}
+    result = runner.invoke(run, ["-j", "4", "--cpus", "0-3"])
+    assert result.exit_code == 1
+
+
+def test_run_max_jobs_at_least_one(runner):
+    result = runner.invoke(run, ["-j", "0"])
+    assert result.exit_code == 2
+    assert "--max_jobs" in result.output
+
+
+@patch("flowvcutils.cli.inisweep_main")
+def test_inisweep_cli(mock_inisweep_main, runner):
+    """Test that inisweep passes the swept parameters and directions."""
+    with TemporaryDirectory() as tmp_dir:
+        result = runner.invoke(
+            inisweep,
+            [
+                f"-d{tmp_dir}",
+                "-p",
+                "Int_TimeStep=5e-6,1e-5",
+                "-p",
+                "FTLE_IntTLength=0.5,1.0",
+                "--direction",
+                "forward",
+                "--direction",
+                "backward",
+            ],
+        )
+        assert result.exit_code == 0
+        mock_inisweep_main.assert_called_once_with(
+            tmp_dir,
+            ["Int_TimeStep=5e-6,1e-5", "FTLE_IntTLength=0.5,1.0"],
+            ["forward", "backward"],
+            output_directory=None,
+            auto_range=True,
+            cell_size=0.001,
+            manual_bounds=None,
+        )
+
+
+@patch("flowvcutils.cli.solverscheduler_main")
+def test_solverscheduler_cli(mock_solverscheduler_main, runner):
+    """Test that solverscheduler passes its options and fails with a failed case."""
+    mock_solverscheduler_main.return_value = {"n_failed": 1}
+    with TemporaryDirectory() as tmp_dir:
+        result = runner.invoke(
+            solverscheduler,
+            [f"-d{tmp_dir}", "--case", "a", "-n", "4", "-c", "16", "--retries", "3"],
+        )
+        assert result.exit_code == 1
+        mock_solverscheduler_main.assert_called_once_with(
+            tmp_dir,
+            cases=["a"],
+            ranks=4,
+            core_budget=16,
+            solver_command=(
+                "mpiexec -np {ranks} /usr/local/sv/svsolver/2022-07-22/bin/svsolver"
+            ),
+            retries=3,
+            summary_path=None,
+        )
+
+
+@patch("flowvcutils.cli.pipeline_main")
+def test_pipeline_cli(mock_pipeline_main, runner, tmp_path):
+    """Test that pipeline passes its options and fails with a failed stage."""
+    mock_pipeline_main.return_value = {"n_failed": 1}
+    result = runner.invoke(
+        pipeline,
+        [
+            "0",
+            "100",
+            f"-d{tmp_path}",
+            "--case",
+            "a",
+            "--stage",
+            "flowvc",
+            "--stage",
+            "rename",
+            "-j",
+            "4",
+            "--force",
+        ],
+    )
+    assert result.exit_code == 1
+    mock_pipeline_main.assert_called_once_with(
+        str(tmp_path),
+        0,
+        100,
+        cases=["a"],
+        stages=["flowvc", "rename"],
+        max_jobs=4,
+        force=True,
+        summary_path=None,
+        increment=50,
+        num_digits=5,
+        field_name="velocity",
+        current_name="all_results_",
+        cell_size=0.001,
+        direction="backward",
+        flowvc_exe="flowVC",
+        max_workers=1,
+    )
+
+
+@patch("flowvcutils.cli.process_folder")
+@patch("flowvcutils.cli.service_call")
+def test_vtu2bin_service(mock_service_call, mock_process_folder, runner, tmp_path):
+    """--service sends the job to the service client instead of running it."""
+    result = runner.invoke(
+        vtu2bin, ["0", "50", "--root", str(tmp_path), "--file_name", "a_", "--service"]
+    )
+    assert result.exit_code == 0, result.output
+    mock_process_folder.assert_not_called()
+    args, kwargs = mock_service_call.call_args
+    assert args == ("process_folder",)
+    assert kwargs["root"] == str(tmp_path)
+    assert kwargs["file_name"] == "a_"
+
+    result = runner.invoke(vtu2bin, ["0", "50", "--watch", "--service"])
+    assert result.exit_code == 2
+
+
+@patch("flowvcutils.cli.service_main")
+def test_service_cli(mock_service_main, runner):
+    result = runner.invoke(service, ["--socket", "/tmp/a.sock", "-w", "8"])
+    assert result.exit_code == 0, result.output
+    mock_service_main.assert_called_once_with(socket_path="/tmp/a.sock", workers=8)
+
+
+@patch("flowvcutils.cli.format_plan")
+@patch("flowvcutils.cli.plan_folder")
+@patch("flowvcutils.cli.process_folder")
+def test_vtu2bin_plan(
+    mock_process_folder, mock_plan_folder, mock_format_plan, runner, tmp_path
+):
+    """--plan prints the plan, converts nothing and fails if it does not fit."""
+    mock_format_plan.return_value = "the plan"
+    for fits, exit_code in [(True, 0), (False, 1)]:
+        mock_plan_folder.return_value = {"fits": fits}
+        result = runner.invoke(
+            vtu2bin,
+            ["0", "50", "--root", str(tmp_path), "--plan", "--max_workers", "4"],
+        )
+        assert result.exit_code == exit_code, result.output
+        assert result.output == "the plan\n"
+    mock_process_folder.assert_not_called()
+    _, call_kwargs = mock_plan_folder.call_args
+    assert call_kwargs["root"] == str(tmp_path)
+    assert call_kwargs["max_workers"] == 4
+
+
+def test_filerenumber_view(runner, tmp_path):
+    """Integration test that --view links the renumbered names."""
+    for i in range(3):
+        (tmp_path / f"case.{i}.vtk").write_text(str(i))
+    view = tmp_path / "view"
+    result = runner.invoke(
+        filerenumber, [f"-d{tmp_path}", "--current_end", "2", "--view", str(view)]
+    )
+    assert result.exit_code == 0, result.output
+    assert sorted(os.listdir(view)) == [
+        "case.3050.vtk",
+        "case.3100.vtk",
+        "case.3150.vtk",
+    ]
+    assert sorted(os.listdir(tmp_path)) == [
+        "case.0.vtk",
+        "case.1.vtk",
+        "case.2.vtk",
+        "view",
+    ]
+
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "src")
+
+
+def run_python(*args):
+    """Run python with args in a fresh interpreter."""
+    return subprocess.run(
+        [sys.executable, *args],
+        capture_output=True,
+        text=True,
+        env=dict(os.environ, PYTHONPATH=SRC_DIR),
+    )
+
+
+def test_help_does_not_import_vtk():
+    process = run_python(
+        "-c",
+        "import sys\n"
+        "from flowvcutils.cli import cli\n"
+        "try:\n"
+        "    cli(['--help'])\n"
+        "except SystemExit:\n"
+        "    pass\n"
+        "print('vtk' in sys.modules)",
+    )
+    assert process.returncode == 0, process.stderr
+    assert process.stdout.strip().splitlines()[-1] == "False"
+    assert "vtu2bin" in process.stdout
+
+
+def test_command_help_is_light():
+    """<command> --help neither imports vtk nor sets up logging."""
+    process = run_python(
+        "-c",
+        "import sys\n"
+        "from flowvcutils import jsonlogger\n"
+        "from flowvcutils.cli import cli\n"
+        "try:\n"
+        "    cli(['vtu2bin', '--help'])\n"
+        "except SystemExit:\n"
+        "    pass\n"
+        "print('vtk' in sys.modules, jsonlogger._listener is None)",
+    )
+    assert process.returncode == 0, process.stderr
+    assert process.stdout.strip().splitlines()[-1] == "False True"
+    assert "--plan" in process.stdout
+
+
+@patch("flowvcutils.cli.stop_memory_profile")
+@patch("flowvcutils.cli.start_memory_profile")
+@patch("flowvcutils.cli.stop_profile")
+@patch("flowvcutils.cli.start_profile")
+@patch("flowvcutils.cli.jsonlogger_main")
+def test_profile_options(
+    mock_main, mock_start, mock_stop, mock_start_memory, mock_stop_memory, runner
+):
+    """--profile and --profile-memory wrap the subcommand."""
+    result = runner.invoke(cli, ["--profile", "--profile-memory", "jsonlogger"])
+    assert result.exit_code == 0, result.output
+    mock_start.assert_called_once_with("jsonlogger")
+    mock_start_memory.assert_called_once_with("jsonlogger")
+    mock_main.assert_called_once()
+    mock_stop.assert_called_once_with()
+    mock_stop_memory.assert_called_once_with()
@@ -2,7 +2,19 @@ import os
 import shutil
 import pytest
 import logging
-from flowvcutils.filerename import rename_files, renumber_files
+import json
+from unittest.mock import patch
+from flowvcutils.filerename import (
+    rename_files,
+    renumber_files,
+    plan_renames,
+    scan_directory,
+    create_rename_map,
+    input_matcher,
+    resolve_inputs,
+    build_view,
+    JOURNAL_NAME,
+)
 from tempfile import TemporaryDirectory
 
 
@@ -145,3 +157,207 @@ def test_renumber_files_without_file_name(renumber_directory, file_name):
     expected_file_set = set(expected_files)
     actual_files_set = set(os.listdir(tmp_dir))
     assert actual_files_set == expected_file_set
+
+
+def test_plan_renames_independent():
+    """Renames onto free names need no ordering or temporary names."""
+    chains = plan_renames({"a": "x", "b": "y"}, {"a", "b"})
+    assert sorted(chains) == [[("a", "x")], [("b", "y")]]
+
+
+def test_plan_renames_chain():
+    """a -> b -> c is run from the end of the chain."""
+    chains = plan_renames({"a": "b", "b": "c"}, {"a", "b"})
+    assert chains == [[("b", "c"), ("a", "b")]]
+
+
+def test_plan_renames_cycle():
+    """A cycle uses a single temporary name."""
+    chains = plan_renames({"a": "b", "b": "c", "c": "a"}, {"a", "b", "c"})
+    assert chains == [[("a", "a.tmp"), ("c", "a"), ("b", "c"), ("a.tmp", "b")]]
+
+
+def test_plan_renames_conflicts(caplog):
+    """Existing files and shared targets are never overwritten."""
+    mapping = {"a": "keep", "b": "a", "c": "same", "d": "same", "e": "e"}
+    with caplog.at_level(logging.ERROR):
+        chains = plan_renames(mapping, {"a", "b", "c", "d", "e", "keep"})
+    # a is blocked by keep, which then blocks b -> a
+    assert chains == []
+    assert "keep already exists" in caplog.text
+    assert "would all be same" in caplog.text
+
+
+def write_numbered(directory, numbers, prefix="case"):
+    for i in numbers:
+        with open(os.path.join(directory, f"{prefix}.{i}.vtk"), "w") as f:
+            f.write(str(i))
+
+
+def read_numbered(directory, prefix="case"):
+    contents = {}
+    for name in scan_directory(directory):
+        number = int(name.split(".")[1])
+        with open(os.path.join(directory, name)) as f:
+            contents[number] = int(f.read())
+    return contents
+
+
+def test_renumber_overlapping(tmp_path):
+    """Renumbering onto names that are still in use keeps every file."""
+    write_numbered(tmp_path, range(10))
+    renumber_files(
+        str(tmp_path),
+        "case",
+        current_start=0,
+        current_end=9,
+        current_increment=1,
+        new_start=5,
+        increment=1,
+        max_workers=4,
+    )
+    assert read_numbered(tmp_path) == {i + 5: i for i in range(10)}
+
+
+def test_renumber_reverse_order(tmp_path):
+    """Reversing the numbering is a set of swaps (cycles)."""
+    write_numbered(tmp_path, range(5))
+    with patch("flowvcutils.filerename.create_rename_map") as mock_map:
+        mock_map.return_value = {i: 4 - i for i in range(5)}
+        renumber_files(str(tmp_path), "case")
+    assert read_numbered(tmp_path) == {4 - i: i for i in range(5)}
+    assert not os.path.exists(tmp_path / JOURNAL_NAME)
+
+
+def test_renumber_resumes_from_journal(tmp_path):
+    """An interrupted plan is finished from the journal before anything else."""
+    # case.0 -> case.1 -> case.0 was interrupted after its first two steps
+    write_numbered(tmp_path, [1])
+    os.rename(tmp_path / "case.1.vtk", tmp_path / "case.0.vtk")
+    with open(tmp_path / "case.0.vtk.tmp", "w") as f:
+        f.write("0")
+    chains = [
+        [
+            ["case.0.vtk", "case.0.vtk.tmp"],
+            ["case.1.vtk", "case.0.vtk"],
+            ["case.0.vtk.tmp", "case.1.vtk"],
+        ]
+    ]
+    with open(tmp_path / JOURNAL_NAME, "w") as f:
+        f.write(json.dumps({"chains": chains}) + "\n")
+        f.write(json.dumps([0, 0]) + "\n")
+        f.write("[0,")  # the process died mid write
+
+    renumber_files(str(tmp_path), "case", current_end=1, new_start=0, increment=1)
+
+    assert read_numbered(tmp_path) == {0: 1, 1: 0}
+    assert not os.path.exists(tmp_path / JOURNAL_NAME)
+
+
+def test_rename_resumes_journal_before_scanning(tmp_path):
+    """The renames are planned from the directory as the journal left it."""
+    (tmp_path / "case_00003.vtu").write_text("old")
+    (tmp_path / "all_results_00003.vtu").write_text("new")
+    with open(tmp_path / JOURNAL_NAME, "w") as f:
+        f.write(json.dumps({"chains": [[["case_00003.vtu", "old_00003.vtu"]]]}))
+        f.write("\n")
+
+    rename_files(str(tmp_path), prefix="case")
+
+    assert (tmp_path / "old_00003.vtu").read_text() == "old"
+    assert (tmp_path / "case_00003.vtu").read_text() == "new"
+    assert not os.path.exists(tmp_path / "all_results_00003.vtu")
+
+
+def test_rename_does_not_overwrite(tmp_path, caplog):
+    """A new name taken by a file that is not renamed is an error, not a loss."""
+    (tmp_path / "case_00003.vtu").write_text("keep")
+    (tmp_path / "all_results_00003.vtu").write_text("new")
+
+    rename_files(str(tmp_path), prefix="case")
+
+    assert (tmp_path / "case_00003.vtu").read_text() == "keep"
+    assert (tmp_path / "all_results_00003.vtu").read_text() == "new"
+    assert "already exists" in caplog.text
+
+
+@pytest.mark.parametrize(
+    "pattern, name, expected",
+    [
+        ("all_results_{index:05d}.vtu", "all_results_00050.vtu", 50),
+        ("all_results_{index:05d}.vtu", "all_results_00050.vtp", None),
+        ("case.{index}.vtk", "case.12.vtk", 12),
+        ("case.{index}.vtk", "case_12.vtk", None),
+        (r"run_(\d+)_final\.vtu", "run_7_final.vtu", 7),
+    ],
+)
+def test_input_matcher(pattern, name, expected):
+    assert input_matcher(pattern)(name) == expected
+
+
+def test_resolve_inputs(tmp_path):
+    for i in range(4):
+        (tmp_path / f"case.{i}.vtk").write_text("")
+    (tmp_path / "other.0.vtk").write_text("")
+
+    assert resolve_inputs(str(tmp_path), "case.{index}.vtk") == {
+        i: str(tmp_path / f"case.{i}.vtk") for i in range(4)
+    }
+    index_map = create_rename_map(0, 2, 1, 3000, 50)
+    assert resolve_inputs(str(tmp_path), "case.{index}.vtk", index_map) == {
+        3000: str(tmp_path / "case.0.vtk"),
+        3050: str(tmp_path / "case.1.vtk"),
+        3100: str(tmp_path / "case.2.vtk"),
+    }
+
+
+def test_rename_view(tmp_path):
+    """A view links the new names to the untouched source files."""
+    source = tmp_path / "results"
+    source.mkdir()
+    for i in range(3):
+        (source / f"all_results_0000{i}.vtu").write_text(str(i))
+    view = tmp_path / "view"
+
+    rename_files(str(source), prefix="steady", view=str(view))
+
+    assert sorted(os.listdir(source)) == [f"all_results_0000{i}.vtu" for i in range(3)]
+    assert sorted(os.listdir(view)) == [f"steady_0000{i}.vtu" for i in range(3)]
+    for i in range(3):
+        assert (view / f"steady_0000{i}.vtu").read_text() == str(i)
+
+
+def test_renumber_view(tmp_path):
+    source = tmp_path / "results"
+    source.mkdir()
+    write_numbered(source, range(3))
+    view = tmp_path / "view"
+
+    renumber_files(str(source), "case", current_end=2, view=str(view))
+
+    assert read_numbered(source) == {0: 0, 1: 1, 2: 2}
+    assert read_numbered(view) == {3000: 0, 3050: 1, 3100: 2}
+
+
+def test_rebuild_view(tmp_path):
+    """Rebuilding keeps correct links, replaces stale ones and keeps the rest."""
+    source = tmp_path / "results"
+    source.mkdir()
+    for name in ["a", "b", "c"]:
+        (source / name).write_text(name)
+    view = tmp_path / "view"
+    build_view(str(source), {"a": "x", "b": "y"}, str(view))
+    (view / "notes.txt").write_text("keep")
+    other = tmp_path / "other.vtu"
+    other.write_text("other")
+    os.symlink(other, view / "mine.vtu")
+    x_link = os.readlink(view / "x")
+
+    with patch("flowvcutils.filerename.os.symlink", wraps=os.symlink) as mock_link:
+        build_view(str(source), {"a": "x", "c": "y"}, str(view))
+        assert mock_link.call_count == 1
+
+    assert os.readlink(view / "x") == x_link
+    assert (view / "y").read_text() == "c"
+    assert sorted(os.listdir(view)) == ["mine.vtu", "notes.txt", "x", "y"]
+    assert os.readlink(view / "mine.vtu") == str(other)
@@ -0,0 +1,122 @@
+import math
+import numpy as np
+import pytest
+from flowvcutils.ftlecost import (
+    grid_points,
+    read_bin_count,
+    estimate_cost,
+    fits_budget,
+    finest_cell_size,
+    mesh_size_from_bin,
+    FTLE_POINT_BYTES,
+    NODE_BYTES,
+    ELEMENT_BYTES,
+    SECONDS_PER_EVALUATION,
+)
+
+SETTINGS = {
+    "int_type": "1",
+    "int_timestep": "0.01",
+    "int_maxtimestep": "0.1",
+    "ftle_inttlength": "1.0",
+    "output_tres": "2",
+}
+BOUNDS = ((0.0, 0.0, 0.0), (1.0, 2.0, 0.5))
+
+
+@pytest.mark.parametrize(
+    "cell_size, expected",
+    [
+        (0.5, 2 * 4 * 1),
+        (0.3, 4 * 7 * 2),  # partial cells are stretched to a full cell
+        (10.0, 1),
+    ],
+)
+def test_grid_points(cell_size, expected):
+    assert grid_points(BOUNDS, cell_size) == expected
+
+
+def test_read_bin_count(tmp_path):
+    file_path = tmp_path / "test_coordinates.bin"
+    with open(file_path, "wb") as f:
+        np.array([7], dtype=np.int32).tofile(f)
+        np.zeros(21).tofile(f)
+    assert read_bin_count(file_path) == 7
+
+
+def test_mesh_size_from_bin(tmp_path):
+    for file_type, count in [("coordinates", 10), ("connectivity", 30)]:
+        with open(tmp_path / f"case_{file_type}.bin", "wb") as f:
+            np.array([count], dtype=np.int32).tofile(f)
+    assert mesh_size_from_bin(str(tmp_path), "case") == (10, 30)
+    assert mesh_size_from_bin(str(tmp_path), "missing") == (0, 0)
+
+
+def test_estimate_cost():
+    estimate = estimate_cost(1000, 50, 200, SETTINGS)
+
+    # 100 RK4 steps (4 evaluations) for each of 2 output frames
+    assert estimate["evaluations"] == 1000 * 100 * 4 * 2
+    assert estimate["runtime_s"] == pytest.approx(
+        estimate["evaluations"] * SECONDS_PER_EVALUATION
+    )
+    assert estimate["output_bytes_per_frame"] == 1000 * 16
+    assert estimate["output_bytes_total"] == 1000 * 16 * 2
+    assert estimate["memory_bytes"] == (
+        1000 * FTLE_POINT_BYTES + 50 * NODE_BYTES + 200 * ELEMENT_BYTES
+    )
+
+
+def test_estimate_cost_adaptive_uses_max_time_step():
+    settings = dict(SETTINGS, int_type="2")
+    estimate = estimate_cost(1000, 0, 0, settings)
+    assert estimate["evaluations"] == 1000 * 10 * 6 * 2
+
+
+def test_fits_budget():
+    estimate = {"memory_bytes": 100, "runtime_s": 10}
+    assert fits_budget(estimate)
+    assert fits_budget(estimate, memory_budget=100, time_budget=10)
+    assert not fits_budget(estimate, memory_budget=99)
+    assert not fits_budget(estimate, time_budget=9)
+
+
+def test_finest_cell_size_memory_budget():
+    budget = 1e6
+    cell_size = finest_cell_size(BOUNDS, 0, 0, SETTINGS, memory_budget=budget)
+
+    def memory(size):
+        return estimate_cost(grid_points(BOUNDS, size), 0, 0, SETTINGS)["memory_bytes"]
+
+    assert memory(cell_size) <= budget
+    # a noticeably finer grid would not fit
+    assert memory(cell_size * 0.95) > budget
+    # rounded to 3 significant figures
+    assert cell_size == float(f"{cell_size:.3g}")
+
+
+def test_finest_cell_size_time_budget():
+    cell_size = finest_cell_size(BOUNDS, 0, 0, SETTINGS, time_budget=1.0)
+    estimate = estimate_cost(grid_points(BOUNDS, cell_size), 0, 0, SETTINGS)
+    assert estimate["runtime_s"] <= 1.0
+
+
+def test_finest_cell_size_min_cell_size_fits():
+    assert (
+        finest_cell_size(BOUNDS, 0, 0, SETTINGS, memory_budget=1e12, min_cell_size=0.1)
+        == 0.1
+    )
+
+
+def test_finest_cell_size_impossible_budget():
+    with pytest.raises(ValueError):
+        finest_cell_size(BOUNDS, 10**9, 0, SETTINGS, memory_budget=1.0)
+
+
+def test_finest_cell_size_log_bisection_is_monotone():
+    sizes = [
+        finest_cell_size(BOUNDS, 0, 0, SETTINGS, memory_budget=budget)
+        for budget in [1e5, 1e6, 1e7]
+    ]
+    assert sizes == sorted(sizes, reverse=True)
+    assert all(math.isfinite(size) for size in sizes)
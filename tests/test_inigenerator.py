@@ -2,6 +2,7 @@ import pytest
 import vtk
 import os
 import math
+import numpy as np
 from pathlib import Path
 from tempfile import TemporaryDirectory
 from flowvcutils.inigenerator import (
@@ -220,6 +221,28 @@ def test_vtu_file_doesnt_exist():
             dir_handler.find_vtu()
 
 
+def test_vtu_file_pattern(tmp_path):
+    """
+    Test that an input pattern picks the lowest index frame in vtu_dir.
+    """
+    results = tmp_path / "results"
+    results.mkdir()
+    for name in ["all_results_00100.vtu", "all_results_00050.vtu", "a_00000.vtu"]:
+        (results / name).write_text("dummy content")
+    dir_handler = directoryHandler(
+        str(tmp_path), vtu_dir="results", input_pattern="all_results_{index:05d}.vtu"
+    )
+    assert dir_handler.find_vtu() == str(results / "all_results_00050.vtu")
+
+
+def test_vtu_file_pattern_doesnt_match(tmp_path):
+    (tmp_path / "input_vtu").mkdir()
+    (tmp_path / "input_vtu" / "a_00000.vtu").write_text("dummy content")
+    dir_handler = directoryHandler(str(tmp_path), input_pattern=r"b_(\d+)\.vtu")
+    with pytest.raises(FileNotFoundError):
+        dir_handler.find_vtu()
+
+
 def test_Data_Tmax():
     """
     Integration test to ensure final config looks good
@@ -494,3 +517,79 @@ def test_integration_manual_bounds(create_sample_vtu_file):
     assert ftle_xres == 10, f"Expected FTLE xres=10, got {ftle_xres}"
     assert ftle_yres == 10, f"Expected FTLE yres=10, got {ftle_yres}"
     assert ftle_zres == 2, f"Expected FTLE zres=2, got {ftle_zres}"
+
+
+def test_integration_budget_warning(create_sample_vtu_file, caplog):
+    """Test that a .in file that does not fit the memory budget logs a warning."""
+    directory = Path(create_sample_vtu_file).parent.parent
+    (directory / "input_bin").mkdir()
+    config = Config(resultsProcessor(directoryHandler(str(directory))))
+    with caplog.at_level(logging.WARNING):
+        config.process_directory(
+            auto_range=True, cell_size=0.1, direction="backward", memory_budget=1000
+        )
+    assert "exceeds the" in caplog.text
+
+
+def test_integration_fit_cell_size(create_sample_vtu_file):
+    """Test that the fitted cell size gives an FTLE grid within the budget."""
+    directory = Path(create_sample_vtu_file).parent.parent
+    (directory / "input_bin").mkdir()
+    directory_handler = directoryHandler(str(directory))
+    config = Config(resultsProcessor(directory_handler))
+    config.process_directory(
+        auto_range=True,
+        cell_size=0.001,
+        direction="backward",
+        memory_budget=1e6,
+        fit_cell_size=True,
+    )
+    estimate = config.estimate_cost()
+    assert estimate["memory_bytes"] <= 1e6
+    # the sample mesh is read once and its size is used in the estimate
+    assert config.get_mesh_size() == (3, 0)
+
+
+def test_integration_tracer_seeds(tmp_path):
+    """Test that tracer seeds write a format 4 file and the Trace_* keys."""
+    directory = tmp_path / "case"
+    (directory / "input_vtu").mkdir(parents=True)
+    (directory / "input_bin").mkdir()
+    points = vtk.vtkPoints()
+    for point in [(0, 0, 0), (1, 0, 0), (0, 1, 0), (0, 0, 1)]:
+        points.InsertNextPoint(point)
+    grid = vtk.vtkUnstructuredGrid()
+    grid.SetPoints(points)
+    grid.InsertNextCell(vtk.VTK_TETRA, 4, [0, 1, 2, 3])
+    writer = vtk.vtkXMLUnstructuredGridWriter()
+    writer.SetFileName(str(directory / "input_vtu" / "case_00000.vtu"))
+    writer.SetInputData(grid)
+    writer.Write()
+
+    inigenerator_main(
+        str(directory),
+        auto_range=True,
+        cell_size=0.1,
+        direction="forward",
+        tracer_seeds=dict(shape="volume", spacing=0.25),
+    )
+
+    config_values = load_config(
+        str(directory / "input_bin" / "case.in"),
+        [
+            "ftle_compute",
+            "trace_compute",
+            "trace_generatemesh",
+            "trace_infile",
+            "trace_infileformat",
+        ],
+    )
+    assert config_values == {
+        "ftle_compute": "0",
+        "trace_compute": "1",
+        "trace_generatemesh": "0",
+        "trace_infile": "case_seeds.bin",
+        "trace_infileformat": "4",
+    }
+    seed_file = directory / "input_bin" / "case_seeds.bin"
+    assert np.fromfile(seed_file, dtype=np.int32, count=1)[0] == 35
@@ -0,0 +1,114 @@
+import os
+import json
+import pytest
+import vtk
+from flowvcutils.jobrunner import discover_in_files, parse_in_file
+from flowvcutils.inisweep import (
+    compiledTemplate,
+    parse_parameters,
+    combination_name,
+    sweep,
+    SWEEP_MANIFEST,
+)
+
+TEMPLATE = """[Outputs]
+# Path_Data: where the data lives
+Path_Data = ../bin/
+
+Path_Output = ../output/
+# Int_TimeStep: time step
+Int_TimeStep = 5e-6
+FTLE_IntTLength = 1.0
+"""
+
+
+@pytest.fixture
+def case_directory(tmp_path):
+    """A case directory with a sample .vtu file and an input_bin directory."""
+    directory = tmp_path / "case"
+    (directory / "input_vtu").mkdir(parents=True)
+    (directory / "input_bin").mkdir()
+    points = vtk.vtkPoints()
+    for point in [(1.0, 2.0, 3.0), (4.0, 5.0, 6.0), (-1.0, -2.0, -3.0)]:
+        points.InsertNextPoint(point)
+    grid = vtk.vtkUnstructuredGrid()
+    grid.SetPoints(points)
+    writer = vtk.vtkXMLUnstructuredGridWriter()
+    writer.SetFileName(str(directory / "input_vtu" / "case_00000.vtu"))
+    writer.SetInputData(grid)
+    writer.Write()
+    return str(directory)
+
+
+def test_template_keeps_comments_and_order():
+    template = compiledTemplate(TEMPLATE)
+    rendered = template.render({"int_timestep": "1e-5"})
+
+    assert rendered == (
+        "# Path_Data: where the data lives\n"
+        "Path_Data = ../bin/\n"
+        "\n"
+        "Path_Output = ../output/\n"
+        "# Int_TimeStep: time step\n"
+        "Int_TimeStep = 1e-5\n"
+        "FTLE_IntTLength = 1.0\n"
+    )
+
+
+def test_template_validate():
+    template = compiledTemplate(TEMPLATE)
+    template.validate(["INT_TIMESTEP", "FTLE_IntTLength"])
+    with pytest.raises(ValueError):
+        template.validate(["Int_TimeStp"])
+
+
+def test_parse_parameters():
+    assert parse_parameters(["Int_TimeStep=5e-6, 1e-5", "Output_TRes=2"]) == {
+        "Int_TimeStep": ["5e-6", "1e-5"],
+        "Output_TRes": ["2"],
+    }
+    with pytest.raises(ValueError):
+        parse_parameters(["Int_TimeStep"])
+
+
+def test_combination_name():
+    combination = [("Int_TimeStep", "5e-6"), ("Path", "a/b"), ("direction", "forward")]
+    assert combination_name(combination) == (
+        "Int_TimeStep-5e-6__Path-a_b__direction-forward"
+    )
+
+
+def test_sweep(case_directory):
+    output_directory = os.path.join(case_directory, "sweep")
+    combinations = sweep(
+        case_directory,
+        {"Int_TimeStep": ["5e-6", "1e-5"], "FTLE_IntTLength": ["0.5", "1.0"]},
+        directions=["forward", "backward"],
+    )
+
+    assert len(combinations) == 8
+    in_files = discover_in_files(output_directory, batch=True)
+    assert len(in_files) == 8
+    with open(os.path.join(output_directory, SWEEP_MANIFEST)) as f:
+        assert json.load(f) == combinations
+
+    for combination in combinations:
+        case = os.path.join(output_directory, combination["name"])
+        with open(os.path.join(case, f"{combination['name']}.in")) as f:
+            params = parse_in_file(f.read())
+        assert params["int_timestep"] == combination["Int_TimeStep"]
+        assert params["ftle_inttlength"] == combination["FTLE_IntTLength"]
+        assert params["path_output"] == os.path.join(case, "output_bin")
+        assert os.path.isdir(params["path_output"])
+        assert params["data_infileprefix"] == "case"
+        if combination["direction"] == "backward":
+            assert params["int_timedirection"] == "-1"
+            assert params["ftle_outfileprefix"] == "case_backward"
+        else:
+            assert params["int_timedirection"] == "1"
+
+
+def test_sweep_unknown_key(case_directory):
+    with pytest.raises(ValueError):
+        sweep(case_directory, {"Int_TimeStp": ["5e-6"]})
+    assert not os.path.exists(os.path.join(case_directory, "sweep"))
@@ -0,0 +1,272 @@
+import os
+import sys
+import json
+import pytest
+from unittest.mock import patch
+from flowvcutils import jobrunner
+from flowvcutils.jobrunner import (
+    parse_cpu_list,
+    parse_in_file,
+    find_input_files,
+    find_output_files,
+    cpu_slots,
+    discover_in_files,
+    run_job,
+    run_jobs,
+)
+
+FAKE_FLOWVC = """
+import os
+import sys
+in_file = sys.argv[1]
+print(f"flowVC reading {in_file}")
+print("fake warning", file=sys.stderr)
+params = {}
+with open(in_file) as f:
+    for line in f:
+        key, value = line.split("=")
+        params[key.strip()] = value.strip()
+with open(in_file + ".count", "a") as f:
+    f.write("1")
+output = os.path.join(params["path_output"], params["ftle_outfileprefix"] + ".0.bin")
+with open(output, "w") as f:
+    f.write("ftle")
+sys.exit(int(params["exit"]))
+"""
+
+
+@pytest.fixture
+def fake_flowvc(tmp_path):
+    """A stand-in flowVC executable that echoes its .in file."""
+    script = tmp_path / "fake_flowvc.py"
+    script.write_text(FAKE_FLOWVC)
+    return f'"{sys.executable}" "{script}"'
+
+
+@pytest.fixture
+def in_files(tmp_path):
+    """Two cases in batch layout, the second exits with a status of 3."""
+    files = []
+    for name, exit_status in [("case_a", 0), ("case_b", 3)]:
+        input_bin = tmp_path / "cases" / name / "input_bin"
+        input_bin.mkdir(parents=True)
+        (tmp_path / "cases" / name / "output_bin").mkdir()
+        for file_type in ["coordinates", "connectivity", "adjacency", "vel.0"]:
+            (input_bin / f"{name}_{file_type}.bin").write_bytes(b"data")
+        in_file = input_bin / f"{name}.in"
+        in_file.write_text(
+            f"path_data = {input_bin}\n"
+            "path_output = ../output_bin\n"
+            f"data_infileprefix = {name}\n"
+            "ftle_compute = 1\n"
+            f"ftle_outfileprefix = {name}_backward\n"
+            f"exit = {exit_status}\n"
+        )
+        files.append(str(in_file))
+    return files
+
+
+@pytest.mark.parametrize(
+    "cpus, expected",
+    [
+        (None, None),
+        ("", None),
+        ("0-3", [0, 1, 2, 3]),
+        ("0,2,4", [0, 2, 4]),
+        ("0-1,8", [0, 1, 8]),
+    ],
+)
+def test_parse_cpu_list(cpus, expected):
+    assert parse_cpu_list(cpus) == expected
+
+
+@pytest.mark.parametrize(
+    "cpus, max_jobs, expected",
+    [
+        (None, 2, [None, None]),
+        ([0, 1, 2, 3], 2, [[0, 2], [1, 3]]),
+        ([0], 2, [[0], [0]]),
+    ],
+)
+def test_cpu_slots(cpus, max_jobs, expected):
+    assert cpu_slots(cpus, max_jobs) == expected
+
+
+def test_discover_in_files_batch(tmp_path, in_files):
+    assert discover_in_files(str(tmp_path / "cases"), batch=True) == in_files
+
+
+def test_discover_in_files_single(in_files):
+    case_dir = os.path.dirname(os.path.dirname(in_files[0]))
+    assert discover_in_files(case_dir) == [in_files[0]]
+
+
+def test_run_job_captures_output(fake_flowvc, in_files):
+    record = run_job(in_files[0], flowvc_exe=fake_flowvc)
+
+    assert record["exit_status"] == 0
+    assert record["wall_time_s"] > 0
+    with open(record["stdout"]) as f:
+        assert f"flowVC reading {in_files[0]}" in f.read()
+    with open(record["stderr"]) as f:
+        assert "fake warning" in f.read()
+
+
+@pytest.mark.skipif(not hasattr(os, "wait4"), reason="requires os.wait4")
+def test_run_job_records_peak_rss(fake_flowvc, in_files):
+    record = run_job(in_files[0], flowvc_exe=fake_flowvc)
+    assert record["peak_rss_bytes"] > 0
+
+
+def test_run_job_failed_exit_status(fake_flowvc, in_files):
+    record = run_job(in_files[1], flowvc_exe=fake_flowvc)
+    assert record["exit_status"] == 3
+
+
+def test_run_job_missing_executable(in_files):
+    record = run_job(in_files[0], flowvc_exe="/not/a/real/flowVC")
+    assert record["exit_status"] is None
+    assert "error" in record
+
+
+@pytest.mark.skipif(
+    not hasattr(os, "sched_getaffinity"), reason="requires cpu affinity"
+)
+def test_run_jobs_with_affinity(fake_flowvc, in_files):
+    cpu = sorted(os.sched_getaffinity(0))[0]
+    records = run_jobs(in_files, fake_flowvc, max_jobs=2, cpus=[cpu])
+    assert [record["cpus"] for record in records] == [[cpu], [cpu]]
+    assert [record["exit_status"] for record in records] == [0, 3]
+
+
+def test_main_writes_summary(tmp_path, fake_flowvc, in_files):
+    directory = str(tmp_path / "cases")
+    summary = jobrunner.main(
+        [], directory, batch=True, max_jobs=2, flowvc_exe=fake_flowvc
+    )
+    summary_path = os.path.join(directory, jobrunner.SUMMARY_FILE_NAME)
+    with open(summary_path) as f:
+        saved = json.load(f)
+
+    assert saved == summary
+    assert saved["n_jobs"] == 2
+    assert saved["n_failed"] == 1
+    assert saved["n_skipped"] == 0
+    assert [job["in_file"] for job in saved["jobs"]] == in_files
+
+
+def run_count(in_file):
+    with open(in_file + ".count") as f:
+        return len(f.read())
+
+
+def test_parse_in_file():
+    text = "# comment\nPath_Data = ../bin/\n\nData_InFilePrefix = dg \n"
+    assert parse_in_file(text) == {"path_data": "../bin/", "data_infileprefix": "dg"}
+
+
+def test_find_input_and_output_files(fake_flowvc, in_files):
+    in_file = in_files[0]
+    with open(in_file) as f:
+        params = parse_in_file(f.read())
+    input_bin = os.path.dirname(in_file)
+    output_bin = os.path.join(os.path.dirname(input_bin), "output_bin")
+
+    assert find_input_files(in_file, params) == sorted(
+        os.path.join(input_bin, f"case_a_{file_type}.bin")
+        for file_type in ["coordinates", "connectivity", "adjacency", "vel.0"]
+    )
+    run_job(in_file, flowvc_exe=fake_flowvc)
+    assert find_output_files(in_file, params) == [
+        os.path.join(output_bin, "case_a_backward.0.bin")
+    ]
+
+
+def test_run_job_skips_up_to_date(fake_flowvc, in_files):
+    run_job(in_files[0], flowvc_exe=fake_flowvc)
+    record = run_job(in_files[0], flowvc_exe=fake_flowvc)
+
+    assert record["skipped"]
+    assert run_count(in_files[0]) == 1
+
+
+def test_run_job_force(fake_flowvc, in_files):
+    run_job(in_files[0], flowvc_exe=fake_flowvc)
+    record = run_job(in_files[0], flowvc_exe=fake_flowvc, force=True)
+
+    assert not record["skipped"]
+    assert run_count(in_files[0]) == 2
+
+
+def test_run_job_reruns_failed(fake_flowvc, in_files):
+    run_job(in_files[1], flowvc_exe=fake_flowvc)
+    record = run_job(in_files[1], flowvc_exe=fake_flowvc)
+
+    assert not record["skipped"]
+    assert run_count(in_files[1]) == 2
+
+
+def test_run_job_reruns_changed_input(fake_flowvc, in_files):
+    run_job(in_files[0], flowvc_exe=fake_flowvc)
+    vel_file = os.path.join(os.path.dirname(in_files[0]), "case_a_vel.0.bin")
+    with open(vel_file, "wb") as f:
+        f.write(b"new velocity data")
+    record = run_job(in_files[0], flowvc_exe=fake_flowvc)
+
+    assert not record["skipped"]
+    assert run_count(in_files[0]) == 2
+
+
+def test_run_job_reruns_missing_output(fake_flowvc, in_files):
+    record = run_job(in_files[0], flowvc_exe=fake_flowvc)
+    output_bin = os.path.join(os.path.dirname(record["stdout"]), "..", "output_bin")
+    os.remove(os.path.join(output_bin, "case_a_backward.0.bin"))
+    record = run_job(in_files[0], flowvc_exe=fake_flowvc)
+
+    assert not record["skipped"]
+    assert run_count(in_files[0]) == 2
+
+
+def test_run_job_touched_input_uses_hash(fake_flowvc, in_files):
+    """A new mtime with the same contents falls back to the full hash."""
+    run_job(in_files[0], flowvc_exe=fake_flowvc)
+    vel_file = os.path.join(os.path.dirname(in_files[0]), "case_a_vel.0.bin")
+    stat = os.stat(vel_file)
+    os.utime(vel_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    with patch(
+        "flowvcutils.jobrunner.compute_run_key", wraps=jobrunner.compute_run_key
+    ) as mock_key:
+        assert run_job(in_files[0], flowvc_exe=fake_flowvc)["skipped"]
+        assert mock_key.call_count == 1
+        # the refreshed size+mtime precheck avoids hashing on the next run
+        assert run_job(in_files[0], flowvc_exe=fake_flowvc)["skipped"]
+        assert mock_key.call_count == 1
+
+
+def test_run_job_ignores_stale_outputs(fake_flowvc, in_files):
+    """Files an earlier run left in Path_Output do not make a case up to date."""
+    output_bin = os.path.join(os.path.dirname(in_files[0]), "..", "output_bin")
+    stale = os.path.join(output_bin, "case_a_backward.50.bin")
+    with open(stale, "w") as f:
+        f.write("old ftle")
+    run_job(in_files[0], flowvc_exe=fake_flowvc)
+    cache = jobrunner.load_run_cache(in_files[0])
+    assert [os.path.basename(path) for path in cache["outputs"]] == [
+        "case_a_backward.0.bin"
+    ]
+
+    os.remove(os.path.join(output_bin, "case_a_backward.0.bin"))
+    assert not run_job(in_files[0], flowvc_exe=fake_flowvc)["skipped"]
+
+
+def test_run_job_without_outputs_reruns(fake_flowvc, in_files):
+    with open(in_files[0]) as f:
+        text = f.read()
+    with open(in_files[0], "w") as f:
+        f.write(text.replace("ftle_compute = 1", "ftle_compute = 0"))
+    run_job(in_files[0], flowvc_exe=fake_flowvc)
+    record = run_job(in_files[0], flowvc_exe=fake_flowvc)
+
+    assert not record["skipped"]
+    assert run_count(in_files[0]) == 2
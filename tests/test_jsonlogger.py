@@ -1,11 +1,29 @@
 import os
 import uuid
+import queue
 import json
 import pytest
-from unittest.mock import mock_open, patch
+import time
+import threading
+from unittest.mock import patch
 import logging.config
 import logging.handlers
-from flowvcutils.jsonlogger import settup_logging, print_last_logs
+from concurrent.futures import ProcessPoolExecutor
+from flowvcutils.jsonlogger import (
+    settup_logging,
+    print_last_logs,
+    last_logs,
+    reverse_lines,
+    record_filter,
+    follow_logs,
+    flush_logging,
+    worker_logging,
+    init_worker_logging,
+    recordQueueHandler,
+    flowvcutilsJSONFormatter,
+)
+from flowvcutils import jsonlogger
+import datetime as dt
 from flowvcutils.utils import get_project_root
 
 
@@ -19,33 +37,137 @@ def mock_log_file():
     return "\n".join(log_entries)
 
 
-def test_print_last_logs(capfd, mock_log_file):
-    with patch("builtins.open", mock_open(read_data=mock_log_file)):
-        print_last_logs(2)
-        captured = capfd.readouterr()
-        expected_output = (
-            json.dumps(
-                {"message": "Log entry 2", "timestamp": "2023-01-01T01:00:00Z"},
-                indent=4,
-            )
-            + "\n"
-            + json.dumps(
-                {"message": "Log entry 3", "timestamp": "2023-01-01T02:00:00Z"},
-                indent=4,
-            )
-            + "\n"
+def test_print_last_logs(capfd, mock_log_file, tmp_path):
+    log_path = tmp_path / "flowvcutils.log.jsonl"
+    log_path.write_text(mock_log_file)
+    print_last_logs(2, str(log_path))
+    captured = capfd.readouterr()
+    expected_output = (
+        json.dumps(
+            {"message": "Log entry 2", "timestamp": "2023-01-01T01:00:00Z"},
+            indent=4,
         )
+        + "\n"
+        + json.dumps(
+            {"message": "Log entry 3", "timestamp": "2023-01-01T02:00:00Z"},
+            indent=4,
+        )
+        + "\n"
+    )
 
-        assert captured.out == expected_output
+    assert captured.out == expected_output
 
 
-def test_print_last_logs_with_error(capfd, mock_log_file):
+def test_print_last_logs_with_error(capfd, mock_log_file, tmp_path):
     # Corrupt the last log entry to induce JSONDecodeError
-    faulty_log = mock_log_file + "\n{"
-    with patch("builtins.open", mock_open(read_data=faulty_log)):
-        print_last_logs(2)
-        captured = capfd.readouterr()
-        assert "Error printing log" in captured.out
+    log_path = tmp_path / "flowvcutils.log.jsonl"
+    log_path.write_text(mock_log_file + "\n{")
+    print_last_logs(2, str(log_path))
+    captured = capfd.readouterr()
+    assert "Error printing log" in captured.out
+
+
+def write_log(path, numbers, **fields):
+    with open(path, "w") as f:
+        for number in numbers:
+            entry = {
+                "level": "WARNING" if number % 3 == 0 else "INFO",
+                "message": f"entry {number}",
+                "logger": "flowvcutils.jobrunner" if number % 2 else "flowvcutils",
+                "timestamp": f"2023-01-01T00:00:{number:02d}+00:00",
+                "job": {"exit_status": number % 4},
+            }
+            entry.update(fields)
+            f.write(json.dumps(entry) + "\n")
+
+
+def messages(entries):
+    return [entry["message"] for entry in entries]
+
+
+def test_reverse_lines(tmp_path):
+    path = tmp_path / "log.jsonl"
+    path.write_text("first\n\nsecond line\nthird" + "x" * 20 + "\n")
+    expected = ["third" + "x" * 20, "second line", "first"]
+    for block_size in [1, 3, 7, 1024]:
+        assert list(reverse_lines(str(path), block_size)) == expected
+
+
+def test_last_logs_reads_backups(tmp_path):
+    log_path = tmp_path / "flowvcutils.log.jsonl"
+    write_log(log_path, range(20, 25))
+    write_log(f"{log_path}.1", range(10, 20))
+    write_log(f"{log_path}.2", range(0, 10))
+
+    assert messages(last_logs(3, str(log_path))) == [f"entry {i}" for i in [22, 23, 24]]
+    assert messages(last_logs(8, str(log_path))) == [
+        f"entry {i}" for i in range(17, 25)
+    ]
+    assert len(last_logs(100, str(log_path))) == 25
+    assert last_logs(0, str(log_path)) == []
+
+
+def test_last_logs_filters(tmp_path):
+    log_path = tmp_path / "flowvcutils.log.jsonl"
+    write_log(log_path, range(10, 20))
+    write_log(f"{log_path}.1", range(0, 10))
+
+    match = record_filter(level="warning")
+    assert messages(last_logs(10, str(log_path), match)) == [
+        f"entry {i}" for i in [0, 3, 6, 9, 12, 15, 18]
+    ]
+    match = record_filter(
+        logger_name="flowvcutils.jobrunner", extras={"job.exit_status": "1"}
+    )
+    assert messages(last_logs(10, str(log_path), match)) == [
+        f"entry {i}" for i in [1, 5, 9, 13, 17]
+    ]
+    match = record_filter(since="2023-01-01T00:00:05Z", until="2023-01-01T00:00:07")
+    assert messages(last_logs(10, str(log_path), match)) == [
+        f"entry {i}" for i in [5, 6, 7]
+    ]
+    # the parent logger matches its children
+    assert len(last_logs(100, str(log_path), record_filter(logger_name="flowvc"))) == 0
+    assert (
+        len(last_logs(100, str(log_path), record_filter(logger_name="flowvcutils")))
+        == 20
+    )
+    with pytest.raises(ValueError):
+        record_filter(level="loud")
+
+
+def test_follow_logs(tmp_path, capfd):
+    """New entries are printed, across a rotation and a line written in two parts."""
+    log_path = tmp_path / "flowvcutils.log.jsonl"
+    write_log(log_path, range(3))
+
+    def writer():
+        time.sleep(0.05)
+        with open(log_path, "a") as f:
+            f.write(json.dumps({"message": "entry 3", "level": "INFO"}) + "\n")
+            f.write('{"message": "entry 4", ')
+            f.flush()
+            time.sleep(0.05)
+            f.write('"level": "WARNING"}\n')
+        time.sleep(0.05)
+        os.rename(log_path, f"{log_path}.1")
+        write_log(log_path, [5, 6])
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    follow_logs(
+        str(log_path),
+        record_filter(level="warning"),
+        poll_interval=0.01,
+        idle_timeout=0.3,
+    )
+    thread.join()
+
+    out = capfd.readouterr().out
+    assert "entry 0" not in out
+    assert "entry 3" not in out
+    assert "entry 4" in out
+    assert "entry 6" in out
 
 
 def test_incorrect_config_file():
@@ -69,6 +191,7 @@ def test_logging_integration():
             stack_info=True,
             extra={"test_key": "test_results"},
         )
+    flush_logging()
     root = get_project_root()
     log_file = os.path.join(root, "logs", "flowvcutils.log")
     json_file = os.path.join(root, "logs", "flowvcutils.log.jsonl")
@@ -103,6 +226,89 @@ def test_logging_integration():
     assert found_message_json, "Test message not found in json log file"
 
 
+def read_json_logs():
+    json_file = os.path.join(get_project_root(), "logs", "flowvcutils.log.jsonl")
+    with open(json_file, "r") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def test_settup_logging_is_idempotent():
+    settup_logging()
+    handlers = list(logging.getLogger().handlers)
+    settup_logging()
+    assert logging.getLogger().handlers == handlers
+    queue_handlers = [h for h in handlers if isinstance(h, recordQueueHandler)]
+    assert len(queue_handlers) == 1
+    # the file handlers are only on the listener thread
+    logs_dir = os.path.join(get_project_root(), "logs")
+    assert not any(
+        getattr(h, "baseFilename", "").startswith(logs_dir) for h in handlers
+    )
+
+
+def log_from_worker(unique_id):
+    logging.getLogger("test_worker").info(
+        f"worker {unique_id}", extra={"worker_pid": os.getpid()}
+    )
+    return os.getpid()
+
+
+def test_worker_records_are_written_by_listener():
+    settup_logging()
+    unique_id = str(uuid.uuid4())
+    with worker_logging() as log_queue, ProcessPoolExecutor(
+        max_workers=2,
+        initializer=init_worker_logging,
+        initargs=(log_queue,),
+    ) as pool:
+        pids = set(pool.map(log_from_worker, [unique_id] * 4))
+    logging.getLogger("test_worker").info(f"main {unique_id}")
+    flush_logging()
+
+    entries = [e for e in read_json_logs() if unique_id in e["message"]]
+    assert [e["message"] for e in entries].count(f"worker {unique_id}") == 4
+    assert {e["worker_pid"] for e in entries if "worker_pid" in e} == pids
+    assert entries[-1]["message"] == f"main {unique_id}"
+    # worker records are tagged with the run id of the main process
+    assert {e["run_id"] for e in entries} == {jsonlogger.RUN_ID}
+
+
+def make_record(created, **extra):
+    record = logging.getLogger("test").makeRecord(
+        "test", logging.INFO, __file__, 1, "value %d", (7,), None, extra=extra
+    )
+    record.created = created
+    return record
+
+
+@pytest.mark.parametrize(
+    "created", [0.0, 1.5, 1700000000.0, 1700000000.123456, 1700000000.9999996]
+)
+def test_formatter_timestamp(created):
+    formatter = flowvcutilsJSONFormatter(fmt_keys={"timestamp": "timestamp"})
+    expected = dt.datetime.fromtimestamp(created, tz=dt.timezone.utc).isoformat()
+    # twice, the second time from the cached second
+    for _ in range(2):
+        entry = json.loads(formatter.format(make_record(created)))
+        assert entry["timestamp"] == expected
+
+
+@pytest.mark.parametrize("orjson", [None, jsonlogger.orjson])
+def test_formatter_fields(orjson):
+    formatter = flowvcutilsJSONFormatter(
+        fmt_keys={"level": "levelname", "message": "message", "line": "lineno"}
+    )
+    with patch.object(jsonlogger, "orjson", orjson):
+        plain = json.loads(formatter.format(make_record(1.0)))
+        extra = json.loads(
+            formatter.format(make_record(1.0, job={1: "int key"}, case="a"))
+        )
+    assert list(plain) == ["level", "message", "line", "timestamp"]
+    assert plain["message"] == "value 7"
+    assert extra["job"] == {"1": "int key"}
+    assert extra["case"] == "a"
+
+
 def test_init():
     from flowvcutils import jsonlogger as module
 
@@ -111,3 +317,12 @@ def test_init():
             with patch.object(module.sys, "exit") as mock_exit:
                 module.init()
                 assert mock_exit.call_args[0][0] == 42
+
+
+def test_log_listener_tracks_started():
+    listener = jsonlogger.logListener(queue.Queue(), [], [])
+    assert not listener.started
+    listener.start()
+    assert listener.started
+    listener.stop()
+    assert not listener.started
@@ -0,0 +1,118 @@
+import json
+import pytest
+from flowvcutils.logstats import (
+    aggregate,
+    iter_entries,
+    case_directory,
+    format_table,
+    main,
+    RESERVOIR_SIZE,
+)
+
+
+def stage_entry(stage, duration, path=None, run_id="run-1", **fields):
+    span = dict(fields, stage=stage, duration_s=duration)
+    if path is not None:
+        span["path"] = path
+    return {
+        "message": f"{stage} took {duration}s",
+        "timestamp": "2023-01-01T00:00:00+00:00",
+        "run_id": run_id,
+        "stage": span,
+    }
+
+
+@pytest.fixture
+def log_path(tmp_path):
+    """A log and a rotated backup with stage records of two cases and runs."""
+    path = tmp_path / "flowvcutils.log.jsonl"
+    with open(f"{path}.1", "w") as f:
+        for i in range(10):
+            entry = stage_entry(
+                "read", 0.1 * (i + 1), f"/sweep/case_a/input_vtu/a_{i}.vtu", bytes=100
+            )
+            f.write(json.dumps(entry) + "\n")
+        f.write(json.dumps({"message": "not a stage"}) + "\n")
+    with open(path, "w") as f:
+        for i in range(4):
+            entry = stage_entry(
+                "write",
+                0.5,
+                f"/sweep/case_b/input_bin/b_vel.{i}.bin",
+                run_id="run-2",
+                bytes=1000,
+                failed=i == 3,
+            )
+            f.write(json.dumps(entry) + "\n")
+        f.write("{half a line")
+    return str(path)
+
+
+def test_case_directory():
+    assert case_directory("/sweep/case_a/input_vtu/a_0.vtu") == "/sweep/case_a"
+    assert case_directory("/results/steady_00000.vtu") == "/results"
+
+
+def test_aggregate_by_stage(log_path):
+    stats = aggregate(iter_entries(log_path))
+
+    assert list(stats) == ["read", "write"]
+    read = stats["read"]
+    assert read["count"] == 10
+    assert read["failed"] == 0
+    assert read["total_s"] == pytest.approx(5.5)
+    assert read["p50_s"] == pytest.approx(0.6)
+    assert read["p90_s"] == pytest.approx(1.0)
+    assert read["max_s"] == pytest.approx(1.0)
+    assert read["bytes_per_s"] == pytest.approx(1000 / 5.5)
+    assert stats["write"]["failed"] == 1
+    assert stats["write"]["bytes_per_s"] == pytest.approx(2000)
+
+
+def test_aggregate_by_case_and_run(log_path):
+    by_case = aggregate(iter_entries(log_path), by="case")
+    assert {key: s["count"] for key, s in by_case.items()} == {
+        "/sweep/case_a": 10,
+        "/sweep/case_b": 4,
+    }
+    by_run = aggregate(iter_entries(log_path), by="run", stage="write")
+    assert list(by_run) == ["run-2"]
+    with pytest.raises(ValueError):
+        aggregate([], by="frame")
+
+
+def test_aggregate_by_case_mesh_stages():
+    """Mesh stages are grouped by the case of the input they were built from."""
+    path = "/sweep/case_a/input_vtu/a_0.vtu"
+    entries = [
+        stage_entry("read", 0.1, path),
+        stage_entry("coordinates", 0.2, path),
+        stage_entry("connectivity", 0.3, path),
+        stage_entry("adjacency", 0.4, path),
+    ]
+    by_case = aggregate(entries, by="case")
+    assert list(by_case) == ["/sweep/case_a"]
+    assert by_case["/sweep/case_a"]["count"] == 4
+    assert by_case["/sweep/case_a"]["total_s"] == pytest.approx(1.0)
+
+
+def test_aggregate_samples_large_groups():
+    """Percentiles come from a bounded sample, totals stay exact."""
+    n = RESERVOIR_SIZE * 5
+    entries = (stage_entry("convert", i / n) for i in range(n))
+    stats = aggregate(entries)["convert"]
+    assert stats["count"] == n
+    assert stats["max_s"] == pytest.approx((n - 1) / n)
+    assert stats["p50_s"] == pytest.approx(0.5, abs=0.05)
+    assert stats["p90_s"] == pytest.approx(0.9, abs=0.05)
+
+
+def test_main(log_path, capsys):
+    stats = main(log_path, as_json=True)
+    assert json.loads(capsys.readouterr().out) == stats
+
+    main(log_path)
+    table = capsys.readouterr().out.splitlines()
+    assert table[0].split()[:3] == ["stage", "count", "failed"]
+    assert table[1].split()[:3] == ["read", "10", "0"]
+    assert table == format_table(stats, "stage").splitlines()
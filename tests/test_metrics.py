@@ -0,0 +1,106 @@
+import os
+import time
+import pytest
+from flowvcutils import metrics
+from flowvcutils.metrics import (
+    textfileMetrics,
+    start_metrics,
+    stop_metrics,
+    track,
+    plan,
+    track_item,
+    item_started,
+    item_finished,
+    METRICS,
+)
+
+
+def parse_prom(path, labels='{command="vtu2bin",item="frame"}'):
+    """{metric name: value} of a .prom file, checking every line parses."""
+    values = {}
+    with open(path) as f:
+        for line in f:
+            if line.startswith("#"):
+                continue
+            name, value = line.rsplit(" ", 1)
+            if name.endswith(labels):
+                values[name[: -len(labels)]] = float(value)
+    return values
+
+
+@pytest.fixture
+def prom_file(tmp_path):
+    path = tmp_path / "flowvcutils.prom"
+    start_metrics(str(path), interval=3600)
+    yield path
+    stop_metrics()
+
+
+def test_metrics_progress(prom_file):
+    track("vtu2bin", "frame", 5, workers=2)
+    with track_item() as item:
+        item["bytes_written"] = 100
+    with pytest.raises(ValueError):
+        with track_item():
+            raise ValueError("unreadable frame")
+    item_started()
+    stop_metrics()
+
+    values = parse_prom(prom_file)
+    assert len(values) == len(METRICS)
+    assert values["flowvcutils_items"] == 5
+    assert values["flowvcutils_items_done"] == 2
+    assert values["flowvcutils_items_remaining"] == 3
+    assert values["flowvcutils_items_failed_total"] == 1
+    assert values["flowvcutils_bytes_written_total"] == 100
+    assert values["flowvcutils_workers_busy"] == 1
+    assert values["flowvcutils_worker_utilization"] == 0.5
+    assert not os.path.exists(f"{prom_file}.tmp")
+
+
+def test_metrics_written_every_interval(tmp_path):
+    path = tmp_path / "flowvcutils.prom"
+    collector = start_metrics(str(path), interval=0.01)
+    try:
+        track("vtu2bin", "frame", 3)
+        for _ in range(3):
+            item_finished(bytes_written=10)
+        deadline = time.monotonic() + 5
+        while parse_prom(path).get("flowvcutils_items_done") != 3:
+            assert time.monotonic() < deadline, "metrics file was not rewritten"
+            time.sleep(0.01)
+    finally:
+        stop_metrics()
+    assert collector._thread is not None and not collector._thread.is_alive()
+
+
+def test_metrics_plan(prom_file):
+    """Items planned up front are not counted again when their step tracks them."""
+    plan("vtu2bin", "frame", 6, workers=2)
+    track("vtu2bin", "frame", 3)
+    for _ in range(3):
+        item_finished()
+    assert metrics._collector.values()["items_remaining"] == 3
+    track("vtu2bin", "frame", 3)
+    track("vtu2bin", "frame", 1)
+    stop_metrics()
+
+    values = parse_prom(prom_file)
+    assert values["flowvcutils_items"] == 7
+
+
+def test_metrics_rates():
+    collector = textfileMetrics("unused.prom")
+    collector.track("vtu2bin", "frame", 10)
+    collector._last = (time.monotonic() - 2.0, 0, 0)
+    collector.item_finished(bytes_written=400)
+    values = collector.values()
+    assert values["bytes_per_second"] == pytest.approx(200, rel=0.05)
+    assert values["items_per_second"] == pytest.approx(0.5, rel=0.05)
+
+
+def test_metrics_off():
+    assert metrics._collector is None
+    track("vtu2bin", "frame", 3)
+    with track_item():
+        pass
@@ -0,0 +1,133 @@
+import os
+import json
+import pstats
+import logging
+import threading
+import pytest
+from flowvcutils import perf
+from flowvcutils.perf import (
+    stage_span,
+    peak_rss_bytes,
+    trace_span,
+    start_trace,
+    stop_trace,
+    start_profile,
+    stop_profile,
+    start_memory_profile,
+    stop_memory_profile,
+)
+
+
+def stage_records(caplog):
+    return [record.stage for record in caplog.records if hasattr(record, "stage")]
+
+
+def test_stage_span(caplog):
+    with caplog.at_level(logging.DEBUG):
+        with stage_span("write", path="a.bin") as span:
+            span["bytes"] = 1000
+            span["nodes"] = 0
+
+    (span,) = stage_records(caplog)
+    assert span["stage"] == "write"
+    assert span["path"] == "a.bin"
+    assert span["duration_s"] > 0
+    assert span["bytes_per_s"] == pytest.approx(1000 / span["duration_s"])
+    # no throughput for a stage that processed nothing
+    assert "nodes_per_s" not in span
+    assert "elements_per_s" not in span
+    assert "failed" not in span
+    assert span["peak_rss_bytes"] == peak_rss_bytes()
+
+
+def test_stage_span_failed(caplog):
+    with caplog.at_level(logging.DEBUG):
+        with pytest.raises(ValueError):
+            with stage_span("read"):
+                raise ValueError("unreadable")
+    assert stage_records(caplog)[0]["failed"] is True
+
+
+def test_stage_span_disabled(caplog):
+    with caplog.at_level(logging.INFO):
+        with stage_span("read"):
+            pass
+    assert stage_records(caplog) == []
+
+
+def load_trace(path):
+    with open(path) as f:
+        return json.load(f)["traceEvents"]
+
+
+def test_trace(tmp_path):
+    """Spans from several threads are saved as complete events."""
+    trace_file = tmp_path / "trace.json"
+    start_trace(str(trace_file))
+    # keep the threads alive together so none reuses the id of another
+    all_started = threading.Barrier(3)
+
+    def job(i):
+        all_started.wait()
+        with trace_span("job", case=i):
+            with stage_span("read"):
+                pass
+
+    threads = [threading.Thread(target=job, args=(i,)) for i in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stop_trace()
+
+    events = load_trace(trace_file)
+    spans = [e for e in events if e["ph"] == "X"]
+    assert sorted(e["args"]["case"] for e in spans if e["name"] == "job") == [0, 1, 2]
+    assert len([e for e in spans if e["cat"] == "stage"]) == 3
+    assert len({e["tid"] for e in spans}) == 3
+    thread_names = [e for e in events if e["name"] == "thread_name"]
+    assert len(thread_names) == 3
+    for event in spans:
+        assert event["dur"] >= 0
+        assert event["pid"] == os.getpid()
+    assert perf._tracer is None
+
+
+def test_trace_off_records_nothing(tmp_path):
+    with trace_span("job"):
+        pass
+    stop_trace()
+    assert os.listdir(tmp_path) == []
+
+
+def busy_function():
+    return sum(i * i for i in range(10000))
+
+
+def test_profile(tmp_path):
+    start_profile("vtu2bin")
+    busy_function()
+    pstats_path, report_path = stop_profile(str(tmp_path))
+
+    assert os.path.basename(pstats_path).startswith("profile-vtu2bin-")
+    functions = [name for _, _, name in pstats.Stats(pstats_path).stats]
+    assert "busy_function" in functions
+    with open(report_path) as f:
+        report = f.read()
+    assert "by cumulative" in report
+    assert "busy_function" in report
+    assert stop_profile(str(tmp_path)) is None
+
+
+def test_memory_profile(tmp_path):
+    start_memory_profile("vtu2bin")
+    kept = [bytearray(1024) for _ in range(1000)]
+    report_path = stop_memory_profile(str(tmp_path))
+
+    assert len(kept) == 1000
+    assert report_path.endswith(".memory.txt")
+    with open(report_path) as f:
+        lines = f.read().splitlines()
+    assert lines[0].startswith("Traced memory:")
+    # the list above is the biggest allocation
+    assert "test_perf.py" in lines[2]
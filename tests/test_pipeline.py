@@ -0,0 +1,231 @@
+import os
+import sys
+import json
+import time
+import vtk
+import pytest
+import numpy as np
+from vtk.util import numpy_support
+from flowvcutils import pipeline
+from flowvcutils.pipeline import (
+    fingerprint,
+    run_graph,
+    discover_cases,
+    pipelineCase,
+    STATE_FILE_NAME,
+)
+
+# A stand-in flowVC that writes its FTLE output, cases named bad_* fail.
+FAKE_FLOWVC = """
+import os
+import sys
+in_file = sys.argv[1]
+params = {}
+with open(in_file) as f:
+    for line in f:
+        key, value = line.split("=", 1)
+        params[key.strip().lower()] = value.strip()
+output = os.path.join(params["path_output"], params["ftle_outfileprefix"] + ".0.bin")
+with open(output, "w") as f:
+    f.write("ftle")
+sys.exit(1 if params["data_infileprefix"].startswith("bad") else 0)
+"""
+
+
+def write_frame(file_path, scale):
+    """Write a single tetrahedron with a velocity of scale at every node."""
+    points = vtk.vtkPoints()
+    for point in [(0, 0, 0), (1, 0, 0), (0, 1, 0), (0, 0, 1)]:
+        points.InsertNextPoint(point)
+    grid = vtk.vtkUnstructuredGrid()
+    grid.SetPoints(points)
+    grid.InsertNextCell(vtk.VTK_TETRA, 4, [0, 1, 2, 3])
+    velocity = numpy_support.numpy_to_vtk(np.full((4, 3), float(scale)), deep=True)
+    velocity.SetName("velocity")
+    grid.GetPointData().AddArray(velocity)
+    writer = vtk.vtkXMLUnstructuredGridWriter()
+    writer.SetFileName(str(file_path))
+    writer.SetInputData(grid)
+    writer.Write()
+
+
+@pytest.fixture
+def fake_flowvc(tmp_path):
+    script = tmp_path / "fake_flowvc.py"
+    script.write_text(FAKE_FLOWVC)
+    return f'"{sys.executable}" "{script}"'
+
+
+@pytest.fixture
+def cases(tmp_path):
+    """Two cases with raw svpost output all_results_00000.vtu ... 00100.vtu."""
+    directory = tmp_path / "cases"
+    for case in ["good_", "bad_"]:
+        (directory / case / "input_vtu").mkdir(parents=True)
+        for number in [0, 50, 100]:
+            write_frame(
+                directory / case / "input_vtu" / f"all_results_{number:05d}.vtu",
+                number,
+            )
+    (directory / "not_a_case").mkdir()
+    return str(directory)
+
+
+def statuses(summary):
+    return {(job["case"], job["stage"]): job["status"] for job in summary["jobs"]}
+
+
+def test_fingerprint(tmp_path):
+    path = tmp_path / "a.bin"
+    path.write_text("data")
+    first = fingerprint([str(path)], str(tmp_path), {"start": 0})
+
+    assert fingerprint([str(path)], str(tmp_path), {"start": 0}) == first
+    assert fingerprint([str(path)], str(tmp_path), {"start": 50}) != first
+    os.utime(path, ns=(0, 0))
+    assert fingerprint([str(path)], str(tmp_path), {"start": 0}) != first
+    missing = fingerprint([str(tmp_path / "b.bin")], str(tmp_path))
+    assert missing != fingerprint([], str(tmp_path))
+
+
+def test_run_graph_blocks_downstream():
+    """A failed task blocks the tasks after it, independent tasks still run."""
+    tasks = {"a": [], "b": ["a"], "c": ["b"], "d": ["a"], "e": []}
+    ran = []
+
+    def run(key):
+        ran.append(key)
+        return {"status": "failed" if key == "b" else "ran"}
+
+    results = run_graph(tasks, run, max_jobs=2)
+
+    assert {key: result["status"] for key, result in results.items()} == {
+        "a": "ran",
+        "b": "failed",
+        "c": "blocked",
+        "d": "ran",
+        "e": "ran",
+    }
+    assert "c" not in ran
+    assert ran.index("a") < ran.index("b")
+
+
+def test_run_graph_runs_independent_tasks_at_once():
+    tasks = {"a": [], "b": [], "c": ["a", "b"]}
+    running = []
+    peak = [0]
+
+    def run(key):
+        running.append(key)
+        peak[0] = max(peak[0], len(running))
+        time.sleep(0.05)
+        running.remove(key)
+        return {"status": "ran"}
+
+    run_graph(tasks, run, max_jobs=2)
+    assert peak[0] == 2
+
+
+def test_run_graph_cycle():
+    with pytest.raises(ValueError):
+        run_graph({"a": ["b"], "b": ["a"]}, lambda key: {"status": "ran"})
+    with pytest.raises(ValueError):
+        run_graph({"a": ["missing"]}, lambda key: {"status": "ran"})
+
+
+def test_discover_cases(cases):
+    assert discover_cases(cases) == [
+        os.path.join(cases, "bad_"),
+        os.path.join(cases, "good_"),
+    ]
+    good = os.path.join(cases, "good_")
+    assert discover_cases(good) == [good]
+
+
+def test_pipeline(cases, fake_flowvc):
+    summary = pipeline.main(
+        cases, 0, 100, max_jobs=4, flowvc_exe=fake_flowvc, increment=50
+    )
+
+    good = os.path.join(cases, "good_")
+    assert sorted(os.listdir(os.path.join(good, "input_vtu"))) == [
+        "good_00000.vtu",
+        "good_00050.vtu",
+        "good_00100.vtu",
+    ]
+    input_bin = sorted(os.listdir(os.path.join(good, "input_bin")))
+    assert "good.in" in input_bin
+    assert "good_vel.100.bin" in input_bin
+    assert os.listdir(os.path.join(good, "output_bin")) == ["good_backward.0.bin"]
+    assert statuses(summary) == {
+        ("bad_", "rename"): "ran",
+        ("bad_", "vtu2bin"): "ran",
+        ("bad_", "inigenerator"): "ran",
+        ("bad_", "flowvc"): "failed",
+        ("good_", "rename"): "ran",
+        ("good_", "vtu2bin"): "ran",
+        ("good_", "inigenerator"): "ran",
+        ("good_", "flowvc"): "ran",
+    }
+    assert summary["n_failed"] == 1
+    with open(os.path.join(cases, pipeline.SUMMARY_FILE_NAME)) as f:
+        assert json.load(f) == summary
+
+    # nothing changed, only the failed stage runs again
+    summary = pipeline.main(cases, 0, 100, flowvc_exe=fake_flowvc, increment=50)
+    assert [job["status"] for job in summary["jobs"]] == [
+        "up_to_date",
+        "up_to_date",
+        "up_to_date",
+        "failed",
+        "up_to_date",
+        "up_to_date",
+        "up_to_date",
+        "up_to_date",
+    ]
+
+
+def test_pipeline_reruns_changed_stages(cases, fake_flowvc):
+    case = pipelineCase(os.path.join(cases, "good_"), 0, 100, flowvc_exe=fake_flowvc)
+    pipeline.run_pipeline([case])
+
+    write_frame(case.frame_path(50), 7)
+    records = pipeline.run_pipeline([case])
+    assert [record["status"] for record in records] == [
+        "ran",  # the new frame is one of the inputs of rename
+        "ran",
+        "up_to_date",  # only reads the first frame
+        "ran",
+    ]
+    with open(case.state_path) as f:
+        assert sorted(json.load(f)) == ["flowvc", "inigenerator", "rename", "vtu2bin"]
+
+    # a deleted output is rebuilt
+    os.remove(os.path.join(case.bin_dir, "good_vel.50.bin"))
+    assert not case.is_up_to_date("vtu2bin")
+    ftle = os.path.join(cases, "good_", "output_bin", "good_backward.0.bin")
+    assert case.flowvc_outputs() == [ftle]
+    os.remove(ftle)
+    assert not case.is_up_to_date("flowvc")
+
+
+def test_pipeline_failure_blocks_case(cases, fake_flowvc):
+    """A case without frames fails vtu2bin, its flowvc stage is not run."""
+    empty = os.path.join(cases, "empty_")
+    os.makedirs(os.path.join(empty, "input_vtu"))
+    summary = pipeline.main(
+        cases, 0, 100, cases=["empty_", "good_"], flowvc_exe=fake_flowvc, max_jobs=2
+    )
+    assert statuses(summary) == {
+        ("empty_", "rename"): "ran",
+        ("empty_", "vtu2bin"): "failed",
+        ("empty_", "inigenerator"): "failed",
+        ("empty_", "flowvc"): "blocked",
+        ("good_", "rename"): "ran",
+        ("good_", "vtu2bin"): "ran",
+        ("good_", "inigenerator"): "ran",
+        ("good_", "flowvc"): "ran",
+    }
+    assert summary["n_failed"] == 3
+    with open(os.path.join(empty, STATE_FILE_NAME)) as f:
+        assert list(json.load(f)) == ["rename"]
@@ -0,0 +1,145 @@
+import os
+import socket
+import threading
+import vtk
+import pytest
+import numpy as np
+from vtk.util import numpy_support
+from flowvcutils import service
+from flowvcutils.service import call, serve, is_running
+
+pytestmark = pytest.mark.skipif(
+    not hasattr(socket, "AF_UNIX"), reason="needs Unix domain sockets"
+)
+
+
+def write_frame(file_path, scale):
+    """Write a single tetrahedron with a velocity of scale at every node."""
+    points = vtk.vtkPoints()
+    for point in [(0, 0, 0), (1, 0, 0), (0, 1, 0), (0, 0, 1)]:
+        points.InsertNextPoint(point)
+    grid = vtk.vtkUnstructuredGrid()
+    grid.SetPoints(points)
+    grid.InsertNextCell(vtk.VTK_TETRA, 4, [0, 1, 2, 3])
+    velocity = numpy_support.numpy_to_vtk(np.full((4, 3), float(scale)), deep=True)
+    velocity.SetName("velocity")
+    grid.GetPointData().AddArray(velocity)
+    writer = vtk.vtkXMLUnstructuredGridWriter()
+    writer.SetFileName(str(file_path))
+    writer.SetInputData(grid)
+    writer.Write()
+
+
+@pytest.fixture
+def case(tmp_path, monkeypatch):
+    """A case directory with three frames, used as the current directory."""
+    (tmp_path / "input_vtu").mkdir()
+    (tmp_path / "input_bin").mkdir()
+    for number in [0, 50, 100]:
+        write_frame(tmp_path / "input_vtu" / f"case_{number:05d}.vtu", number)
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def convert(socket_path, stop=100):
+    # relative paths, resolved from the directory of the caller
+    return call(
+        "process_folder",
+        socket_path=socket_path,
+        root="input_vtu",
+        output="input_bin",
+        file_name="case_",
+        extension=".vtu",
+        start=0,
+        stop=stop,
+        increment=50,
+        num_digits=5,
+        field_name="velocity",
+        max_workers=2,
+    )
+
+
+def test_default_socket_path(monkeypatch):
+    monkeypatch.setenv(service.SOCKET_ENV_VAR, "/run/flowvcutils.sock")
+    assert service.default_socket_path() == "/run/flowvcutils.sock"
+    monkeypatch.delenv(service.SOCKET_ENV_VAR)
+    monkeypatch.setenv("XDG_RUNTIME_DIR", "/run/user/1000")
+    assert service.default_socket_path() == "/run/user/1000/flowvcutils.sock"
+    monkeypatch.delenv("XDG_RUNTIME_DIR")
+    assert service.default_socket_path().endswith(".sock")
+
+
+def test_call_without_service(case):
+    """With no service running the job runs in this process."""
+    socket_path = str(case / "missing.sock")
+    assert not is_running(socket_path)
+    convert(socket_path)
+    assert os.path.isfile(case / "input_bin" / "case_vel.100.bin")
+
+
+@pytest.fixture
+def running_service(case):
+    socket_path = str(case / "service.sock")
+    started = threading.Event()
+    servers = []
+
+    def ready(server):
+        servers.append(server)
+        started.set()
+
+    thread = threading.Thread(
+        target=serve, args=(socket_path,), kwargs={"workers": 2, "ready": ready}
+    )
+    thread.start()
+    assert started.wait(60)
+    yield socket_path
+    servers[0].shutdown()
+    thread.join(60)
+    assert not os.path.exists(socket_path)
+
+
+def test_service_runs_jobs(case, running_service, caplog):
+    assert is_running(running_service)
+    assert service.owned_by_user(running_service)
+    convert(running_service)
+    assert "max_workers=2 is ignored" in caplog.text
+    assert sorted(os.listdir(case / "input_bin")) == [
+        "case_adjacency.bin",
+        "case_connectivity.bin",
+        "case_coordinates.bin",
+        "case_vel.0.bin",
+        "case_vel.100.bin",
+        "case_vel.50.bin",
+    ]
+
+
+def test_service_job_failure(case, running_service):
+    """A failed job is raised in the caller, the service keeps running."""
+    with pytest.raises(RuntimeError, match="FileNotFoundError|No such file"):
+        call(
+            "inigenerator",
+            str(case / "not_a_case"),
+            True,
+            0.001,
+            "backward",
+            socket_path=running_service,
+        )
+    assert is_running(running_service)
+
+
+def test_service_of_another_user(case, running_service, monkeypatch, caplog):
+    """A job is not sent to a socket another user owns."""
+    monkeypatch.setattr(service, "owned_by_user", lambda socket_path: False)
+    monkeypatch.setattr(service, "run_job", lambda job, args, kwargs: "in process")
+    assert convert(running_service) == "in process"
+    assert "belongs to another user" in caplog.text
+
+
+def test_stale_socket(tmp_path):
+    """A socket file left behind by a stopped service is not a running service."""
+    socket_path = str(tmp_path / "stale.sock")
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(socket_path)
+    server.close()
+    assert os.path.exists(socket_path)
+    assert not is_running(socket_path)
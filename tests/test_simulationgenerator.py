@@ -1,8 +1,11 @@
 import os
+import sys
+import json
 import pytest
 from unittest.mock import patch
 from tempfile import TemporaryDirectory
 from flowvcutils import simulationgenerator
+from flowvcutils.utils import file_sha256
 
 
 @pytest.fixture
@@ -66,6 +69,284 @@ def test_create_flow_file(setup_test_environment):
     assert actual == expected
 
 
+def stub_svpre(tmp_path, exit_status=0):
+    """A stand-in svpre command that reads catheter.flow from its case dir."""
+    script = tmp_path / "svpre_stub.py"
+    script.write_text(
+        "import os, sys\n"
+        "print('svpre ' + os.path.basename(os.getcwd()))\n"
+        "open('catheter.flow').read()\n"
+        f"sys.exit({exit_status})\n"
+    )
+    return f'"{sys.executable}" "{script}"'
+
+
+@pytest.fixture
+def setup_many_cases(setup_test_environment):
+    inlet_velocity_dir = os.path.join(setup_test_environment, "inlet_velocity")
+    for i in range(4):
+        with open(os.path.join(inlet_velocity_dir, f"case_{i}.txt"), "w") as f:
+            f.write(f"0.0 {i}\n")
+    return setup_test_environment
+
+
+def test_create_directories_parallel(setup_many_cases, tmp_path):
+    """Test that each case gets its own svpre log and a summary row."""
+    base_dir = setup_many_cases
+    records = simulationgenerator.create_directories(
+        base_dir, svpre_exe=stub_svpre(tmp_path), max_jobs=3
+    )
+
+    cases = ["case_0", "case_1", "case_2", "case_3", "steady_"]
+    assert [record["case"] for record in records] == cases
+    assert all(record["exit_status"] == 0 for record in records)
+    for case in cases:
+        with open(
+            os.path.join(base_dir, case, simulationgenerator.SVPRE_LOG_NAME)
+        ) as f:
+            assert f.read().strip() == f"svpre {case}"
+
+    with open(os.path.join(base_dir, simulationgenerator.SUMMARY_FILE_NAME)) as f:
+        summary = f.read().splitlines()
+    assert summary[0].split() == [
+        "case",
+        "exit_status",
+        "skipped",
+        "wall_time_s",
+        "log",
+    ]
+    assert [line.split()[:3] for line in summary[1:]] == [
+        [case, "0", "False"] for case in cases
+    ]
+
+
+def test_create_directories_records_failures(setup_many_cases, tmp_path):
+    """Test that a non zero svpre exit is recorded rather than ignored."""
+    base_dir = setup_many_cases
+    records = simulationgenerator.create_directories(
+        base_dir, svpre_exe=stub_svpre(tmp_path, exit_status=2), max_jobs=2
+    )
+    assert [record["exit_status"] for record in records] == [2] * 5
+
+
+def test_run_command_log_file(tmp_path):
+    log_file = tmp_path / "command.log"
+    exit_status = simulationgenerator.run_command(
+        f'"{sys.executable}" -c "print(1); raise SystemExit(3)"',
+        str(tmp_path),
+        log_file=str(log_file),
+    )
+    assert exit_status == 3
+    assert log_file.read_text().strip() == "1"
+
+
+def test_create_directories_link(setup_test_environment, tmp_path):
+    """Test that link mode shares the mesh files and copies everything else."""
+    base_dir = setup_test_environment
+    generic_dir = os.path.join(base_dir, "generic_file")
+    os.makedirs(os.path.join(generic_dir, "mesh-complete"))
+    files = {
+        "mesh-complete/mesh-complete.mesh.vtu": "mesh",
+        "catheter.flow": "generic flow",
+        "numstart.dat": "0",
+        "generic_file.svpre": "svpre",
+    }
+    for name, content in files.items():
+        with open(os.path.join(generic_dir, name), "w") as f:
+            f.write(content)
+
+    simulationgenerator.create_directories(
+        base_dir, svpre_exe=stub_svpre(tmp_path), materialize="link"
+    )
+
+    case_dir = os.path.join(base_dir, "steady_")
+    for name in ["mesh-complete/mesh-complete.mesh.vtu"]:
+        case_file = os.path.join(case_dir, name)
+        generic_file = os.path.join(generic_dir, name)
+        with open(case_file) as f:
+            assert f.read() == files[name]
+        # a reflink is a separate file, a hardlink or symlink is the same file
+        assert os.path.samefile(case_file, generic_file) or not os.path.islink(
+            case_file
+        )
+    for name in ["catheter.flow", "numstart.dat", "generic_file.svpre"]:
+        case_file = os.path.join(case_dir, name)
+        assert not os.path.islink(case_file)
+        assert not os.path.samefile(case_file, os.path.join(generic_dir, name))
+    with open(os.path.join(generic_dir, "catheter.flow")) as f:
+        assert f.read() == "generic flow"
+
+
+def test_main_link(setup_test_environment, tmp_path):
+    """main passes materialize on, the case mesh is a hardlink of generic_file."""
+    base_dir = setup_test_environment
+    mesh = os.path.join(base_dir, "generic_file", "mesh.vtu")
+    with open(mesh, "w") as f:
+        f.write("mesh")
+
+    with patch("flowvcutils.simulationgenerator.reflink", side_effect=OSError):
+        simulationgenerator.main(
+            base_dir, exclude=None, svpre_exe=stub_svpre(tmp_path), materialize="link"
+        )
+
+    assert os.path.samefile(os.path.join(base_dir, "steady_", "mesh.vtu"), mesh)
+
+
+@pytest.mark.parametrize(
+    "fail_reflink, fail_hardlink, expected",
+    [
+        (False, False, "reflink"),
+        (True, False, "hardlink"),
+        (True, True, "symlink"),
+    ],
+)
+def test_link_file_fallback(tmp_path, fail_reflink, fail_hardlink, expected):
+    source = tmp_path / "mesh.vtu"
+    source.write_text("mesh")
+    destination = tmp_path / "case_mesh.vtu"
+    with patch(
+        "flowvcutils.simulationgenerator.reflink",
+        side_effect=OSError if fail_reflink else None,
+    ), patch(
+        "flowvcutils.simulationgenerator.os.link",
+        side_effect=OSError if fail_hardlink else None,
+    ), patch(
+        "flowvcutils.simulationgenerator.os.symlink"
+    ):
+        assert simulationgenerator.link_file(str(source), str(destination)) == expected
+
+
+@pytest.mark.parametrize(
+    "name", ["numstart.dat", "bct.dat", "bct.vtp", "generic_file.svpre"]
+)
+def test_link_file_copies_case_files(tmp_path, name):
+    source = tmp_path / name
+    source.write_text("0")
+    destination = tmp_path / f"case_{name}"
+    assert simulationgenerator.link_file(str(source), str(destination)) == "copy"
+    assert not os.path.samefile(source, destination)
+
+
+def test_is_mesh_input():
+    assert simulationgenerator.is_mesh_input("generic_file/mesh.vtu")
+    assert simulationgenerator.is_mesh_input(
+        os.path.join("generic_file", "mesh-complete", "mesh-surfaces", "wall.vtp")
+    )
+    assert not simulationgenerator.is_mesh_input("generic_file/bct.vtp")
+    assert not simulationgenerator.is_mesh_input("generic_file/geombc.dat.1")
+
+
+def test_link_mode_svpre_outputs_stay_per_case(setup_many_cases, tmp_path):
+    """svpre rewriting bct.dat in one case changes no other case nor generic_file."""
+    base_dir = setup_many_cases
+    generic_dir = os.path.join(base_dir, "generic_file")
+    for name in ["bct.dat", "bct.vtp", "mesh.vtu"]:
+        with open(os.path.join(generic_dir, name), "w") as f:
+            f.write("generic")
+    script = tmp_path / "svpre_bct.py"
+    script.write_text(
+        "import os\n"
+        "with open('bct.dat', 'a') as f:\n"
+        "    f.write(' ' + os.path.basename(os.getcwd()))\n"
+    )
+    with patch("flowvcutils.simulationgenerator.reflink", side_effect=OSError):
+        simulationgenerator.create_directories(
+            base_dir, svpre_exe=f'"{sys.executable}" "{script}"', materialize="link"
+        )
+
+    with open(os.path.join(generic_dir, "bct.dat")) as f:
+        assert f.read() == "generic"
+    for case in ["case_0", "case_1", "steady_"]:
+        with open(os.path.join(base_dir, case, "bct.dat")) as f:
+            assert f.read() == f"generic {case}"
+    # the mesh is still shared
+    assert os.path.samefile(
+        os.path.join(base_dir, "case_0", "mesh.vtu"),
+        os.path.join(generic_dir, "mesh.vtu"),
+    )
+
+
+def test_rerun_skips_unchanged_cases(setup_many_cases, tmp_path):
+    """Test that a rerun leaves complete cases untouched and redoes changed ones."""
+    base_dir = setup_many_cases
+    svpre_exe = stub_svpre(tmp_path)
+    simulationgenerator.create_directories(base_dir, svpre_exe=svpre_exe)
+    result_file = os.path.join(base_dir, "case_0", "restart.10.1")
+    with open(result_file, "w") as f:
+        f.write("solver output")
+    with open(os.path.join(base_dir, "case_0", "numstart.dat"), "w") as f:
+        f.write("10")
+    with open(os.path.join(base_dir, "case_1", "numstart.dat"), "w") as f:
+        f.write("10")
+    with open(os.path.join(base_dir, "inlet_velocity", "case_1.txt"), "w") as f:
+        f.write("0.0 changed\n")
+
+    records = simulationgenerator.create_directories(base_dir, svpre_exe=svpre_exe)
+
+    assert [record["skipped"] for record in records] == [
+        True,
+        False,
+        True,
+        True,
+        True,
+    ]
+    with open(os.path.join(base_dir, "case_0", "numstart.dat")) as f:
+        assert f.read() == "10"
+    assert os.path.isfile(result_file)
+    with open(os.path.join(base_dir, "case_1", "catheter.flow")) as f:
+        assert f.read() == "0.0 changed\n"
+    with open(os.path.join(base_dir, "case_1", "numstart.dat")) as f:
+        assert f.read() == "0"
+
+    manifest_path = os.path.join(base_dir, simulationgenerator.MANIFEST_FILE_NAME)
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    assert manifest["cases"]["case_1"]["exit_status"] == 0
+    assert manifest["cases"]["case_1"]["inlet_sha256"] == file_sha256(
+        os.path.join(base_dir, "inlet_velocity", "case_1.txt")
+    )
+
+
+def test_rerun_after_generic_change(setup_many_cases, tmp_path):
+    """Test that changing generic_file redoes every case in place."""
+    base_dir = setup_many_cases
+    svpre_exe = stub_svpre(tmp_path)
+    simulationgenerator.create_directories(base_dir, svpre_exe=svpre_exe)
+    with open(os.path.join(base_dir, "generic_file", "mesh.vtu"), "w") as f:
+        f.write("new mesh")
+
+    records = simulationgenerator.create_directories(
+        base_dir, svpre_exe=svpre_exe, materialize="link"
+    )
+
+    assert not any(record["skipped"] for record in records)
+    assert os.path.isfile(os.path.join(base_dir, "case_2", "mesh.vtu"))
+
+
+def test_rerun_retries_failed_svpre(setup_many_cases, tmp_path):
+    base_dir = setup_many_cases
+    simulationgenerator.create_directories(
+        base_dir, svpre_exe=stub_svpre(tmp_path, exit_status=1)
+    )
+    records = simulationgenerator.create_directories(
+        base_dir, svpre_exe=stub_svpre(tmp_path)
+    )
+    assert [record["skipped"] for record in records] == [False] * 5
+    assert [record["exit_status"] for record in records] == [0] * 5
+
+
+def test_generic_fingerprint_uses_cached_stats(setup_test_environment):
+    base_dir = setup_test_environment
+    sha, stats = simulationgenerator.generic_fingerprint(base_dir)
+    with patch("flowvcutils.simulationgenerator.update_hash") as mock_hash:
+        cached = {"sha256": sha, "stats": stats}
+        assert simulationgenerator.generic_fingerprint(base_dir, cached) == (
+            sha,
+            stats,
+        )
+        mock_hash.assert_not_called()
+
+
 @patch("flowvcutils.simulationgenerator.subprocess.run")
 def test_run_command(mock_run):
     simulationgenerator.run_command("echo test", "/path/to/cwd")
@@ -0,0 +1,158 @@
+import os
+import sys
+import json
+import time
+import threading
+import pytest
+from flowvcutils import solverscheduler
+from flowvcutils.solverscheduler import (
+    discover_cases,
+    read_numstart,
+    build_command,
+    run_case,
+    schedule,
+)
+
+# A stand-in for mpiexec + svsolver. It restarts from numstart.dat, a case
+# with a crash.txt file fails once at step 5 as if a node went down.
+DUMMY_SOLVER = """
+import os
+import sys
+ranks = sys.argv[1]
+with open("numstart.dat") as f:
+    numstart = int(f.read())
+print(f"solver on {ranks} ranks from step {numstart}")
+if os.path.isfile("crash.txt") and numstart == 0:
+    with open("numstart.dat", "w") as f:
+        f.write("5")
+    sys.exit(1)
+with open("numstart.dat", "w") as f:
+    f.write("10")
+"""
+
+
+@pytest.fixture
+def solver_command(tmp_path):
+    script = tmp_path / "dummy_solver.py"
+    script.write_text(DUMMY_SOLVER)
+    return f'"{sys.executable}" "{script}" {{ranks}}'
+
+
+@pytest.fixture
+def base_dir(tmp_path):
+    """A simulationgenerator directory with three cases, case_b crashes once."""
+    base = tmp_path / "simulations"
+    (base / "generic_file").mkdir(parents=True)
+    (base / "generic_file.sjb").write_text("")
+    for case in ["case_a", "case_b", "case_c"]:
+        (base / case).mkdir()
+        (base / case / "numstart.dat").write_text("0")
+        (base / f"{case}.sjb").write_text("")
+    (base / "case_b" / "crash.txt").write_text("")
+    # a directory without a .sjb is not a case
+    (base / "inlet_velocity").mkdir()
+    return str(base)
+
+
+def test_discover_cases(base_dir):
+    assert discover_cases(base_dir) == ["case_a", "case_b", "case_c"]
+
+
+def test_read_numstart(tmp_path):
+    assert read_numstart(str(tmp_path)) is None
+    (tmp_path / "numstart.dat").write_text("120\n")
+    assert read_numstart(str(tmp_path)) == 120
+
+
+def test_build_command():
+    assert build_command("mpiexec -np {ranks} svsolver {case}", 4, "a", "/a") == [
+        "mpiexec",
+        "-np",
+        "4",
+        "svsolver",
+        "a",
+    ]
+
+
+def test_build_command_literal_braces():
+    command = "sh -c 'echo ${HOME} {case}' {case_dir}"
+    assert build_command(command, 1, "a", "/a") == [
+        "sh",
+        "-c",
+        "echo ${HOME} a",
+        "/a",
+    ]
+
+
+def test_run_case(base_dir, solver_command):
+    record = run_case(base_dir, "case_a", ranks=2, solver_command=solver_command)
+
+    assert record["exit_status"] == 0
+    assert len(record["attempts"]) == 1
+    assert record["numstart"] == 10
+    with open(record["attempts"][0]["stdout"]) as f:
+        assert f.read().strip() == "solver on 2 ranks from step 0"
+
+
+def test_run_case_restarts_from_numstart(base_dir, solver_command):
+    record = run_case(base_dir, "case_b", solver_command=solver_command, retries=2)
+
+    assert record["exit_status"] == 0
+    assert [a["exit_status"] for a in record["attempts"]] == [1, 0]
+    assert [a["numstart"] for a in record["attempts"]] == [0, 5]
+    with open(record["attempts"][1]["stdout"]) as f:
+        assert f.read().strip() == "solver on 1 ranks from step 5"
+
+
+def test_run_case_out_of_retries(base_dir, solver_command):
+    record = run_case(base_dir, "case_b", solver_command=solver_command, retries=0)
+    assert record["exit_status"] == 1
+    assert record["numstart"] == 5
+
+
+def test_run_case_missing_solver(base_dir):
+    record = run_case(base_dir, "case_a", solver_command="/not/a/real/svsolver")
+    assert record["exit_status"] is None
+    assert "error" in record["attempts"][0]
+
+
+def test_schedule_respects_core_budget():
+    """Jobs are packed into the budget, a small job backfills around a big one."""
+    lock = threading.Lock()
+    in_use = [0]
+    peak = [0]
+    started = []
+
+    def run(name, ranks):
+        with lock:
+            in_use[0] += ranks
+            peak[0] = max(peak[0], in_use[0])
+            started.append(name)
+        time.sleep(0.05)
+        with lock:
+            in_use[0] -= ranks
+        return name
+
+    jobs = [("a", 3), ("b", 3), ("c", 1), ("d", 2)]
+    assert schedule(jobs, 4, run) == ["a", "b", "c", "d"]
+    assert peak[0] <= 4
+    # b does not fit next to a, so c starts alongside a first
+    assert started[:2] == ["a", "c"]
+
+
+def test_schedule_job_larger_than_budget():
+    with pytest.raises(ValueError):
+        schedule([("a", 8)], 4, lambda name, ranks: None)
+
+
+def test_main_writes_summary(base_dir, solver_command):
+    summary = solverscheduler.main(
+        base_dir, ranks=2, core_budget=4, solver_command=solver_command
+    )
+    with open(os.path.join(base_dir, solverscheduler.SUMMARY_FILE_NAME)) as f:
+        assert json.load(f) == summary
+
+    assert summary["n_jobs"] == 3
+    assert summary["n_failed"] == 0
+    assert [job["case"] for job in summary["jobs"]] == ["case_a", "case_b", "case_c"]
+    assert len(summary["jobs"][1]["attempts"]) == 2
@@ -0,0 +1,88 @@
+import os
+import vtk
+import numpy as np
+import pytest
+from tempfile import TemporaryDirectory
+from flowvcutils.tracerseeds import (
+    plane_seeds,
+    sphere_seeds,
+    volume_seeds,
+    generate_seeds,
+    filter_to_domain,
+    write_seed_file,
+)
+
+
+@pytest.fixture
+def tetra_mesh():
+    """A single tetrahedron filling x + y + z <= 1 in the positive octant."""
+    points = vtk.vtkPoints()
+    for point in [(0, 0, 0), (1, 0, 0), (0, 1, 0), (0, 0, 1)]:
+        points.InsertNextPoint(point)
+    grid = vtk.vtkUnstructuredGrid()
+    grid.SetPoints(points)
+    grid.InsertNextCell(vtk.VTK_TETRA, 4, [0, 1, 2, 3])
+    return grid
+
+
+def test_plane_seeds_lie_in_disc():
+    center = np.array([1.0, 2.0, 3.0])
+    normal = np.array([1.0, 1.0, 0.0])
+    seeds = plane_seeds(center, normal, radius=0.5, spacing=0.1)
+
+    offsets = seeds - center
+    assert len(seeds) > 0
+    assert np.allclose(offsets @ (normal / np.linalg.norm(normal)), 0.0)
+    assert np.all(np.linalg.norm(offsets, axis=1) <= 0.5 + 1e-12)
+
+
+def test_sphere_seeds_lie_in_sphere():
+    seeds = sphere_seeds((0.0, 0.0, 0.0), radius=1.0, spacing=0.5)
+    # lattice points within radius 1 on a 0.5 grid: 1 + 6 + 12 + 8 + 6
+    assert len(seeds) == 33
+    assert np.all(np.linalg.norm(seeds, axis=1) <= 1.0)
+
+
+def test_volume_seeds_cover_bounds():
+    seeds = volume_seeds(((0.0, 0.0, 0.0), (1.0, 2.0, 0.0)), spacing=0.5)
+    assert seeds.shape == (3 * 5 * 1, 3)
+    assert seeds.min(axis=0).tolist() == [0.0, 0.0, 0.0]
+    assert seeds.max(axis=0).tolist() == [1.0, 2.0, 0.0]
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        dict(shape="volume", spacing=0),
+        dict(shape="cube", spacing=0.1),
+    ],
+)
+def test_generate_seeds_invalid(kwargs):
+    with pytest.raises(ValueError):
+        generate_seeds(**kwargs)
+
+
+def test_filter_to_domain(tetra_mesh):
+    seeds = volume_seeds(((0.0, 0.0, 0.0), (1.0, 1.0, 1.0)), spacing=0.25)
+    inside = filter_to_domain(seeds, tetra_mesh)
+
+    # lattice points (i, j, k) / 4 with i + j + k <= 4
+    assert len(inside) == 35
+    assert np.all(inside.sum(axis=1) <= 1.0 + 1e-9)
+
+
+def test_filter_to_domain_empty(tetra_mesh):
+    assert len(filter_to_domain(np.zeros((0, 3)), tetra_mesh)) == 0
+
+
+def test_write_seed_file():
+    seeds = np.array([[0.0, 0.1, 0.2], [1.0, 1.1, 1.2]])
+    with TemporaryDirectory() as temp_dir:
+        file_path = os.path.join(temp_dir, "seeds.bin")
+        write_seed_file(file_path, seeds)
+        with open(file_path, "rb") as f:
+            n_seeds = np.fromfile(f, dtype=np.int32, count=1)
+            coordinates = np.fromfile(f, dtype=np.float64)
+
+    assert n_seeds[0] == 2
+    assert np.array_equal(coordinates, seeds.ravel())
@@ -1,14 +1,35 @@
 import vtk
 import pytest
 import os
-from unittest.mock import MagicMock
+import json
+import logging
+import threading
+import numpy as np
+import flowvcutils.vtu_2_bin
+from unittest.mock import MagicMock, patch
 import tempfile
+import shutil
+from vtk.util import numpy_support
+from flowvcutils.perf import start_trace, stop_trace
+from flowvcutils.metrics import start_metrics, stop_metrics
 from flowvcutils.vtu_2_bin import (
     reader_selection,
     coordinates_file,
     create_vel_file_path,
     strip_trailing_underscore,
     create_file_path,
+    frame_pattern,
+    watch_folder,
+    process_folder,
+    process_directory,
+    convert_frame,
+    write_mesh_files,
+    read_header,
+    output_sizes,
+    plan_folder,
+    plan_directory,
+    format_plan,
+    WATCH_MANIFEST_NAME,
 )
 
 
@@ -116,3 +137,417 @@ def test_create_file_path(file_name, file_type, expected):
     expected_path = os.path.join(temp_dir, expected)
     actual = create_file_path(root=temp_dir, file_name=file_name, file_type=file_type)
     assert actual == expected_path
+
+
+def write_frame(file_path, scale):
+    """Write a single tetrahedron with a velocity of scale at every node."""
+    points = vtk.vtkPoints()
+    for point in [(0, 0, 0), (1, 0, 0), (0, 1, 0), (0, 0, 1)]:
+        points.InsertNextPoint(point)
+    grid = vtk.vtkUnstructuredGrid()
+    grid.SetPoints(points)
+    grid.InsertNextCell(vtk.VTK_TETRA, 4, [0, 1, 2, 3])
+    velocity = numpy_support.numpy_to_vtk(np.full((4, 3), float(scale)), deep=True)
+    velocity.SetName("velocity")
+    grid.GetPointData().AddArray(velocity)
+    writer = vtk.vtkXMLUnstructuredGridWriter()
+    writer.SetFileName(str(file_path))
+    writer.SetInputData(grid)
+    writer.Write()
+
+
+def read_velocity(file_path):
+    return np.fromfile(file_path, dtype=np.float64)
+
+
+def test_stage_spans(tmp_path, caplog):
+    """Every stage of a conversion logs its timing as a stage record."""
+    write_frame(tmp_path / "steady_00000.vtu", 1)
+    with caplog.at_level(logging.DEBUG, logger="flowvcutils.vtu_2_bin"):
+        data = convert_frame(
+            str(tmp_path / "steady_00000.vtu"),
+            str(tmp_path / "steady_vel.0.bin"),
+            fieldname="velocity",
+        )
+        write_mesh_files(
+            data,
+            str(tmp_path),
+            "steady_",
+            input_path=str(tmp_path / "steady_00000.vtu"),
+        )
+
+    spans = {r.stage["stage"]: r.stage for r in caplog.records if hasattr(r, "stage")}
+    assert list(spans) == [
+        "read",
+        "convert",
+        "write",
+        "coordinates",
+        "connectivity",
+        "adjacency",
+    ]
+    assert spans["read"]["nodes"] == 4
+    assert spans["read"]["elements"] == 1
+    assert spans["write"]["bytes"] == os.path.getsize(tmp_path / "steady_vel.0.bin")
+    assert spans["adjacency"]["bytes"] == os.path.getsize(
+        tmp_path / "steady_adjacency.bin"
+    )
+    assert all(span["duration_s"] >= 0 for span in spans.values())
+    # the mesh stages name their input so logstats can group them by case
+    assert spans["adjacency"]["path"] == str(tmp_path / "steady_00000.vtu")
+
+
+def test_frame_pattern():
+    pattern = frame_pattern(["all_results_", "steady_"], ".vtu")
+    assert pattern.match("all_results_00050.vtu").group(1) == "00050"
+    assert pattern.match("steady_00100.vtu").group(1) == "00100"
+    assert pattern.match("steady_00100.vtp") is None
+    assert pattern.match("other_00100.vtu") is None
+
+
+def test_watch_folder_converts_new_frames(tmp_path):
+    """Frames already present and frames written while watching are converted."""
+    root = tmp_path / "results"
+    output = tmp_path / "input_bin"
+    root.mkdir()
+    output.mkdir()
+    write_frame(root / "all_results_00000.vtu", 0)
+    write_frame(root / "steady_00050.vtu", 1)
+
+    def solver():
+        write_frame(root / "all_results_00100.vtu", 2)
+
+    late_frame = threading.Timer(0.1, solver)
+    late_frame.start()
+    manifest = watch_folder(
+        str(root),
+        str(output),
+        "steady_",
+        start=0,
+        stop=100,
+        increment=50,
+        poll_interval=0.02,
+        idle_timeout=10,
+    )
+    late_frame.join()
+
+    assert sorted(manifest["frames"], key=int) == ["0", "50", "100"]
+    for number, scale in [(0, 0), (50, 1), (100, 2)]:
+        velocity = read_velocity(output / f"steady_vel.{number}.bin")
+        assert velocity[0] == 0
+        assert np.all(velocity[1:] == scale)
+    assert np.fromfile(output / "steady_coordinates.bin", np.int32, count=1)[0] == 4
+    assert (output / "steady_adjacency.bin").is_file()
+    # sources are not renamed
+    assert (root / "all_results_00100.vtu").is_file()
+    with open(output / WATCH_MANIFEST_NAME) as f:
+        assert json.load(f) == manifest
+
+
+def test_watch_folder_skips_converted_frames(tmp_path):
+    root = tmp_path / "results"
+    output = tmp_path / "input_bin"
+    root.mkdir()
+    output.mkdir()
+    write_frame(root / "all_results_00000.vtu", 0)
+    write_frame(root / "all_results_00050.vtu", 1)
+    watch_folder(
+        str(root), str(output), "steady", stop=50, increment=50, poll_interval=0
+    )
+
+    with patch("flowvcutils.vtu_2_bin.convert_frame") as mock_convert:
+        watch_folder(
+            str(root), str(output), "steady", stop=50, increment=50, poll_interval=0
+        )
+        mock_convert.assert_not_called()
+
+
+def test_watch_folder_idle_timeout(tmp_path):
+    root = tmp_path / "results"
+    root.mkdir()
+    write_frame(root / "all_results_00000.vtu", 0)
+    manifest = watch_folder(
+        str(root),
+        str(tmp_path),
+        "steady",
+        stop=100,
+        increment=50,
+        poll_interval=0.01,
+        idle_timeout=0.05,
+    )
+    assert list(manifest["frames"]) == ["0"]
+
+
+def test_process_folder_input_pattern(tmp_path):
+    """Raw solver output is read in place with an index to time step mapping."""
+    root = tmp_path / "results"
+    output = tmp_path / "input_bin"
+    root.mkdir()
+    output.mkdir()
+    for index in range(3):
+        write_frame(root / f"restart.{index}.vtu", index)
+
+    process_folder(
+        str(root),
+        str(output),
+        "steady_",
+        ".vtu",
+        start=3000,
+        stop=3100,
+        increment=50,
+        num_digits=5,
+        field_name="velocity",
+        input_pattern="restart.{index}.vtu",
+        current_start=0,
+        current_increment=1,
+    )
+
+    for index, number in enumerate([3000, 3050, 3100]):
+        assert np.all(read_velocity(output / f"steady_vel.{number}.bin")[1:] == index)
+    assert (output / "steady_coordinates.bin").is_file()
+    assert sorted(os.listdir(root)) == [f"restart.{i}.vtu" for i in range(3)]
+
+
+def test_process_folder_max_workers(tmp_path):
+    """Frames converted in worker processes match the sequential conversion."""
+    for index in range(4):
+        write_frame(tmp_path / f"steady_{index * 50:05d}.vtu", index)
+    for max_workers, output in [(1, tmp_path / "serial"), (2, tmp_path / "pool")]:
+        output.mkdir()
+        process_folder(
+            str(tmp_path),
+            str(output),
+            "steady_",
+            ".vtu",
+            start=0,
+            stop=150,
+            increment=50,
+            num_digits=5,
+            field_name="velocity",
+            max_workers=max_workers,
+        )
+
+    assert sorted(os.listdir(tmp_path / "pool")) == sorted(
+        os.listdir(tmp_path / "serial")
+    )
+    for number in [0, 50, 100, 150]:
+        assert np.array_equal(
+            read_velocity(tmp_path / "pool" / f"steady_vel.{number}.bin"),
+            read_velocity(tmp_path / "serial" / f"steady_vel.{number}.bin"),
+        )
+
+
+def test_trace_max_workers(tmp_path):
+    """Frames converted in worker processes are in the trace of the run."""
+    for index in range(4):
+        write_frame(tmp_path / f"steady_{index * 50:05d}.vtu", index)
+    trace_file = tmp_path / "trace.json"
+    start_trace(str(trace_file))
+    try:
+        process_folder(
+            str(tmp_path),
+            str(tmp_path),
+            "steady_",
+            ".vtu",
+            start=0,
+            stop=150,
+            increment=50,
+            num_digits=5,
+            field_name="velocity",
+            max_workers=2,
+        )
+    finally:
+        stop_trace()
+
+    with open(trace_file) as f:
+        events = json.load(f)["traceEvents"]
+    frames = [e for e in events if e.get("cat") == "frame"]
+    assert sorted(e["name"] for e in frames) == [
+        f"frame {n}" for n in [0, 100, 150, 50]
+    ]
+    assert os.getpid() not in {e["pid"] for e in frames}
+    assert {e["name"] for e in events if e.get("cat") == "stage"} >= {
+        "read",
+        "convert",
+        "write",
+        "adjacency",
+    }
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".part")]
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_process_folder_metrics(tmp_path, max_workers):
+    for index in range(3):
+        write_frame(tmp_path / f"steady_{index * 50:05d}.vtu", index)
+    prom_file = tmp_path / "vtu2bin.prom"
+    start_metrics(str(prom_file), interval=3600)
+    try:
+        process_folder(
+            str(tmp_path),
+            str(tmp_path),
+            "steady_",
+            ".vtu",
+            start=0,
+            stop=100,
+            increment=50,
+            num_digits=5,
+            field_name="velocity",
+            max_workers=max_workers,
+        )
+    finally:
+        stop_metrics()
+
+    with open(prom_file) as f:
+        values = dict(line.rsplit(" ", 1) for line in f if not line.startswith("#"))
+    labels = '{command="vtu2bin",item="frame"}'
+    assert float(values[f"flowvcutils_items_done{labels}"]) == 3
+    assert float(values[f"flowvcutils_items_remaining{labels}"]) == 0
+    assert float(values[f"flowvcutils_workers{labels}"]) == max_workers
+    assert float(values[f"flowvcutils_bytes_written_total{labels}"]) == sum(
+        os.path.getsize(tmp_path / f"steady_vel.{n}.bin") for n in [0, 50, 100]
+    )
+
+
+def test_process_directory_metrics(tmp_path):
+    """The frames of every folder are counted before the first is converted."""
+    for case in ["case_a", "case_b"]:
+        os.makedirs(tmp_path / case / "input_vtu")
+        for index in range(3):
+            write_frame(
+                tmp_path / case / "input_vtu" / f"{case}{index * 50:05d}.vtu", 1
+            )
+    prom_file = tmp_path / "vtu2bin.prom"
+    collector = start_metrics(str(prom_file), interval=3600)
+    remaining = []
+    mesh_files = flowvcutils.vtu_2_bin.write_mesh_files
+
+    def record_remaining(*args, **kwargs):
+        remaining.append(collector.values()["items_remaining"])
+        return mesh_files(*args, **kwargs)
+
+    try:
+        with patch("flowvcutils.vtu_2_bin.write_mesh_files", record_remaining):
+            process_directory(
+                str(tmp_path),
+                ".vtu",
+                start=0,
+                stop=100,
+                increment=50,
+                num_digits=5,
+                field_name="velocity",
+            )
+    finally:
+        stop_metrics()
+
+    # before each folder's mesh is written, that folder's frames are pending
+    assert remaining == [6, 3]
+    labels = '{command="vtu2bin",item="frame"}'
+    with open(prom_file) as f:
+        values = dict(line.rsplit(" ", 1) for line in f if not line.startswith("#"))
+    assert float(values[f"flowvcutils_items{labels}"]) == 6
+    assert float(values[f"flowvcutils_items_done{labels}"]) == 6
+
+
+def test_process_folder_input_pattern_missing(tmp_path):
+    write_frame(tmp_path / "all_results_00000.vtu", 0)
+    with pytest.raises(FileNotFoundError):
+        process_folder(
+            str(tmp_path),
+            str(tmp_path),
+            "steady",
+            ".vtu",
+            start=0,
+            stop=50,
+            increment=50,
+            num_digits=5,
+            field_name="velocity",
+            input_pattern="all_results_{index:05d}.vtu",
+        )
+
+
+def test_read_header(tmp_path):
+    """The counts come from the <Piece> tag, also when it spans two blocks."""
+    write_frame(tmp_path / "a.vtu", 1)
+    assert read_header(str(tmp_path / "a.vtu")) == (4, 1)
+    assert read_header(str(tmp_path / "a.vtu"), block_size=16) == (4, 1)
+    (tmp_path / "b.vtk").write_text("# vtk DataFile Version 3.0")
+    assert read_header(str(tmp_path / "b.vtk")) is None
+
+
+def test_output_sizes_match_written_files(tmp_path):
+    for index in range(2):
+        write_frame(tmp_path / f"steady_{index * 50:05d}.vtu", index)
+    output = tmp_path / "bin"
+    output.mkdir()
+    process_folder(
+        str(tmp_path), str(output), "steady_", ".vtu", 0, 50, 50, 5, "velocity"
+    )
+    sizes = output_sizes(4, 1)
+    for file_type in ["coordinates", "connectivity", "adjacency"]:
+        assert os.path.getsize(output / f"steady_{file_type}.bin") == sizes[file_type]
+    assert os.path.getsize(output / "steady_vel.50.bin") == sizes["velocity"]
+
+
+def test_plan_folder(tmp_path):
+    """A plan writes nothing and counts the frames that are missing."""
+    for index in range(3):
+        write_frame(tmp_path / f"steady_{index * 50:05d}.vtu", index)
+    output = tmp_path / "bin"
+    before = sorted(os.listdir(tmp_path))
+
+    with patch("flowvcutils.vtu_2_bin.stage_span") as mock_span:
+        plan = plan_folder(
+            str(tmp_path),
+            str(output),
+            "steady_",
+            ".vtu",
+            0,
+            150,
+            50,
+            5,
+            "velocity",
+            max_workers=2,
+        )
+
+    # a dry run logs no stage timings for logstats
+    mock_span.assert_not_called()
+    assert sorted(os.listdir(tmp_path)) == before
+    sizes = output_sizes(4, 1)
+    assert plan["frames"] == 4
+    assert plan["missing"] == [150]
+    assert plan["bytes"]["total"] == (
+        sizes["coordinates"]
+        + sizes["connectivity"]
+        + sizes["adjacency"]
+        + 4 * sizes["velocity"]
+    )
+    assert plan["needed_bytes"] == plan["bytes"]["total"]
+    assert plan["fits"]
+    assert plan["workers"] == 2
+    # 4 frames on 2 workers
+    assert plan["estimated_s"] == pytest.approx(plan["mesh_s"] + 2 * plan["frame_s"])
+    assert "4 frames" in format_plan(plan)
+    assert "missing       1 frames" in format_plan(plan)
+
+
+def test_plan_folder_missing_field(tmp_path):
+    write_frame(tmp_path / "steady_00000.vtu", 0)
+    with pytest.raises(ValueError):
+        plan_folder(str(tmp_path), str(tmp_path), "steady_", ".vtu", 0, 0, 50, 5, "v")
+
+
+def test_plan_directory_shares_free_space(tmp_path):
+    """Cases on one filesystem only fit if all of them fit together."""
+    for case in ["a_", "b_"]:
+        (tmp_path / case / "input_vtu").mkdir(parents=True)
+        for index in range(2):
+            write_frame(tmp_path / case / "input_vtu" / f"{case}{index:05d}.vtu", 0)
+    sizes = output_sizes(4, 1)
+    # the mesh files and two velocity frames
+    one_case = sum(sizes.values()) + sizes["velocity"]
+
+    usage = shutil.disk_usage(tmp_path)._replace(free=one_case)
+    with patch("flowvcutils.vtu_2_bin.shutil.disk_usage", return_value=usage):
+        plans = plan_directory(str(tmp_path), ".vtu", 0, 1, 1, 5, "velocity")
+
+    assert [plan["needed_bytes"] for plan in plans] == [one_case, one_case]
+    assert [plan["fits"] for plan in plans] == [True, False]